@@ -0,0 +1,250 @@
+"""
+Load test for the FastAPI server against the in-memory fake Docs/Drive backend.
+
+Drives the HTTP endpoints from a pool of client threads (each on its own keep-alive connection)
+at one or more concurrency levels, so the point where throughput stops growing and latency climbs
+shows up before deploying. The fake backend can add latency per Google call and answer a share
+of calls with 429. Each level reports throughput, p50/p95/p99 latency, error rate and the Google
+calls made per operation. Run from the project root:
+
+    python3 -m benchmarks.load_test --concurrency 1 4 16 --duration 10
+    python3 -m benchmarks.load_test --latency 0.05 --throttle-rate 0.02 --save-baseline load_baseline.json
+    python3 -m benchmarks.load_test --compare load_baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.run_benchmarks import generate_markdown, running_server
+from src.remote import RemoteSession
+from src.server import mcp_server
+from test.fake_google_docs import FakeGoogleBackend, make_http_error
+
+OPERATIONS = ('append', 'write', 'replace', 'clear', 'create')
+# A clear removes the document's placeholder, so replaces on it fail until the next write; clear
+# is left out of the default mix to keep the error rate about the backend, not the workload.
+DEFAULT_MIX = 'append=6,write=2,replace=2'
+AUTH = {'auth_mode': 'service_account', 'creds_path': 'fake-credentials.json'}
+
+class ThrottlingBackend(FakeGoogleBackend):
+    """A fake backend that also answers a random share of calls with 429, like a busy quota."""
+
+    def __init__(self, throttle_rate: float = 0.0, retry_after: int = 0, seed: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+
+    def call(self, method: str, func):
+        if self.throttle_rate:
+            with self._lock:
+                throttled = self._random.random() < self.throttle_rate
+            if throttled:
+                if self.latency:
+                    time.sleep(self.latency)
+                with self._lock:
+                    self.calls[method] += 1
+                    self.calls['errors'] += 1
+                raise make_http_error(429, "Rate limit exceeded.", self.retry_after)
+        return super().call(method, func)
+
+def parse_mix(mix: str) -> dict:
+    """Parses 'append=6,write=2' into operation weights."""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}' in --mix; choose from {', '.join(OPERATIONS)}.")
+        weights[name] = float(weight or 1)
+    return weights
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+class Workload:
+    """Builds the payload of each operation against a fixed set of documents."""
+
+    def __init__(self, backend, documents: int, markdown_lines: int, seed: int):
+        self.markdown = generate_markdown(markdown_lines)
+        self.placeholders = [f"{{{{KEY_{n}}}}}" for n in range(documents)]
+        self.document_ids = []
+        services = backend.services()
+        for placeholder in self.placeholders:
+            document_id = backend.create_document().document_id
+            mcp_server.google_docs_tool.write_to_google_doc(services['docs'], services['drive'], self._written(placeholder), document_id=document_id)
+            self.document_ids.append(document_id)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _written(self, placeholder: str) -> str:
+        # Writes and replaces keep the placeholder in the document, so replaces keep finding it.
+        return f"Value: {placeholder}\n\n{self.markdown}"
+
+    def next(self, weights: dict):
+        with self._lock:
+            op = self._random.choices(list(weights), weights=list(weights.values()))[0]
+            n = self._random.randrange(len(self.document_ids))
+        document = dict(AUTH, document_id=self.document_ids[n])
+        if op == 'append':
+            return op, '/append-markdown', dict(document, markdown_text=self.markdown)
+        if op == 'write':
+            return op, '/write-markdown', dict(document, markdown_text=self._written(self.placeholders[n]))
+        if op == 'replace':
+            placeholder = self.placeholders[n]
+            return op, '/replace-markdown', dict(document, replacements={placeholder: f"**{placeholder}**"})
+        if op == 'clear':
+            return op, '/clear-doc', document
+        return op, '/create-doc', dict(AUTH, title="Load test")
+
+def run_level(base_url: str, backend, workload: Workload, weights: dict, concurrency: int, duration: float, max_operations: int) -> dict:
+    """Runs the workload at one concurrency level and returns its statistics."""
+    latencies = {op: [] for op in weights}
+    errors = Counter()
+    sample_errors = {}
+    lock = threading.Lock()
+    issued = [0]
+    calls_before = Counter(backend.calls)
+    deadline = time.perf_counter() + duration
+
+    def client():
+        session = RemoteSession(base_url)
+        try:
+            while time.perf_counter() < deadline:
+                with lock:
+                    if max_operations and issued[0] >= max_operations:
+                        return
+                    issued[0] += 1
+                op, path, payload = workload.next(weights)
+                started = time.perf_counter()
+                result = session.post(path, payload)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies[op].append(elapsed)
+                    if result.get('status') == 'error':
+                        errors[op] += 1
+                        sample_errors.setdefault(op, result.get('message'))
+        finally:
+            session.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(client) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    calls = Counter(backend.calls)
+    calls.subtract(calls_before)
+    all_latencies = sorted(value for values in latencies.values() for value in values)
+    operations = len(all_latencies)
+    google_calls = sum(count for method, count in calls.items() if method != 'errors')
+    return {
+        'concurrency': concurrency,
+        'operations': operations,
+        'seconds': round(elapsed, 3),
+        'throughput_ops': round(operations / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(1000 * percentile(all_latencies, 0.50), 2),
+        'p95_ms': round(1000 * percentile(all_latencies, 0.95), 2),
+        'p99_ms': round(1000 * percentile(all_latencies, 0.99), 2),
+        'error_rate': round(sum(errors.values()) / operations, 4) if operations else 0.0,
+        'google_calls_per_op': round(google_calls / operations, 3) if operations else 0.0,
+        'google_errors_per_op': round(calls['errors'] / operations, 3) if operations else 0.0,
+        'by_operation': {
+            op: {
+                'operations': len(values),
+                'p50_ms': round(1000 * percentile(sorted(values), 0.50), 2),
+                'p95_ms': round(1000 * percentile(sorted(values), 0.95), 2),
+                'errors': errors[op],
+                'sample_error': sample_errors.get(op),
+            }
+            for op, values in latencies.items() if values
+        },
+        'google_calls': {method: count for method, count in sorted(calls.items()) if count},
+    }
+
+# --- Reporting ---
+
+COLUMNS = ['concurrency', 'operations', 'throughput_ops', 'p50_ms', 'p95_ms', 'p99_ms', 'error_rate', 'google_calls_per_op', 'google_errors_per_op']
+
+def print_levels(levels: list):
+    widths = {c: max(len(c), *(len(str(level[c])) for level in levels)) for c in COLUMNS}
+    print('  '.join(c.ljust(widths[c]) for c in COLUMNS))
+    for level in levels:
+        print('  '.join(str(level[c]).ljust(widths[c]) for c in COLUMNS))
+
+def print_comparison(levels: list, baseline: dict):
+    """Prints the change against a saved baseline for every concurrency level both runs share."""
+    previous = {level['concurrency']: level for level in baseline.get('levels', [])}
+    print(f"\nCompared with baseline from {baseline.get('created_at', 'unknown time')}:")
+    for level in levels:
+        before = previous.get(level['concurrency'])
+        if before is None:
+            continue
+        changes = []
+        for column in ('throughput_ops', 'p95_ms', 'p99_ms', 'error_rate', 'google_calls_per_op'):
+            old, new = before[column], level[column]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else f"{old} -> {new}"
+            changes.append(f"{column} {change}")
+        print(f"  concurrency {level['concurrency']}: " + ', '.join(changes))
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the server against the fake Google backend.")
+    parser.add_argument("--concurrency", type=int, nargs='+', default=[1, 4, 16], help="Concurrent clients; one run per level.")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to run each concurrency level.")
+    parser.add_argument("--max-operations", type=int, default=0, help="Stop a level after this many operations (0 for no limit).")
+    parser.add_argument("--documents", type=int, default=8, help="Documents the operations are spread over.")
+    parser.add_argument("--markdown-lines", type=int, default=20, help="Markdown lines sent by each append and write.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Operation weights, e.g. '{DEFAULT_MIX}' (also: create).")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds of latency per Google API call.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of Google API calls answered with 429.")
+    parser.add_argument("--retry-after", type=int, default=0, help="Retry-After seconds sent with the 429 answers.")
+    parser.add_argument("--quota", type=int, default=None, help="Google API calls allowed per --quota-window seconds.")
+    parser.add_argument("--quota-window", type=float, default=60.0, help="Window of --quota in seconds.")
+    parser.add_argument("--append-flush-window", type=float, default=None, help="Override the server's extra append combining window.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the operation mix and injected 429s.")
+    parser.add_argument("--save-baseline", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare the results with a baseline JSON file.")
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    backend = ThrottlingBackend(throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=args.seed,
+                                latency=args.latency, quota=args.quota, quota_window=args.quota_window)
+    if args.append_flush_window is not None:
+        mcp_server.append_combiner.flush_window = args.append_flush_window
+
+    levels = []
+    # The tool functions print progress on every operation; keep the report readable.
+    with contextlib.redirect_stdout(io.StringIO()), running_server(backend) as base_url:
+        workload = Workload(backend, args.documents, args.markdown_lines, args.seed)
+        for concurrency in args.concurrency:
+            print(f"Running {concurrency} concurrent clients for {args.duration}s...", file=sys.stderr)
+            levels.append(run_level(base_url, backend, workload, weights, concurrency, args.duration, args.max_operations))
+
+    print_levels(levels)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(levels, json.load(f))
+    if args.save_baseline:
+        baseline = {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'settings': {key: value for key, value in vars(args).items() if key not in ('save_baseline', 'compare')},
+            'levels': levels,
+        }
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+
+if __name__ == "__main__":
+    main()
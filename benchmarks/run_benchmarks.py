@@ -0,0 +1,228 @@
+"""
+Offline benchmarks for the markdown parser, the tool functions and the HTTP endpoints.
+
+Everything runs against the in-memory fake backend from test/fake_google_docs.py, so no
+credentials are needed. Run from the project root:
+
+    python3 -m benchmarks.run_benchmarks
+    python3 -m benchmarks.run_benchmarks --sizes small medium large xlarge --json bench_output.json
+    python3 -m benchmarks.run_benchmarks --only parser --sizes xlarge --parse-workers 4
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+from src.tool import google_docs_tool, markdown_parser
+from test.fake_google_docs import FakeGoogleBackend
+
+# Number of markdown lines per input size.
+SIZES = {'small': 50, 'medium': 2000, 'large': 20000, 'xlarge': 100000}
+
+def generate_markdown(lines: int) -> str:
+    """Builds a deterministic report mixing headings, bold text, nested lists and blank lines."""
+    out = []
+    for n in range(lines):
+        kind = n % 10
+        if kind == 0:
+            out.append(f"## Section {n // 10}")
+        elif kind in (3, 4):
+            out.append(f"* Item {n} with **bold** detail")
+        elif kind == 5:
+            out.append(f"  - Nested item {n}")
+        elif kind == 9:
+            out.append("")
+        else:
+            out.append(f"Paragraph {n} has some **important** words and plain text around them.")
+    return '\n'.join(out)
+
+def run_case(name: str, size: str, setup, operation, min_seconds: float = 0.5, max_iterations: int = 1000) -> dict:
+    """Times operation(state) over fresh setup() states, then measures one run under tracemalloc.
+
+    operation returns the number of API requests it emitted.
+    """
+    timings, emitted = [], 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        while len(timings) < max_iterations and (not timings or time.perf_counter() - started < min_seconds):
+            state = setup()
+            op_started = time.perf_counter()
+            emitted = operation(state)
+            timings.append(time.perf_counter() - op_started)
+
+        state = setup()
+        tracemalloc.start()
+        operation(state)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    total = sum(timings)
+    return {
+        'benchmark': name,
+        'size': size,
+        'iterations': len(timings),
+        'ops_per_sec': round(len(timings) / total, 2) if total else None,
+        'mean_ms': round(1000 * total / len(timings), 3),
+        'requests_emitted': emitted,
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+# --- Tool benchmarks ---
+
+def parser_cases(markdown: str, parse_pool=None):
+    yield 'parse_legacy', lambda: None, lambda _: len(markdown_parser.get_markdown_requests(markdown, 1))
+    # The coalesced path is served from the plan cache after its first call: clear it in the
+    # untimed setup so parse_coalesced measures parsing, and time the cache hit on its own.
+    yield 'parse_coalesced', markdown_parser.clear_plan_cache, lambda _: len(markdown_parser.get_markdown_requests(markdown, 1, coalesce=True))
+    yield 'parse_cached', lambda: markdown_parser.cached_plan_markdown(markdown), lambda _: len(markdown_parser.get_markdown_requests(markdown, 1, coalesce=True))
+    if parse_pool is not None:
+        # Uncached planning, serial against segments planned in the process pool.
+        yield 'plan_serial', lambda: None, lambda _: len(markdown_parser.plan_to_requests(markdown_parser.plan_markdown(markdown), 1))
+        yield 'plan_parallel', lambda: None, lambda _: len(markdown_parser.plan_to_requests(markdown_parser.parallel_plan_markdown(markdown, parse_pool), 1))
+
+def tool_cases(markdown: str, latency: float = 0.0):
+    def new_document():
+        # Every run parses its markdown, as a write of new content does.
+        markdown_parser.clear_plan_cache()
+        backend = FakeGoogleBackend(latency=latency)
+        return backend, backend.services(), backend.create_document().document_id
+
+    def write(state):
+        backend, services, document_id = state
+        google_docs_tool.write_to_google_doc(services['docs'], services['drive'], markdown, document_id=document_id)
+        return backend.requests_applied
+
+    def append(state):
+        backend, services, document_id = state
+        google_docs_tool.append_to_google_doc(services['docs'], document_id, markdown)
+        return backend.requests_applied
+
+    placeholder_count = max(1, markdown.count('\n') // 20)
+    template = '\n'.join(f"Value {n}: {{{{KEY_{n}}}}}" for n in range(placeholder_count))
+    replacements = {f"{{{{KEY_{n}}}}}": f"**{n}** replaced" for n in range(placeholder_count)}
+
+    def template_document():
+        backend, services, document_id = new_document()
+        with contextlib.redirect_stdout(io.StringIO()):
+            google_docs_tool.write_to_google_doc(services['docs'], services['drive'], template, document_id=document_id)
+        return backend, services, document_id, backend.requests_applied
+
+    def replace(state):
+        backend, services, document_id, before = state
+        google_docs_tool.replace_markdown_placeholders(services['docs'], document_id, replacements)
+        return backend.requests_applied - before
+
+    yield 'write', new_document, write
+    yield 'append', new_document, append
+    yield 'replace', template_document, replace
+
+# --- HTTP benchmarks ---
+
+@contextlib.contextmanager
+def running_server(backend):
+    """Serves the FastAPI app on a free local port with services from the fake backend."""
+    import uvicorn
+    from src.server import mcp_server
+
+    original_cache = mcp_server.service_cache
+    mcp_server.service_cache = mcp_server.ServiceCache(factory=lambda *args: backend.services())
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(mcp_server.app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+        mcp_server.service_cache = original_cache
+
+def post(url: str, payload: dict) -> dict:
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'), headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+def http_cases(base_url: str, backend, markdown: str):
+    auth = {'auth_mode': 'service_account', 'creds_path': 'fake-credentials.json'}
+
+    def new_document():
+        return backend.create_document().document_id, backend.requests_applied
+
+    def create(_):
+        post(f"{base_url}/create-doc", dict(auth, title="Benchmark"))
+        return 0
+
+    def append(state):
+        document_id, before = state
+        post(f"{base_url}/append-markdown", dict(auth, document_id=document_id, markdown_text=markdown))
+        return backend.requests_applied - before
+
+    def clear(state):
+        document_id, before = state
+        post(f"{base_url}/clear-doc", dict(auth, document_id=document_id))
+        return backend.requests_applied - before
+
+    yield 'http_create_doc', lambda: None, create
+    yield 'http_append_markdown', new_document, append
+    yield 'http_clear_doc', new_document, clear
+
+# --- Reporting ---
+
+def print_table(results):
+    columns = ['benchmark', 'size', 'iterations', 'ops_per_sec', 'mean_ms', 'requests_emitted', 'peak_memory_kib']
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print('  '.join(c.ljust(widths[c]) for c in columns))
+    for result in results:
+        print('  '.join(str(result[c]).ljust(widths[c]) for c in columns))
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the Google Docs tool.")
+    parser.add_argument("--sizes", nargs='+', choices=list(SIZES), default=['small', 'medium', 'large'], help="Input sizes to run.")
+    parser.add_argument("--only", nargs='+', choices=['parser', 'tool', 'http'], default=['parser', 'tool', 'http'], help="Benchmark groups to run.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds of latency per Google API call.")
+    parser.add_argument("--min-seconds", type=float, default=0.5, help="Minimum timed duration per case.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Also compare serial planning with a process pool of this many workers.")
+    args = parser.parse_args()
+
+    results = []
+    http_backend = FakeGoogleBackend(latency=args.latency)
+    with contextlib.ExitStack() as stack:
+        base_url = stack.enter_context(running_server(http_backend)) if 'http' in args.only else None
+        parse_pool = None
+        if args.parse_workers > 1:
+            parse_pool = stack.enter_context(ProcessPoolExecutor(max_workers=args.parse_workers, mp_context=multiprocessing.get_context('spawn')))
+        for size in args.sizes:
+            markdown = generate_markdown(SIZES[size])
+            cases = []
+            if 'parser' in args.only:
+                cases.extend(parser_cases(markdown, parse_pool))
+            if 'tool' in args.only:
+                cases.extend(tool_cases(markdown, args.latency))
+            if 'http' in args.only:
+                cases.extend(http_cases(base_url, http_backend, markdown))
+            for name, setup, operation in cases:
+                print(f"Running {name} ({size})...", file=sys.stderr)
+                results.append(run_case(name, size, setup, operation, min_seconds=args.min_seconds))
+
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
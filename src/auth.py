@@ -1,38 +1,226 @@
 import os
+import threading
+from datetime import datetime, timezone
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from google.oauth2.service_account import Credentials as ServiceAccountCredentials
+try:
+    from .transport import PooledHttp
+except ImportError:
+    # Imported as a top-level module, with 'src' on sys.path (the client and tests do this).
+    from transport import PooledHttp
 
 # Define the scope of permissions we are requesting
 # Added drive.file scope to allow creation of new documents.
 SCOPES = ["https://www.googleapis.com/auth/documents", "https://www.googleapis.com/auth/drive.file"]
 
-def get_services_with_oauth(client_secrets_path: str, token_path: str = "token.json"):
-    """Handles the OAuth 2.0 flow and returns authorized service objects for Docs and Drive."""
-    creds = None
-    if os.path.exists(token_path):
-        creds = Credentials.from_authorized_user_file(token_path, SCOPES)
-    
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
+# --- Credential Store ---
+# Credentials are loaded once per process and kept in memory. A timer refreshes each one
+# REFRESH_MARGIN_SECONDS before it expires, so API calls find a valid token instead of refreshing
+# on the request path. A failed background refresh is retried after REFRESH_RETRY_SECONDS, doubling
+# up to REFRESH_RETRY_MAX_SECONDS; after REFRESH_MAX_FAILURES in a row (a revoked token, say) the
+# timer stops and the next request refreshes inline, surfacing the error to its caller. The margin
+# must exceed google-auth's own threshold (a few minutes) for treating a token as expired.
+REFRESH_MARGIN_SECONDS = 300
+REFRESH_RETRY_SECONDS = 30
+REFRESH_RETRY_MAX_SECONDS = 1800
+REFRESH_MAX_FAILURES = 8
+
+def _fingerprint(path: str):
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _utcnow() -> datetime:
+    # google-auth keeps expiry as a naive UTC datetime.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class _Entry:
+    def __init__(self, creds, token_path: str = None, source_path: str = None, generation: int = 0):
+        self.creds = creds
+        self.token_path = token_path
+        self.source_path = source_path
+        self.fingerprint = _fingerprint(source_path)
+        self.generation = generation
+        self.lock = threading.Lock()
+        self.timer = None
+        self.retired = False
+        self.failures = 0
+
+class CredentialStore:
+    """Process-wide credentials, shared by every request and refreshed before they expire.
+
+    OAuth tokens are written back to their token file atomically while holding a lock, so
+    concurrent requests never refresh the same credentials or write the same file at once. A
+    token or key file changed on disk by someone else is reloaded on the next get.
+    """
+
+    def __init__(self, refresh_margin: float = REFRESH_MARGIN_SECONDS, retry_seconds: float = REFRESH_RETRY_SECONDS, request_factory=Request,
+                 max_retry_seconds: float = REFRESH_RETRY_MAX_SECONDS, max_failures: int = REFRESH_MAX_FAILURES):
+        self._refresh_margin = refresh_margin
+        self._retry_seconds = retry_seconds
+        self._max_retry_seconds = max_retry_seconds
+        self._max_failures = max_failures
+        self._request_factory = request_factory
+        self._entries = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._closed = False
+        self._loads = 0
+
+    def get_oauth(self, client_secrets_path: str, token_path: str):
+        """Returns valid OAuth credentials, running the consent flow only when no usable token exists."""
+        def load():
+            creds = None
+            if os.path.exists(token_path):
+                creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+            entry = _Entry(creds, token_path=token_path, source_path=token_path)
+            if creds and (creds.valid or (creds.expired and creds.refresh_token)):
+                return entry
             flow = InstalledAppFlow.from_client_secrets_file(client_secrets_path, SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        with open(token_path, 'w') as token:
-            token.write(creds.to_json())
+            entry.creds = flow.run_local_server(port=0)
+            self._save(entry)
             print(f"OAuth token has been saved to {token_path} for future use.")
-            
-    docs_service = build("docs", "v1", credentials=creds)
-    drive_service = build("drive", "v3", credentials=creds)
-    return {"docs": docs_service, "drive": drive_service}
+            return entry
+        return self._get(('oauth', os.path.abspath(token_path)), token_path, load)
+
+    def get_service_account(self, sa_file_path: str):
+        """Returns service account credentials holding a valid access token."""
+        def load():
+            creds = ServiceAccountCredentials.from_service_account_file(sa_file_path, scopes=SCOPES)
+            return _Entry(creds, source_path=sa_file_path)
+        return self._get(('service_account', os.path.abspath(sa_file_path)), sa_file_path, load)
+
+    def _get(self, key, source_path: str, load):
+        with self._lock:
+            entry = self._entries.get(key)
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        if entry is None or entry.fingerprint != _fingerprint(source_path):
+            # One loader per key; other callers wait for it instead of loading the file again.
+            with load_lock:
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is None or entry.fingerprint != _fingerprint(source_path):
+                    if entry is not None:
+                        self._cancel(entry)
+                    entry = load()
+                    with self._lock:
+                        self._loads += 1
+                        entry.generation = self._loads
+                        self._entries[key] = entry
+        self._ensure_valid(entry)
+        return entry.creds
+
+    def source_version(self, source_path: str):
+        """Returns a value that changes only when source_path is changed by someone else.
+
+        Our own token refreshes rewrite the file without changing it, so services built on the
+        credentials can be kept. Files this store has not loaded fall back to their fingerprint.
+        """
+        fingerprint = _fingerprint(source_path)
+        if source_path is None:
+            return fingerprint
+        path = os.path.abspath(source_path)
+        with self._lock:
+            entries = [entry for entry in self._entries.values() if entry.source_path and os.path.abspath(entry.source_path) == path]
+        for entry in entries:
+            if entry.fingerprint == fingerprint:
+                return ('loaded', entry.generation)
+        return fingerprint
+
+    def _ensure_valid(self, entry: _Entry):
+        """Refreshes synchronously only if the background refresh has not kept the token valid."""
+        if not entry.creds.valid:
+            with entry.lock:
+                if not entry.creds.valid:
+                    self._refresh(entry)
+        elif entry.timer is None:
+            self._schedule(entry)
+
+    def _refresh(self, entry: _Entry):
+        entry.creds.refresh(self._request_factory())
+        entry.failures = 0
+        if entry.token_path:
+            self._save(entry)
+        self._schedule(entry)
+
+    def _save(self, entry: _Entry):
+        with self._file_lock:
+            temp_path = f"{entry.token_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as token:
+                token.write(entry.creds.to_json())
+            os.replace(temp_path, entry.token_path)
+            entry.fingerprint = _fingerprint(entry.token_path)
+
+    def _schedule(self, entry: _Entry, delay: float = None):
+        if delay is None:
+            expiry = entry.creds.expiry
+            if expiry is None:
+                return
+            delay = max(0.0, (expiry - _utcnow()).total_seconds() - self._refresh_margin)
+        with self._lock:
+            if self._closed:
+                return
+            if entry.timer is not None:
+                entry.timer.cancel()
+            entry.timer = threading.Timer(delay, self._refresh_in_background, (entry,))
+            entry.timer.daemon = True
+            entry.timer.start()
+
+    def _refresh_in_background(self, entry: _Entry):
+        try:
+            with entry.lock:
+                # Credentials replaced after a file change must not overwrite the new token file.
+                if entry.retired:
+                    return
+                self._refresh(entry)
+        except Exception as e:
+            entry.failures += 1
+            if entry.failures >= self._max_failures:
+                print(f"Warning: Background credential refresh failed {entry.failures} times, refreshing on the next request instead: {e}")
+                return
+            delay = min(self._retry_seconds * 2 ** (entry.failures - 1), self._max_retry_seconds)
+            print(f"Warning: Background credential refresh failed, retrying in {delay}s: {e}")
+            self._schedule(entry, delay)
+
+    def _cancel(self, entry: _Entry):
+        with self._lock:
+            entry.retired = True
+            if entry.timer is not None:
+                entry.timer.cancel()
+                entry.timer = None
+
+    def close(self):
+        """Stops all background refreshes."""
+        with self._lock:
+            self._closed = True
+            entries = list(self._entries.values())
+        for entry in entries:
+            if entry.timer is not None:
+                entry.timer.cancel()
+
+credential_store = CredentialStore()
+
+def get_services_with_oauth(client_secrets_path: str, token_path: str = "token.json"):
+    """Handles the OAuth 2.0 flow and returns authorized service objects for Docs and Drive."""
+    return build_services(credential_store.get_oauth(client_secrets_path, token_path))
 
 def get_services_with_service_account(sa_file_path: str):
     """Handles Service Account authentication and returns authorized service objects for Docs and Drive."""
-    creds = ServiceAccountCredentials.from_service_account_file(sa_file_path, scopes=SCOPES)
-    docs_service = build("docs", "v1", credentials=creds)
-    drive_service = build("drive", "v3", credentials=creds)
-    return {"docs": docs_service, "drive": drive_service}
\ No newline at end of file
+    return build_services(credential_store.get_service_account(sa_file_path))
+
+def build_services(creds, **transport_options):
+    """Builds the Docs and Drive service objects from the discovery documents bundled with the client library.
+
+    Both services share one PooledHttp, so they can be used from many threads at once;
+    transport_options (pool_size, connect_timeout, read_timeout) are passed to it.
+    """
+    http = PooledHttp(creds, **transport_options)
+    docs_service = build("docs", "v1", http=http, static_discovery=True, cache_discovery=False)
+    drive_service = build("drive", "v3", http=http, static_discovery=True, cache_discovery=False)
+    return {"docs": docs_service, "drive": drive_service}
@@ -1,19 +1,19 @@
 import argparse
 import sys
 import os
-import json
-import requests
 
-# Since the client is in 'src', it can directly import other modules/packages in 'src'
-from tool import google_docs_tool
-import auth
+# The Google client libraries take most of a second to import, so the tool, auth and sync
+# modules (which pull them in) are imported inside the handlers that need them. With --remote
+# the work is sent to the running server and none of them are imported.
 
 # --- Configuration ---
 SERVER_BASE_URL = "http://127.0.0.1:8080"
+MANIFEST_NAME = ".docs-sync.json"
 
 # --- Helper Functions ---
 def get_services(args):
     """Authenticates and returns the docs and drive service objects."""
+    import auth
     print(f"Attempting authentication using '{args.auth}' mode...")
     try:
         if args.auth == 'service_account':
@@ -35,12 +35,36 @@ def read_markdown_file(file_path):
         print(f"Error: Markdown file not found at {file_path}")
         sys.exit(1)
 
+def open_markdown_file(file_path):
+    """Opens the markdown file for streaming; iterating it yields one line at a time."""
+    print(f"Streaming content from {file_path}...")
+    try:
+        return open(file_path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        print(f"Error: Markdown file not found at {file_path}")
+        sys.exit(1)
+
+def call_server(args, path, payload):
+    """Sends an operation to the running server, which authenticates with its cached services."""
+    from remote import RemoteSession
+    print(f"Sending request to {args.server_url}{path}...")
+    payload = dict(payload, auth_mode=args.auth, creds_path=args.creds_path, token_path=args.token_path)
+    session = RemoteSession(args.server_url)
+    try:
+        return session.post(path, payload)
+    finally:
+        session.close()
+
 # --- Command Handlers ---
 def handle_clear(args):
     """Handles the logic for the 'clear' command."""
-    services = get_services(args)
-    print(f"Clearing content from document ID: {args.doc_id}...")
-    result = google_docs_tool.clear_google_doc(services['docs'], args.doc_id)
+    if args.remote:
+        result = call_server(args, "/clear-doc", {"document_id": args.doc_id})
+    else:
+        from tool import google_docs_tool
+        services = get_services(args)
+        print(f"Clearing content from document ID: {args.doc_id}...")
+        result = google_docs_tool.clear_google_doc(services['docs'], args.doc_id)
     if result.get("status") == "success":
         print("\n--- Success! ---")
         print(result.get("message"))
@@ -49,13 +73,16 @@ def handle_clear(args):
 
 def handle_replace_markdown(args):
     """Handles the logic for the 'replace-markdown' command."""
-    services = get_services(args)
-    
     print("Building replacements map...")
     replacements = {p: read_markdown_file(f) for p, f in args.replace}
-    
-    print(f"Replacing placeholders in document ID: {args.doc_id}...")
-    result = google_docs_tool.replace_markdown_placeholders(services['docs'], args.doc_id, replacements)
+
+    if args.remote:
+        result = call_server(args, "/replace-markdown", {"document_id": args.doc_id, "replacements": replacements})
+    else:
+        from tool import google_docs_tool
+        services = get_services(args)
+        print(f"Replacing placeholders in document ID: {args.doc_id}...")
+        result = google_docs_tool.replace_markdown_placeholders(services['docs'], args.doc_id, replacements)
     
     if result.get("status") == "success":
         print("\n--- Success! ---")
@@ -65,18 +92,40 @@ def handle_replace_markdown(args):
 
 def handle_write(args):
     """Handles the logic for the 'write' command."""
-    services = get_services(args)
-    markdown_content = read_markdown_file(args.md_path)
-    
-    print("Calling the write tool...")
-    result = google_docs_tool.write_to_google_doc(
-        docs_service=services['docs'],
-        drive_service=services['drive'],
-        markdown_content=markdown_content,
-        document_id=args.doc_id,
-        title=args.title,
-        folder_id=args.folder_id
-    )
+    resume_from = None
+    if args.resume_from is not None:
+        if not args.doc_id:
+            print("Error: --resume-from requires --doc-id.")
+            sys.exit(1)
+        resume_from = {"document_id": args.doc_id, "completed_requests": args.resume_from, "revision_id": args.resume_revision}
+
+    if args.remote:
+        # The server needs the whole markdown in the request body, so --stream does not apply.
+        result = call_server(args, "/write-markdown", {
+            "markdown_text": read_markdown_file(args.md_path),
+            "document_id": args.doc_id,
+            "title": args.title,
+            "folder_id": args.folder_id,
+            "incremental": args.incremental,
+            "resume_from": resume_from
+        })
+    else:
+        from tool import google_docs_tool
+        services = get_services(args)
+        markdown_content = open_markdown_file(args.md_path) if args.stream else read_markdown_file(args.md_path)
+        print("Calling the write tool...")
+        result = google_docs_tool.write_to_google_doc(
+            docs_service=services['docs'],
+            drive_service=services['drive'],
+            markdown_content=markdown_content,
+            document_id=args.doc_id,
+            title=args.title,
+            folder_id=args.folder_id,
+            resume_from=resume_from,
+            incremental=args.incremental
+        )
+        if args.stream:
+            markdown_content.close()
     
     if result.get("status") == "success":
         print("\n--- Success! ---")
@@ -85,18 +134,26 @@ def handle_write(args):
             print(f"Document ID: {result.get('document_id')}")
     else:
         print(f"\n--- Tool Error---\n{result.get('message')}")
+        token = result.get("resume_from")
+        if token and token.get("completed_requests"):
+            print(f"To resume this write, rerun with: --doc-id {token['document_id']} --resume-from {token['completed_requests']} --resume-revision {token['revision_id']}")
 
 def handle_append(args):
     """Handles the logic for the 'append' command."""
-    services = get_services(args)
-    markdown_content = read_markdown_file(args.md_path)
-    
-    print(f"Appending content to document ID: {args.doc_id}...")
-    result = google_docs_tool.append_to_google_doc(
-        docs_service=services['docs'],
-        document_id=args.doc_id,
-        markdown_content=markdown_content
-    )
+    if args.remote:
+        result = call_server(args, "/append-markdown", {"document_id": args.doc_id, "markdown_text": read_markdown_file(args.md_path)})
+    else:
+        from tool import google_docs_tool
+        services = get_services(args)
+        markdown_content = open_markdown_file(args.md_path) if args.stream else read_markdown_file(args.md_path)
+        print(f"Appending content to document ID: {args.doc_id}...")
+        result = google_docs_tool.append_to_google_doc(
+            docs_service=services['docs'],
+            document_id=args.doc_id,
+            markdown_content=markdown_content
+        )
+        if args.stream:
+            markdown_content.close()
     
     if result.get("status") == "success":
         print("\n--- Success! ---")
@@ -105,6 +162,38 @@ def handle_append(args):
         print(f"\n--- Tool Error---\n{result.get('message')}")
 
 
+def handle_sync(args):
+    """Handles the logic for the 'sync' command."""
+    if not os.path.isdir(args.md_dir):
+        print(f"Error: Directory not found at {args.md_dir}")
+        sys.exit(1)
+    if args.remote:
+        print("Error: sync runs locally and does not support --remote.")
+        sys.exit(1)
+    import sync
+    services = get_services(args)
+
+    print(f"Syncing markdown files in {args.md_dir}...")
+    result = sync.sync_directory(
+        services,
+        args.md_dir,
+        manifest_path=args.manifest,
+        folder_id=args.folder_id,
+        max_workers=args.workers,
+        force=args.force,
+        incremental=args.incremental
+    )
+    for item in result["pushed"]:
+        print(f"  [{item['status']}] {item['path']} -> {item['document_id']} ({item['seconds']}s)")
+        if item["status"] != "success":
+            print(f"      {item['message']}")
+
+    if result.get("status") == "success":
+        print("\n--- Success! ---")
+    else:
+        print("\n--- Tool Error---")
+    print(result.get("message"))
+    print(f"Manifest: {result['manifest_path']}")
 
 # --- Main Function ---
 def main():
@@ -116,6 +205,8 @@ def main():
     auth_parser.add_argument("--auth", type=str, choices=['service_account', 'oauth'], required=True, help="Authentication method.")
     auth_parser.add_argument("--creds-path", type=str, required=True, help="Path to credentials JSON file.")
     auth_parser.add_argument("--token-path", default="credentials/token.json", help="(For OAuth) Path to store the token.json file.")
+    auth_parser.add_argument("--remote", action="store_true", help="Send the operation to the running server instead of authenticating locally (paths are resolved by the server).")
+    auth_parser.add_argument("--server-url", default=SERVER_BASE_URL, help=f"Server used by --remote (default: {SERVER_BASE_URL}).")
 
     parser_clear = subparsers.add_parser('clear', help='Clear all content from a specified Google Doc.', parents=[auth_parser])
     parser_clear.add_argument("doc_id", help="The ID of the Google Doc to clear.")
@@ -131,13 +222,27 @@ def main():
     parser_write.add_argument("--doc-id", help="The ID of an existing Google Doc to overwrite.")
     parser_write.add_argument("--title", help="The title for a new Google Doc.")
     parser_write.add_argument("--folder-id", help="The ID of a parent folder for a new Google Doc.")
+    parser_write.add_argument("--stream", action="store_true", help="Read and send the markdown file incrementally (for very large files).")
+    parser_write.add_argument("--incremental", action="store_true", help="Only rewrite the paragraphs that changed in an existing Google Doc (requires --doc-id).")
+    parser_write.add_argument("--resume-from", type=int, help="Resume a failed write after this many applied requests (skips the clear).")
+    parser_write.add_argument("--resume-revision", help="The last confirmed revision ID reported by the failed write.")
     parser_write.set_defaults(func=handle_write)
 
     parser_append = subparsers.add_parser('append', help='Append markdown content to the end of a Google Doc.', parents=[auth_parser])
     parser_append.add_argument("doc_id", help="The ID of the Google Doc to append to.")
     parser_append.add_argument("md_path", help="Path to the markdown file to append.")
+    parser_append.add_argument("--stream", action="store_true", help="Read and send the markdown file incrementally (for very large files).")
     parser_append.set_defaults(func=handle_append)
 
+    parser_sync = subparsers.add_parser('sync', help='Sync a directory of markdown files to Google Docs, skipping unchanged files.', parents=[auth_parser])
+    parser_sync.add_argument("md_dir", help="Directory containing the markdown files to sync.")
+    parser_sync.add_argument("--manifest", help=f"Path to the sync manifest (default: <md_dir>/{MANIFEST_NAME}).")
+    parser_sync.add_argument("--folder-id", help="The ID of a parent folder for newly created Google Docs.")
+    parser_sync.add_argument("--workers", type=int, default=4, help="Number of files pushed concurrently.")
+    parser_sync.add_argument("--force", action="store_true", help="Push every file, even if its content has not changed.")
+    parser_sync.add_argument("--incremental", action="store_true", help="Only rewrite the paragraphs that changed in existing documents.")
+    parser_sync.set_defaults(func=handle_sync)
+
     args = parser.parse_args()
     args.func(args)
 
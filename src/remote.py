@@ -0,0 +1,66 @@
+import http.client
+import json
+from urllib.parse import urlsplit
+
+# --- Remote Mode ---
+# Sends operations to a running MCP server, which already holds authorized services, instead of
+# authenticating in this process. Only the standard library is used, so a remote invocation does
+# not pay for importing the Google client libraries.
+
+DEFAULT_TIMEOUT = 600
+
+class RemoteSession:
+    """Posts JSON operations to the server over one keep-alive HTTP connection."""
+
+    def __init__(self, base_url: str, timeout: float = DEFAULT_TIMEOUT):
+        parts = urlsplit(base_url)
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._host = parts.netloc
+        self._prefix = parts.path.rstrip('/')
+        self._timeout = timeout
+        self._connection = None
+        self._reused = False
+
+    def post(self, path: str, payload: dict) -> dict:
+        """Returns the server's result for an operation, or an error result if it failed."""
+        body = json.dumps(payload).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+        while True:
+            if self._connection is None:
+                self._connection = self._connection_class(self._host, timeout=self._timeout)
+                self._reused = False
+            try:
+                self._connection.request('POST', self._prefix + path, body=body, headers=headers)
+                response = self._connection.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                # A kept-alive connection may have been closed by the server while idle; retry
+                # once on a fresh connection, but never resend on a connection that was new.
+                reused = self._reused
+                self.close()
+                if reused:
+                    continue
+                return {"status": "error", "message": f"Lost connection to the server: {e}"}
+            except OSError as e:
+                self.close()
+                return {"status": "error", "message": f"Could not reach the server at {self._host}: {e}"}
+            self._reused = True
+            if response.will_close:
+                self.close()
+            return self._result(response.status, data)
+
+    @staticmethod
+    def _result(status: int, data: bytes) -> dict:
+        try:
+            result = json.loads(data) if data else {}
+        except ValueError:
+            result = {}
+        if status >= 400:
+            detail = result.get("detail") if isinstance(result, dict) else None
+            return {"status": "error", "message": f"Server returned HTTP {status}: {detail or data.decode('utf-8', 'replace')}"}
+        return result
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
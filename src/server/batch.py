@@ -0,0 +1,59 @@
+import time
+from collections import OrderedDict
+
+def group_operations(operations: list) -> list:
+    """Groups operation indices so that operations on the same document stay in order.
+
+    Operations without a document ID (e.g. creating a new document) each form their own group.
+    """
+    groups = OrderedDict()
+    for index, operation in enumerate(operations):
+        document_id = operation.get('document_id')
+        key = ('document', document_id) if document_id else ('single', index)
+        groups.setdefault(key, []).append(index)
+    return list(groups.values())
+
+def run_batch(operations: list, run_operation, executor) -> dict:
+    """Runs operation dicts concurrently on executor, one task per document, and collects results.
+
+    run_operation(operation) must return a tool result dict. Results are returned in the order
+    the operations were given, each with its own timing.
+    """
+    results = [None] * len(operations)
+
+    def run_group(indices):
+        for index in indices:
+            operation = operations[index]
+            started = time.perf_counter()
+            try:
+                result = run_operation(operation)
+            except Exception as e:
+                result = {"status": "error", "message": str(e)}
+            results[index] = {
+                "index": index,
+                "op": operation.get('op'),
+                "document_id": result.get("document_id", operation.get('document_id')),
+                "status": result.get("status", "error"),
+                "result": result,
+                "seconds": round(time.perf_counter() - started, 4),
+            }
+
+    started = time.perf_counter()
+    futures = [executor.submit(run_group, indices) for indices in group_operations(operations)]
+    for future in futures:
+        future.result()
+
+    failed = sum(1 for result in results if result["status"] != "success")
+    if not failed:
+        status = "success"
+    elif failed == len(results):
+        status = "error"
+    else:
+        status = "partial"
+    return {
+        "status": status,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "seconds": round(time.perf_counter() - started, 4),
+        "results": results,
+    }
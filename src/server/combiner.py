@@ -0,0 +1,74 @@
+import threading
+
+# Appends to one document joined with a blank line render exactly like the same appends made one
+# after another, because every append starts with a newline when the document is not empty.
+APPEND_SEPARATOR = "\n\n"
+DEFAULT_FLUSH_WINDOW = 0.0
+MAX_COMBINED_APPENDS = 100
+
+class _Group:
+    def __init__(self):
+        self.texts = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.previous = None
+        self.result = None
+
+class AppendCombiner:
+    """Merges appends to the same key that arrive while an earlier append for it is writing.
+
+    An append for a key with no write in flight is sent at once. Appends that arrive while one
+    is writing collect in a group, which is sent as a single append of every text in arrival
+    order once that write finishes (or after flush_window seconds more, if set, to let a burst
+    grow). Every caller gets a copy of its group's result. Groups for the same key run one after
+    another in the order they were opened; a group holds at most max_appends texts.
+    """
+
+    def __init__(self, flush_window: float = DEFAULT_FLUSH_WINDOW, max_appends: int = MAX_COMBINED_APPENDS):
+        self.flush_window = flush_window
+        self.max_appends = max_appends
+        self._open = {}
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, markdown_text: str, append) -> dict:
+        """Appends markdown_text, combined with others for key; append(text) performs the write."""
+        with self._lock:
+            group = self._open.get(key)
+            leader = group is None
+            if leader:
+                group = self._open[key] = _Group()
+                group.previous = self._last.get(key)
+                self._last[key] = group
+            group.texts.append(markdown_text)
+            if len(group.texts) >= self.max_appends:
+                # Later appends for the key start a new group.
+                del self._open[key]
+                group.full.set()
+        if not leader:
+            group.done.wait()
+            return self._result(group)
+
+        # The group stays open to later appends while the previous write for the key runs.
+        if group.previous is not None:
+            group.previous.done.wait()
+            group.previous = None
+        if self.flush_window > 0:
+            group.full.wait(self.flush_window)
+        with self._lock:
+            if self._open.get(key) is group:
+                del self._open[key]
+        try:
+            group.result = append(APPEND_SEPARATOR.join(group.texts))
+        except Exception as e:
+            group.result = {"status": "error", "message": f"An unexpected error occurred during the append process: {e}"}
+        finally:
+            with self._lock:
+                if self._last.get(key) is group:
+                    del self._last[key]
+            group.done.set()
+        return self._result(group)
+
+    @staticmethod
+    def _result(group: _Group) -> dict:
+        return dict(group.result, combined_appends=len(group.texts))
@@ -0,0 +1,112 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+class JobQueue:
+    """Runs jobs on a bounded worker pool, strictly ordering jobs that share a key.
+
+    Jobs with the same key (a document ID) run one after another in submission order, while jobs
+    for different keys run in parallel. A key of None is never serialized.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 100, max_finished: int = 1000):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="docs-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._waiting = {}
+        self._pending = 0
+        self._running = 0
+
+    def submit(self, key, func, *args, **kwargs) -> str:
+        """Queues func(*args, **kwargs) and returns the new job ID."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({self.max_pending} pending jobs).")
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "key": key,
+                "status": "queued",
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                "_call": (func, args, kwargs),
+            }
+            self._jobs[job_id] = job
+            self._pending += 1
+            if key is not None and key in self._waiting:
+                # Another job for this key is queued or running; run after it.
+                self._waiting[key].append(job_id)
+                return job_id
+            if key is not None:
+                self._waiting[key] = deque()
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def _run(self, job_id: str):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            self._pending -= 1
+            self._running += 1
+            func, args, kwargs = job.pop("_call")
+        try:
+            result = func(*args, **kwargs)
+            failed = isinstance(result, dict) and result.get("status") == "error"
+            status, error = ("failed" if failed else "succeeded"), None
+        except Exception as e:
+            result, status, error = None, "failed", str(e)
+
+        next_job_id = None
+        with self._lock:
+            job.update(status=status, result=result, error=error, finished_at=time.time())
+            self._running -= 1
+            self._finished[job_id] = True
+            while len(self._finished) > self._max_finished:
+                old_job_id, _ = self._finished.popitem(last=False)
+                self._jobs.pop(old_job_id, None)
+            key = job["key"]
+            if key is not None:
+                waiting = self._waiting[key]
+                if waiting:
+                    next_job_id = waiting.popleft()
+                else:
+                    del self._waiting[key]
+        if next_job_id is not None:
+            self._executor.submit(self._run, next_job_id)
+
+    def get(self, job_id: str):
+        """Returns a snapshot of a job, or None if it is unknown or has been evicted."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = {k: v for k, v in job.items() if not k.startswith("_")}
+        snapshot["document_id"] = snapshot.pop("key")
+        return snapshot
+
+    def depth(self) -> dict:
+        """Returns queue depth figures that callers can use for backpressure."""
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "running": self._running,
+                "max_pending": self.max_pending,
+                "max_workers": self.max_workers,
+                "serialized_documents": len(self._waiting),
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
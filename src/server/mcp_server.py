@@ -1,17 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 import uvicorn
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Literal, Optional
 import argparse
 import sys
 import os
+import time
 
 # --- Path Correction ---
 SRC_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, SRC_PATH)
 
-from tool import google_docs_tool
+from tool import google_docs_tool, markdown_parser, telemetry
 from src import auth
+from src.server.service_cache import ServiceCache
+from src.server.jobs import JobQueue, QueueFullError
+from src.server.batch import run_batch
+from src.server.combiner import AppendCombiner
+from src.server import metrics
 
 # --- FastAPI App ---
 app = FastAPI(
@@ -20,6 +28,28 @@ app = FastAPI(
     version="1.1.0", # Version bump
 )
 
+# Tool functions report phase timings and API counters into this registry; GET /metrics renders it.
+metrics_registry = metrics.create_registry()
+telemetry.set_sink(metrics_registry)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template keeps label values bounded (/jobs/{job_id}, not every job ID).
+        route = request.scope.get("route")
+        metrics_registry.get("http_request_seconds").observe(
+            time.perf_counter() - started,
+            endpoint=getattr(route, "path", "unmatched"),
+            method=request.method,
+            status=str(status)
+        )
+
 # --- Pydantic Models ---
 class AuthInfo(BaseModel):
     auth_mode: str
@@ -33,69 +63,221 @@ class AppendMarkdownRequest(AuthInfo):
     document_id: str
     markdown_text: str
 
+class WriteMarkdownRequest(AuthInfo):
+    markdown_text: str
+    document_id: Optional[str] = None
+    title: Optional[str] = "Untitled Document"
+    folder_id: Optional[str] = None
+    incremental: bool = False
+    resume_from: Optional[Dict[str, Any]] = None
+
+class ReplaceMarkdownRequest(AuthInfo):
+    document_id: str
+    replacements: Dict[str, str]
+
 class CreateRequest(AuthInfo):
     title: str
     folder_id: Optional[str] = None
 
+class BatchOperation(BaseModel):
+    op: Literal['create', 'clear', 'append', 'write', 'replace']
+    document_id: Optional[str] = None
+    title: Optional[str] = None
+    folder_id: Optional[str] = None
+    markdown_text: Optional[str] = None
+    replacements: Optional[Dict[str, str]] = None
+    incremental: bool = False
+    resume_from: Optional[Dict[str, Any]] = None
+
+class BatchRequest(AuthInfo):
+    operations: List[BatchOperation]
+
 # --- Helper to get services ---
+def build_services(auth_mode: str, creds_path: str, token_path: Optional[str]) -> Dict[str, Any]:
+    if auth_mode == 'service_account':
+        return auth.get_services_with_service_account(creds_path)
+    return auth.get_services_with_oauth(creds_path, token_path)
+
+# Building services re-reads credentials and discovery documents, so they are reused across requests.
+service_cache = ServiceCache(factory=build_services, token_version=auth.credential_store.source_version)
+
 def get_services(auth_info: AuthInfo) -> Dict[str, Any]:
-    if auth_info.auth_mode == 'service_account':
-        return auth.get_services_with_service_account(auth_info.creds_path)
-    elif auth_info.auth_mode == 'oauth':
-        return auth.get_services_with_oauth(auth_info.creds_path, auth_info.token_path)
-    raise HTTPException(status_code=400, detail="Invalid auth_mode specified.")
+    if auth_info.auth_mode not in ('service_account', 'oauth'):
+        raise HTTPException(status_code=400, detail="Invalid auth_mode specified.")
+    token_path = auth_info.token_path if auth_info.auth_mode == 'oauth' else None
+    with telemetry.timed('phase_seconds', phase='auth'):
+        return service_cache.get(auth_info.auth_mode, auth_info.creds_path, token_path)
 
-# --- API Endpoints ---
+# Jobs submitted with ?async_job=true run here; jobs for the same document run in order.
+job_queue = JobQueue(max_workers=4, max_pending=100)
 
-@app.post("/create-doc", summary="Create a new Google Doc")
-def create_new_document(request: CreateRequest):
+# --- Operations ---
+def run_create(request: CreateRequest) -> Dict[str, Any]:
+    services = get_services(request)
+    return google_docs_tool.create_doc(
+        drive_service=services['drive'],
+        title=request.title,
+        folder_id=request.folder_id
+    )
+
+# Appends to one document that arrive while an earlier one is writing become a single batchUpdate.
+append_combiner = AppendCombiner()
+
+def combined_append(services: Dict[str, Any], auth_info: AuthInfo, document_id: str, markdown_text: str) -> Dict[str, Any]:
+    """Appends through append_combiner, so /append-markdown and /batch appends to a document combine."""
+    key = (auth_info.auth_mode, auth_info.creds_path, auth_info.token_path, document_id)
+    return append_combiner.submit(key, markdown_text, lambda text: google_docs_tool.append_to_google_doc(
+        docs_service=services['docs'],
+        document_id=document_id,
+        markdown_content=text
+    ))
+
+def run_append(request: AppendMarkdownRequest) -> Dict[str, Any]:
+    services = get_services(request)
+    return combined_append(services, request, request.document_id, request.markdown_text)
+
+def run_write(request: WriteMarkdownRequest) -> Dict[str, Any]:
+    services = get_services(request)
+    return google_docs_tool.write_to_google_doc(
+        docs_service=services['docs'],
+        drive_service=services['drive'],
+        markdown_content=request.markdown_text,
+        title=request.title or "Untitled Document",
+        document_id=request.document_id,
+        folder_id=request.folder_id,
+        resume_from=request.resume_from,
+        incremental=request.incremental
+    )
+
+def run_replace(request: ReplaceMarkdownRequest) -> Dict[str, Any]:
+    services = get_services(request)
+    return google_docs_tool.replace_markdown_placeholders(
+        docs_service=services['docs'],
+        document_id=request.document_id,
+        replacements=request.replacements
+    )
+
+def run_clear(request: ClearRequest) -> Dict[str, Any]:
+    services = get_services(request)
+    return google_docs_tool.clear_google_doc(
+        docs_service=services['docs'],
+        document_id=request.document_id
+    )
+
+def dispatch(operation, request, document_id: Optional[str], async_job: bool):
+    """Runs an operation inline, or queues it and answers 202 with a job ID when async_job is set."""
     try:
-        services = get_services(request)
-        result = google_docs_tool.create_doc(
-            drive_service=services['drive'],
-            title=request.title,
-            folder_id=request.folder_id
-        )
+        if async_job:
+            try:
+                job_id = job_queue.submit(document_id, operation, request)
+            except QueueFullError as e:
+                raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+            return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued", "queue": job_queue.depth()})
+        result = operation(request)
         if result["status"] == "error":
             raise HTTPException(status_code=500, detail=result["message"])
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/append-markdown", summary="Append markdown-formatted text to a document")
-def append_markdown(request: AppendMarkdownRequest):
-    try:
-        services = get_services(request)
-        result = google_docs_tool.process_markdown_v2(
+def run_batch_operation(services: Dict[str, Any], auth_info: AuthInfo, operation: Dict[str, Any]) -> Dict[str, Any]:
+    op = operation['op']
+    document_id = operation.get('document_id')
+    if op == 'create':
+        return google_docs_tool.create_doc(services['drive'], operation.get('title') or "Untitled Document", operation.get('folder_id'))
+    if op == 'write':
+        return google_docs_tool.write_to_google_doc(
             docs_service=services['docs'],
-            document_id=request.document_id,
-            markdown_text=request.markdown_text
+            drive_service=services['drive'],
+            markdown_content=operation.get('markdown_text') or "",
+            title=operation.get('title') or "Untitled Document",
+            document_id=document_id,
+            folder_id=operation.get('folder_id'),
+            resume_from=operation.get('resume_from'),
+            incremental=operation.get('incremental', False)
         )
-        if result["status"] == "error":
-            raise HTTPException(status_code=500, detail=result["message"])
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    if not document_id:
+        return {"status": "error", "message": f"Operation '{op}' requires a document_id."}
+    if op == 'clear':
+        return google_docs_tool.clear_google_doc(services['docs'], document_id)
+    if op == 'append':
+        return combined_append(services, auth_info, document_id, operation.get('markdown_text') or "")
+    return google_docs_tool.replace_markdown_placeholders(services['docs'], document_id, operation.get('replacements') or {})
+
+# Operations from /batch run here; one task per document keeps that document's operations in order.
+BATCH_MAX_WORKERS = 8
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix="docs-batch")
+
+# --- API Endpoints ---
+
+@app.post("/create-doc", summary="Create a new Google Doc")
+def create_new_document(request: CreateRequest, async_job: bool = False):
+    return dispatch(run_create, request, None, async_job)
+
+@app.post("/append-markdown", summary="Append markdown-formatted text to a document")
+def append_markdown(request: AppendMarkdownRequest, async_job: bool = False):
+    return dispatch(run_append, request, request.document_id, async_job)
+
+@app.post("/write-markdown", summary="Write markdown to a new document or overwrite an existing one")
+def write_markdown(request: WriteMarkdownRequest, async_job: bool = False):
+    return dispatch(run_write, request, request.document_id, async_job)
+
+@app.post("/replace-markdown", summary="Replace placeholders with formatted markdown")
+def replace_markdown(request: ReplaceMarkdownRequest, async_job: bool = False):
+    return dispatch(run_replace, request, request.document_id, async_job)
 
 @app.post("/clear-doc", summary="Clear all content from a document")
-def clear_document(request: ClearRequest):
+def clear_document(request: ClearRequest, async_job: bool = False):
+    return dispatch(run_clear, request, request.document_id, async_job)
+
+@app.post("/batch", summary="Run many create/clear/append/write/replace operations in one call")
+def run_batch_operations(request: BatchRequest):
     try:
         services = get_services(request)
-        result = google_docs_tool.clear_google_doc(
-            docs_service=services['docs'],
-            document_id=request.document_id
-        )
-        if result["status"] == "error":
-            raise HTTPException(status_code=500, detail=result["message"])
-        return result
+        operations = [operation.model_dump() for operation in request.operations]
+        return run_batch(operations, lambda operation: run_batch_operation(services, request, operation), batch_executor)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/jobs", summary="Show job queue depth")
+def get_queue_depth():
+    return job_queue.depth()
+
+@app.get("/jobs/{job_id}", summary="Poll the status and result of an async job")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job
+
+@app.get("/metrics", summary="Prometheus metrics for latency, phases and Google API usage", response_class=PlainTextResponse)
+def get_metrics():
+    depth = job_queue.depth()
+    jobs = metrics_registry.get("jobs")
+    jobs.set(depth["pending"], state="pending")
+    jobs.set(depth["running"], state="running")
+    metrics_registry.get("cached_services").set(len(service_cache))
+    return PlainTextResponse(metrics_registry.render(), media_type=metrics.CONTENT_TYPE)
+
 def main():
     """This function is the entry point for the command-line script."""
     parser = argparse.ArgumentParser(description="Google Docs MCP Tool Server")
     parser.add_argument("--port", type=int, default=8080, help="Port to run the server on")
+    parser.add_argument("--job-workers", type=int, default=4, help="Worker threads for async jobs")
+    parser.add_argument("--max-pending-jobs", type=int, default=100, help="Queued async jobs accepted before answering 503")
+    parser.add_argument("--batch-workers", type=int, default=BATCH_MAX_WORKERS, help="Worker threads shared by /batch requests")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Processes for planning very large markdown in parallel (0 keeps it serial)")
+    parser.add_argument("--append-flush-window", type=float, default=append_combiner.flush_window, help="Extra seconds to hold appends that wait behind a write to the same document, so more combine (default 0)")
     args = parser.parse_args()
+    global job_queue, batch_executor
+    append_combiner.flush_window = args.append_flush_window
+    markdown_parser.set_parse_workers(args.parse_workers)
+    job_queue = JobQueue(max_workers=args.job_workers, max_pending=args.max_pending_jobs)
+    batch_executor = ThreadPoolExecutor(max_workers=args.batch_workers, thread_name_prefix="docs-batch")
     uvicorn.run(app, host="127.0.0.1", port=args.port)
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+import math
+import threading
+
+# --- Metrics Registry ---
+# A minimal in-process registry rendered in the Prometheus text exposition format (0.0.4), so
+# /metrics can be scraped without adding a client library. It also acts as the sink for
+# tool.telemetry: observations and counts are routed to the metric declared under their name.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    # Counter samples are exposed with the conventional _total suffix.
+    kind = "counter"
+    suffix = "_total"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> list:
+        name = self.name + self.suffix
+        lines = [f"# HELP {name} {self.help_text}", f"# TYPE {name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Gauge(Counter):
+    kind = "gauge"
+    suffix = ""
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(tuple(sorted(labels.items())))
+            return series['count'] if series else 0
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, series['counts']):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+class MetricsRegistry:
+    """Holds the server's metrics and receives tool.telemetry observations by name."""
+
+    def __init__(self, prefix: str = "docs_tool"):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(f"{self.prefix}_{name}", help_text))
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._register(Gauge(f"{self.prefix}_{name}", help_text))
+
+    def histogram(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.prefix}_{name}", help_text, buckets))
+
+    def get(self, name: str):
+        with self._lock:
+            return self._metrics.get(f"{self.prefix}_{name}")
+
+    # --- tool.telemetry sink ---
+    def observe(self, name: str, value: float, labels: dict):
+        metric = self.get(name)
+        if isinstance(metric, Histogram):
+            metric.observe(value, **labels)
+
+    def count(self, name: str, value: float, labels: dict):
+        metric = self.get(name)
+        if isinstance(metric, Counter):
+            metric.inc(value, **labels)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+def create_registry() -> MetricsRegistry:
+    """Builds the registry with every metric the server and the tool functions report."""
+    registry = MetricsRegistry()
+    registry.histogram("http_request_seconds", "Latency of HTTP requests by endpoint, method and status.")
+    registry.histogram("phase_seconds", "Time spent per phase: auth, parse, and each Google API method.")
+    registry.counter("requests_emitted", "Docs API requests sent in batchUpdate calls.")
+    registry.counter("bytes_sent", "Serialized bytes of batchUpdate request bodies.")
+    registry.counter("api_errors", "Google API errors by method and HTTP status code.")
+    registry.counter("api_retries", "Google API calls retried by method and HTTP status code.")
+    registry.counter("snapshot_lookups", "Document snapshot lookups by result (hit or miss).")
+    registry.gauge("jobs", "Async jobs by state.")
+    registry.gauge("cached_services", "Authorized service sets held in the service cache.")
+    return registry
@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+def file_fingerprint(path: str):
+    """Returns (mtime_ns, size) for a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class ServiceCache:
+    """Keeps authorized Docs/Drive service objects, keyed by (auth_mode, creds_path, token_path).
+
+    Entries expire after ttl_seconds, the least recently used entry is evicted once max_entries is
+    exceeded, and an entry is rebuilt as soon as its credential or token file changes on disk:
+    the credential store then loads new credentials, and services built on the old ones would
+    stop being refreshed in the background. token_version(token_path) says whether the token
+    changed; pass the credential store's source_version so its own refreshes keep the services.
+    """
+
+    def __init__(self, factory, max_entries: int = 16, ttl_seconds: float = 3600.0, clock=time.monotonic, token_version=file_fingerprint):
+        self._factory = factory
+        self._token_version = token_version
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, auth_mode: str, creds_path: str, token_path: str = None) -> dict:
+        """Returns cached services for the key, building them with the factory on a miss."""
+        key = (auth_mode, creds_path, token_path)
+        fingerprint = (file_fingerprint(creds_path), self._token_version(token_path))
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                services, created_at, cached_fingerprint = entry
+                if now - created_at < self._ttl_seconds and cached_fingerprint == fingerprint:
+                    self._entries.move_to_end(key)
+                    return services
+                del self._entries[key]
+
+        # Build outside the lock so a slow authentication does not block other keys.
+        services = self._factory(auth_mode, creds_path, token_path)
+        # Building may have loaded the token, which gives it a new version.
+        fingerprint = (file_fingerprint(creds_path), self._token_version(token_path))
+        with self._lock:
+            self._entries[key] = (services, now, fingerprint)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return services
+
+    def invalidate(self, auth_mode: str = None, creds_path: str = None, token_path: str = None):
+        """Drops one entry, or every entry when called without arguments."""
+        with self._lock:
+            if auth_mode is None:
+                self._entries.clear()
+            else:
+                self._entries.pop((auth_mode, creds_path, token_path), None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tool import google_docs_tool
+
+# --- Directory Sync ---
+# Maps every markdown file under a directory to a Google Doc. A manifest stores the content hash
+# and last revision of each file's document, so unchanged files are skipped on the next run. A
+# failed write still records its document, without a hash, so the next run writes into that
+# document (resuming where it stopped if the file is unchanged) instead of creating another one.
+
+MANIFEST_NAME = ".docs-sync.json"
+MANIFEST_VERSION = 1
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def find_markdown_files(directory: str) -> list:
+    """Returns the paths of all .md files under directory, relative to it and sorted."""
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in files:
+            if name.endswith('.md'):
+                found.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(found)
+
+def load_manifest(manifest_path: str) -> dict:
+    if not os.path.exists(manifest_path):
+        return {"version": MANIFEST_VERSION, "files": {}}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest.setdefault("files", {})
+    return manifest
+
+def save_manifest(manifest_path: str, manifest: dict):
+    """Writes the manifest atomically so an interrupted sync never leaves it half-written."""
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False, sort_keys=True)
+    os.replace(temp_path, manifest_path)
+
+def sync_directory(services: dict, directory: str, manifest_path: str = None, folder_id: str = None,
+                   max_workers: int = 4, force: bool = False, incremental: bool = False) -> dict:
+    """Pushes new and changed markdown files in directory to their Google Docs.
+
+    Files whose content hash matches the manifest are skipped. Changed files are written
+    concurrently with the shared services; new files get a new document titled after the file.
+    """
+    manifest_path = manifest_path or os.path.join(directory, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    entries = manifest["files"]
+    lock = threading.Lock()
+
+    pending, skipped = [], []
+    for relative_path in find_markdown_files(directory):
+        digest = file_sha256(os.path.join(directory, relative_path))
+        entry = entries.get(relative_path)
+        if not force and entry and entry.get("sha256") == digest and entry.get("document_id"):
+            skipped.append(relative_path)
+        else:
+            entry = entry or {}
+            resume_from = entry.get("resume_from") if entry.get("resume_sha256") == digest else None
+            pending.append((relative_path, digest, entry.get("document_id"), resume_from))
+
+    def push(item):
+        relative_path, digest, document_id, resume_from = item
+        with open(os.path.join(directory, relative_path), 'r', encoding='utf-8') as f:
+            markdown_content = f.read()
+        title = os.path.splitext(os.path.basename(relative_path))[0]
+        started = time.perf_counter()
+        result = google_docs_tool.write_to_google_doc(
+            docs_service=services['docs'],
+            drive_service=services['drive'],
+            markdown_content=markdown_content,
+            title=title,
+            document_id=document_id,
+            folder_id=folder_id,
+            resume_from=resume_from,
+            incremental=incremental and bool(document_id)
+        )
+        if result.get("status") == "success":
+            with lock:
+                entries[relative_path] = {
+                    "document_id": result.get("document_id", document_id),
+                    "sha256": digest,
+                    "revision_id": result.get("revision_id"),
+                    "synced_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                }
+                save_manifest(manifest_path, manifest)
+        elif result.get("document_id"):
+            with lock:
+                failed_entry = {"document_id": result["document_id"]}
+                if result.get("resume_from"):
+                    failed_entry.update(resume_from=result["resume_from"], resume_sha256=digest)
+                entries[relative_path] = failed_entry
+                save_manifest(manifest_path, manifest)
+        return {
+            "path": relative_path,
+            "status": result.get("status"),
+            "document_id": result.get("document_id", document_id),
+            "message": result.get("message"),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pushed = list(executor.map(push, pending))
+
+    manifest["version"] = MANIFEST_VERSION
+    save_manifest(manifest_path, manifest)
+    failed = [item for item in pushed if item["status"] != "success"]
+    return {
+        "status": "error" if failed else "success",
+        "message": f"Synced {len(pushed) - len(failed)} files, skipped {len(skipped)} unchanged, {len(failed)} failed.",
+        "pushed": pushed,
+        "skipped": skipped,
+        "manifest_path": manifest_path,
+    }
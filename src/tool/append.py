@@ -1,36 +1,41 @@
-from . import markdown_parser
-from .operations import execute_batch_update
+import itertools
+from typing import Iterable, Union
+from . import markdown_parser, telemetry
+from .snapshots import update_at_end
 
-def append_to_google_doc(docs_service, document_id: str, markdown_content: str) -> dict:
-    """Appends formatted markdown content to the end of a Google Doc."""
+def append_to_google_doc(docs_service, document_id: str, markdown_content: Union[str, Iterable[str]]) -> dict:
+    """Appends formatted markdown content to the end of a Google Doc.
+
+    markdown_content may also be an iterable of lines, which is parsed and sent as it is read.
+    """
     try:
-        # First, get the current state of the document to find the end index
-        doc = docs_service.documents().get(documentId=document_id).execute()
-        body_content = doc.get('body', {}).get('content', [])
-        
-        # The end index of the last element is where we will start inserting.
-        # We subtract 1 because the very end is a final newline character.
-        # If the document is empty, we start at index 1.
-        end_index = 1
-        if len(body_content) > 1 and 'endIndex' in body_content[-1]:
-            end_index = body_content[-1]['endIndex'] - 1
-
-        # Ensure there is a newline before appending new content if the doc is not empty
-        requests = []
-        if end_index > 1:
-            requests.append({
-                'insertText': {
-                    'location': {'index': end_index},
-                    'text': '\n'
-                }
-            })
-            end_index += 1 # Increment our start index to be after the newline
-
-        # Get the requests for the new markdown content
-        markdown_requests = markdown_parser.get_markdown_requests(markdown_content, end_index)
-        requests.extend(markdown_requests)
-        
-        return execute_batch_update(docs_service, document_id, requests)
+        streaming = not isinstance(markdown_content, str)
+
+        def build_requests(body_end_index):
+            # We insert before the final newline of the body; an empty document starts at index 1.
+            end_index = body_end_index - 1
+
+            # Ensure there is a newline before appending new content if the doc is not empty
+            prefix = []
+            if end_index > 1:
+                prefix.append({
+                    'insertText': {
+                        'location': {'index': end_index},
+                        'text': '\n'
+                    }
+                })
+                end_index += 1 # Increment our start index to be after the newline
+
+            # Get the requests for the new markdown content
+            if streaming:
+                return itertools.chain(prefix, markdown_parser.iter_markdown_requests(markdown_content, end_index)), None
+            with telemetry.timed('phase_seconds', phase='parse'):
+                plan = markdown_parser.cached_plan_markdown(markdown_content)
+            return markdown_parser.plan_to_requests(plan, end_index, prefix), end_index + markdown_parser.plan_length(plan) + 1
+
+        # The end index comes from our last write to the document when we made one, else from a
+        # read of the endIndex fields only. A stream can be read once, so it always reads.
+        return update_at_end(docs_service, document_id, build_requests, refresh=streaming)
 
     except Exception as e:
         return {"status": "error", "message": f"An unexpected error occurred during the append process: {e}"}
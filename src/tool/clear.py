@@ -1,15 +1,16 @@
-from .operations import execute_batch_update
+from .snapshots import update_at_end
 
 def clear_google_doc(docs_service, document_id: str) -> dict:
     """Deletes all content from a Google Doc."""
     try:
-        doc = docs_service.documents().get(documentId=document_id).execute()
-        body_content = doc.get('body', {}).get('content', [])
-        if len(body_content) > 1:
-            end_index = body_content[-1].get('endIndex', 1)
+        def build_requests(end_index):
             if end_index > 2:
-                requests = [{'deleteContentRange': {'range': {'startIndex': 1, 'endIndex': end_index - 1}}}]
-                return execute_batch_update(docs_service, document_id, requests)
-        return {"status": "success", "message": "Document is already empty."}
+                return [{'deleteContentRange': {'range': {'startIndex': 1, 'endIndex': end_index - 1}}}], 2
+            return [], end_index
+
+        result = update_at_end(docs_service, document_id, build_requests)
+        if result["status"] == "success" and not result.get("chunks"):
+            return {"status": "success", "message": "Document is already empty.", "revision_id": result.get("revision_id")}
+        return result
     except Exception as e:
         return {"status": "error", "message": f"An unexpected error occurred: {e}"}
@@ -0,0 +1,142 @@
+import io
+import re
+from html import escape
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
+from . import markdown_parser, telemetry
+from .operations import execute_once
+
+# --- Drive Import ---
+# A new document can be created with its content in one Drive upload: the markdown plan is
+# rendered to HTML and converted to a Google Doc on import, instead of creating an empty document
+# and filling it with batchUpdate requests. HTML collapses whitespace and needs well-formed list
+# nesting, so plans that rely on either are left to the batchUpdate path. The offline tests check
+# the HTML against a fake importer written to the same rules, not against Drive's converter.
+
+GOOGLE_DOC_MIME_TYPE = 'application/vnd.google-apps.document'
+HTML_MIME_TYPE = 'text/html'
+# Whitespace that HTML would collapse or drop: anything but a single inner space.
+COLLAPSED_WHITESPACE = re.compile(r'[^\S ]|  |^ | $')
+
+def _lines(plan):
+    """Yields (start, line, run_start) for every line of the plan text, without its newline.
+
+    run_start is the start of the list run the line belongs to, or None outside lists.
+    """
+    text, _, _, bullets = plan
+    start = 0
+    run = 0
+    while start < len(text):
+        end = text.index('\n', start)
+        while run < len(bullets) and bullets[run][1] <= start:
+            run += 1
+        in_list = run < len(bullets) and bullets[run][0] <= start
+        yield start, text[start:end], bullets[run][0] if in_list else None
+        start = end + 1
+
+def is_importable(plan) -> bool:
+    """Returns whether the HTML import renders the plan the same way its requests would."""
+    previous_level = 0
+    for start, line, run_start in _lines(plan):
+        if run_start is not None:
+            # A list item may only go one level deeper than the item before it.
+            level = len(line) - len(line.lstrip('\t'))
+            if level > (0 if start == run_start else previous_level + 1):
+                return False
+            previous_level = level
+            line = line[level:]
+        if COLLAPSED_WHITESPACE.search(line):
+            return False
+    return True
+
+def _inline_html(text: str, spans, offset: int) -> str:
+    parts = []
+    position = 0
+    for start, end, text_style in spans:
+        start, end = start - offset, end - offset
+        parts.append(escape(text[position:start]))
+        segment = escape(text[start:end])
+        if 'link' in text_style:
+            segment = f'<a href="{escape(text_style["link"]["url"])}">{segment}</a>'
+        if 'weightedFontFamily' in text_style:
+            segment = f'<span style="font-family:\'{escape(text_style["weightedFontFamily"]["fontFamily"])}\'">{segment}</span>'
+        if text_style.get('italic'):
+            segment = f'<i>{segment}</i>'
+        if text_style.get('bold'):
+            segment = f'<b>{segment}</b>'
+        parts.append(segment)
+        position = end
+    parts.append(escape(text[position:]))
+    return ''.join(parts)
+
+def plan_to_html(plan) -> str:
+    """Renders a (text, paragraph_styles, text_styles, bullets) plan as an HTML document."""
+    _, paragraph_styles, text_styles, _ = plan
+    headings = {start: style['namedStyleType'][-1] for start, _, style, _ in paragraph_styles}
+    spans = list(text_styles)
+    span_index = 0
+    parts = ['<html><head><meta charset="utf-8"></head><body>']
+    depth = 0
+
+    def close_lists():
+        nonlocal depth
+        while depth:
+            parts.append('</li></ul>')
+            depth -= 1
+
+    for start, line, run_start in _lines(plan):
+        end = start + len(line)
+        line_spans = []
+        while span_index < len(spans) and spans[span_index][0] < end:
+            line_spans.append(spans[span_index])
+            span_index += 1
+        if run_start is None:
+            close_lists()
+            content = _inline_html(line, line_spans, start) or '<br>'
+            tag = f'h{headings[start]}' if start in headings else 'p'
+            parts.append(f'<{tag}>{content}</{tag}>')
+            continue
+        if start == run_start:
+            close_lists()
+        level = len(line) - len(line.lstrip('\t'))
+        if level + 1 > depth:
+            parts.append('<ul><li>')
+            depth += 1
+        else:
+            while depth > level + 1:
+                parts.append('</li></ul>')
+                depth -= 1
+            parts.append('</li><li>')
+        parts.append(_inline_html(line[level:], line_spans, start + level))
+    close_lists()
+    # Text inserted with batchUpdate ends before the body's own final newline, which leaves one
+    # more empty paragraph; the imported document gets it too.
+    parts.append('<p><br></p></body></html>')
+    return ''.join(parts)
+
+def import_markdown_doc(drive_service, markdown_content: str, title: str, folder_id: str = None):
+    """Creates a Google Doc holding the rendered markdown with a single Drive upload.
+
+    Returns None when the markdown needs the batchUpdate path, either because the import would
+    render it differently or because Drive rejected the upload with a 4xx, so nothing was
+    created. files.create is not idempotent, so the upload is never retried: any other failure
+    may have created the document and is returned as an error instead of creating another one.
+    """
+    with telemetry.timed('phase_seconds', phase='parse'):
+        plan = markdown_parser.cached_plan_markdown(markdown_content)
+        if not is_importable(plan):
+            return None
+        html = plan_to_html(plan).encode('utf-8')
+
+    file_metadata = {'name': title, 'mimeType': GOOGLE_DOC_MIME_TYPE}
+    if folder_id:
+        file_metadata['parents'] = [folder_id]
+    media = MediaIoBaseUpload(io.BytesIO(html), mimetype=HTML_MIME_TYPE, resumable=False)
+    try:
+        file = execute_once(drive_service.files().create(body=file_metadata, media_body=media, fields='id'))
+    except Exception as e:
+        if isinstance(e, HttpError) and 400 <= e.resp.status < 500:
+            print(f"Warning: Importing the document was rejected, creating it with batchUpdate instead. {e}")
+            return None
+        return {"status": "error", "message": f"Importing the document failed and it may have been created: {e}"}
+    return {"status": "success", "document_id": file.get('id'), "imported": True}
@@ -5,12 +5,14 @@ It re-exports the main functions from the internal modules.
 
 from .append import append_to_google_doc
 from .clear import clear_google_doc
+from .operations import create_doc
 from .replace import replace_markdown_placeholders
 from .write import write_to_google_doc
 
 __all__ = [
     'append_to_google_doc',
     'clear_google_doc',
+    'create_doc',
     'replace_markdown_placeholders',
     'write_to_google_doc',
 ]
\ No newline at end of file
@@ -0,0 +1,209 @@
+import json
+from difflib import SequenceMatcher
+from . import markdown_parser
+
+# --- Incremental Overwrite ---
+# A paragraph is compared by its signature: (text, named style, indentStart, indentFirstLine,
+# styled ranges, bullet nesting level or None). List items take their indents from the list,
+# so their own indents are not compared. Paragraphs whose signature is unchanged are left untouched, so comments
+# anchored in them survive and a small edit only costs a few requests.
+
+PARAGRAPH_FIELDS = 'namedStyleType,indentStart,indentFirstLine'
+
+def _magnitude(paragraph_style: dict, field: str):
+    return paragraph_style.get(field, {}).get('magnitude')
+
+def _style_key(text_style: dict):
+    """Reduces a text style to the fields the parser sets, as a hashable JSON string (or None)."""
+    managed = {}
+    if text_style.get('bold'):
+        managed['bold'] = True
+    if text_style.get('italic'):
+        managed['italic'] = True
+    font = text_style.get('weightedFontFamily', {}).get('fontFamily')
+    if font == markdown_parser.CODE_FONT:
+        managed['weightedFontFamily'] = {'fontFamily': font}
+    url = text_style.get('link', {}).get('url')
+    if url:
+        managed['link'] = {'url': url}
+    return json.dumps(managed, sort_keys=True) if managed else None
+
+def _add_range(ranges: list, start: int, end: int, key):
+    """Appends a styled range, merging it with the previous one when they touch and match."""
+    if key is None or start >= end:
+        return
+    if ranges and ranges[-1][1] == start and ranges[-1][2] == key:
+        ranges[-1] = (ranges[-1][0], end, key)
+    else:
+        ranges.append((start, end, key))
+
+def document_paragraphs(doc: dict):
+    """Returns (signatures, start_indices, insert_index) for the body of a document.
+
+    The final paragraph cannot be deleted, so it is excluded from the comparison and its start
+    index is where content after the last kept paragraph is inserted. Returns None when the
+    body contains anything other than plain paragraphs or the final paragraph is not empty.
+    """
+    content = doc.get('body', {}).get('content', [])
+    paragraphs = [element for element in content if 'sectionBreak' not in element]
+    if not paragraphs or any('paragraph' not in element for element in paragraphs):
+        return None
+
+    signatures, starts = [], []
+    for element in paragraphs:
+        paragraph = element['paragraph']
+        text_parts, styled_ranges = [], []
+        offset = 0
+        for run in paragraph.get('elements', []):
+            if 'textRun' not in run:
+                return None
+            run_text = run['textRun'].get('content', '')
+            if run_text.endswith('\n'):
+                # The paragraph's newline is not part of any styled span the parser emits.
+                _add_range(styled_ranges, offset, offset + len(run_text) - 1, _style_key(run['textRun'].get('textStyle', {})))
+            else:
+                _add_range(styled_ranges, offset, offset + len(run_text), _style_key(run['textRun'].get('textStyle', {})))
+            text_parts.append(run_text)
+            offset += len(run_text)
+        text = ''.join(text_parts)
+        if text.endswith('\n'):
+            text = text[:-1]
+        paragraph_style = paragraph.get('paragraphStyle', {})
+        bullet = paragraph.get('bullet')
+        signatures.append((
+            text,
+            paragraph_style.get('namedStyleType', 'NORMAL_TEXT'),
+            None if bullet else _magnitude(paragraph_style, 'indentStart'),
+            None if bullet else _magnitude(paragraph_style, 'indentFirstLine'),
+            tuple(styled_ranges),
+            bullet.get('nestingLevel', 0) if bullet else None
+        ))
+        starts.append(element['startIndex'])
+
+    if signatures[-1][0]:
+        return None
+    return signatures[:-1], starts[:-1], starts[-1]
+
+def planned_paragraphs(markdown_content: str):
+    """Returns the paragraph signatures that writing markdown_content would produce."""
+    text, paragraph_styles, text_styles, bullets = markdown_parser.plan_markdown(markdown_content)
+    styles_by_start = {start: style for start, _, style, _ in paragraph_styles}
+
+    signatures = []
+    offset = 0
+    span = 0
+    run = 0
+    for line in text.split('\n')[:-1]:
+        end = offset + len(line)
+        style = styles_by_start.get(offset, {})
+        while run < len(bullets) and bullets[run][1] <= offset:
+            run += 1
+        nesting = None
+        if run < len(bullets) and bullets[run][0] <= offset:
+            # The leading tabs only carry the nesting level; the document will not contain them.
+            nesting = len(line) - len(line.lstrip('\t'))
+            line = line[nesting:]
+        styled_ranges = []
+        # Inline spans never cross a newline, so they can be consumed in order.
+        while span < len(text_styles) and text_styles[span][0] < end:
+            start, stop, text_style = text_styles[span]
+            shift = offset + (nesting or 0)
+            _add_range(styled_ranges, start - shift, stop - shift, _style_key(text_style))
+            span += 1
+        signatures.append((
+            line,
+            style.get('namedStyleType', 'NORMAL_TEXT'),
+            _magnitude(style, 'indentStart'),
+            _magnitude(style, 'indentFirstLine'),
+            tuple(styled_ranges),
+            nesting
+        ))
+        offset = end + 1
+    return signatures
+
+def _paragraph_style(signature) -> dict:
+    _, named_style, indent_start, indent_first_line, _, _ = signature
+    style = {'namedStyleType': named_style}
+    if indent_start is not None:
+        style['indentStart'] = {'magnitude': indent_start, 'unit': 'PT'}
+    if indent_first_line is not None:
+        style['indentFirstLine'] = {'magnitude': indent_first_line, 'unit': 'PT'}
+    return style
+
+def _insert_requests(signatures, index: int, inherits_bullet: bool = False) -> list:
+    """Builds the requests that insert the given paragraphs at index with their full styling.
+
+    inherits_bullet says whether the paragraph at index is a list item, in which case the
+    inserted paragraphs would join its list unless their bullets are removed first.
+    """
+    text = ''.join('\t' * (signature[5] or 0) + signature[0] + '\n' for signature in signatures)
+    requests = [
+        {'insertText': {'location': {'index': index}, 'text': text}},
+        {'updateTextStyle': {'range': {'startIndex': index, 'endIndex': index + len(text)}, 'textStyle': markdown_parser.PLAIN_TEXT_STYLE, 'fields': markdown_parser.TEXT_STYLE_FIELDS}},
+    ]
+    if inherits_bullet:
+        requests.append({'deleteParagraphBullets': {'range': {'startIndex': index, 'endIndex': index + len(text)}}})
+    paragraph_requests = []
+    bullet_ranges = []
+    offset = index
+    for signature in signatures:
+        tabs = signature[5] or 0
+        end = offset + tabs + len(signature[0]) + 1
+        for start, stop, key in signature[4]:
+            text_style = json.loads(key)
+            requests.append({'updateTextStyle': {'range': {'startIndex': offset + tabs + start, 'endIndex': offset + tabs + stop}, 'textStyle': text_style, 'fields': ','.join(text_style)}})
+        # Inserted paragraphs inherit the style of the paragraph they were inserted into, so
+        # every field is set explicitly; identical neighbours share one range.
+        style = _paragraph_style(signature)
+        previous = paragraph_requests[-1]['updateParagraphStyle'] if paragraph_requests else None
+        if previous and previous['paragraphStyle'] == style and previous['range']['endIndex'] == offset:
+            previous['range']['endIndex'] = end
+        else:
+            paragraph_requests.append({'updateParagraphStyle': {'range': {'startIndex': offset, 'endIndex': end}, 'paragraphStyle': style, 'fields': PARAGRAPH_FIELDS}})
+        if signature[5] is not None:
+            if bullet_ranges and bullet_ranges[-1][1] == offset:
+                bullet_ranges[-1][1] = end
+            else:
+                bullet_ranges.append([offset, end])
+        offset = end
+    # Creating bullets removes the nesting tabs, so later runs are created first.
+    bullet_requests = [
+        {'createParagraphBullets': {'range': {'startIndex': start, 'endIndex': end}, 'bulletPreset': markdown_parser.BULLET_PRESET}}
+        for start, end in reversed(bullet_ranges)
+    ]
+    return requests + paragraph_requests + bullet_requests
+
+def get_incremental_requests(doc: dict, markdown_content: str):
+    """Returns (requests, stats) that turn the document body into markdown_content.
+
+    Only paragraphs that differ are deleted and re-inserted. Returns (None, None) when the
+    document cannot be diffed safely and must be rewritten in full.
+    """
+    current = document_paragraphs(doc)
+    if current is None:
+        return None, None
+    current_signatures, starts, insert_index = current
+    target_signatures = planned_paragraphs(markdown_content)
+
+    def paragraph_start(i):
+        return starts[i] if i < len(starts) else insert_index
+
+    matcher = SequenceMatcher(None, current_signatures, target_signatures, autojunk=False)
+    opcodes = [op for op in matcher.get_opcodes() if op[0] != 'equal']
+    requests = []
+    # Edit from the end of the document backwards so earlier indices stay valid.
+    for _, i1, i2, j1, j2 in reversed(opcodes):
+        start = paragraph_start(i1)
+        if i2 > i1:
+            requests.append({'deleteContentRange': {'range': {'startIndex': start, 'endIndex': paragraph_start(i2)}}})
+        if j2 > j1:
+            # After the deletion, the inserted text lands at the start of current paragraph i2.
+            inherits_bullet = i2 < len(current_signatures) and current_signatures[i2][5] is not None
+            requests.extend(_insert_requests(target_signatures[j1:j2], start, inherits_bullet))
+
+    stats = {
+        'paragraphs_kept': sum(i2 - i1 for tag, i1, i2, _, _ in matcher.get_opcodes() if tag == 'equal'),
+        'paragraphs_deleted': sum(i2 - i1 for _, i1, i2, _, _ in opcodes),
+        'paragraphs_inserted': sum(j2 - j1 for _, _, _, j1, j2 in opcodes),
+    }
+    return requests, stats
@@ -1,9 +1,56 @@
+import hashlib
+import multiprocessing
 import re
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Lexer ---
+# Every line is classified with a single match against LINE_PATTERN, and inline markup is
+# tokenized in one finditer pass over INLINE_PATTERN. Supporting another inline style means
+# adding an alternative here and an entry in INLINE_STYLES, not another pass over the text.
+# Every alternative starts with a literal marker character so the regex engine can skip
+# straight to candidate positions instead of trying each alternative at every character.
+
+LINE_PATTERN = re.compile(r'(?P<indent>\s*)(?P<bullet>[*-])\s+(?P<item>.*)|(?P<hashes>#{1,4}) (?P<heading>.*)')
+
+INLINE_PATTERN = re.compile(
+    r'\*\*(?P<bold>.*?)\*\*'
+    r'|`(?P<code>[^`]+)`'
+    r'|\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]+)\)'
+    r'|\*(?<!\*\*)(?![\s*])(?P<italic>[^*]+?)(?<!\s)\*(?!\*)'
+    r'|_(?<!\w_)(?![\s_])(?P<underscore_italic>[^_]+?)(?<!\s)_(?!\w)'
+)
+
+CODE_FONT = 'Courier New'
+INLINE_STYLES = {
+    'bold': {'bold': True},
+    'code': {'weightedFontFamily': {'fontFamily': CODE_FONT}},
+    'italic': {'italic': True},
+    'underscore_italic': {'italic': True},
+}
+# Every text style field the parser may set; inserted text is reset on all of them first,
+# because new text inherits the style of the character before it.
+TEXT_STYLE_FIELDS = 'bold,italic,weightedFontFamily,link'
+PLAIN_TEXT_STYLE = {'bold': False}
+
+HEADING_STYLES = {level: {'namedStyleType': f'HEADING_{level}'} for level in range(1, 5)}
+BULLET_CHARS = ['\u25CF', '\u25CB', '\u25A0']
+# Native list preset whose glyphs per nesting level match BULLET_CHARS.
+BULLET_PRESET = 'BULLET_DISC_CIRCLE_SQUARE'
 
 # --- Markdown Parsing and Request Generation ---
 
-def get_markdown_requests(markdown_text: str, start_index: int):
-    """Converts a markdown string into a list of Google Docs API requests starting at a given index."""
+def get_markdown_requests(markdown_text: str, start_index: int, coalesce: bool = False):
+    """Converts a markdown string into a list of Google Docs API requests starting at a given index.
+
+    With coalesce=True the text is inserted with a single insertText request followed only by
+    the style ranges that are needed (see get_coalesced_markdown_requests).
+    """
+    if coalesce:
+        return get_coalesced_markdown_requests(markdown_text, start_index)
+
     all_requests = []
     current_index = start_index
     lines = markdown_text.split('\n')
@@ -12,18 +59,7 @@ def get_markdown_requests(markdown_text: str, start_index: int):
         line_start_index = current_index
         
         # 1. Handle Paragraph Styles (Headers, Lists)
-        indent_level, list_text, bullet_char = handle_list_item(line)
-        if list_text is not None:
-            text_to_process = bullet_char + ' ' + list_text
-            paragraph_style = {
-                'indentFirstLine': {'magnitude': 18 * (indent_level + 1), 'unit': 'PT'},
-                'indentStart': {'magnitude': 36 * (indent_level + 1), 'unit': 'PT'}
-            }
-            paragraph_fields = 'indentStart,indentFirstLine'
-        else:
-            text_to_process, header_style = handle_paragraph_style(line)
-            paragraph_style = header_style
-            paragraph_fields = 'namedStyleType'
+        text_to_process, paragraph_style, paragraph_fields = handle_line_style(line)
 
         # 2. Handle Inline Styles (Bold)
         inline_requests, inserted_len = handle_inline_styles(text_to_process, current_index)
@@ -44,47 +80,405 @@ def get_markdown_requests(markdown_text: str, start_index: int):
 
     return all_requests
 
+def plan_markdown(markdown_text: str):
+    """Builds the final text of a markdown string once, together with the style ranges it needs.
+
+    Returns (text, paragraph_styles, text_styles, bullets). Offsets are relative to the start of
+    the text; paragraph styles are (start, end, paragraph_style, fields) tuples, text styles are
+    (start, end, text_style) tuples for every styled inline span, and bullets are
+    (start, end, tabs) tuples, one per contiguous run of list items. List items are written with
+    one leading tab per nesting level; createParagraphBullets turns the tabs into the nesting
+    level and removes them, so tabs is the number of characters a run shrinks by.
+    """
+    text_parts = []
+    paragraph_styles = []
+    text_styles = []
+    bullets = []
+    offset = 0
+    list_start = None
+    list_tabs = 0
+
+    for line in markdown_text.split('\n'):
+        line_start = offset
+        paragraph_style = None
+
+        match = LINE_PATTERN.match(line)
+        if match is not None and match.group('bullet'):
+            if list_start is None:
+                list_start, list_tabs = line_start, 0
+            indent_level = len(match.group('indent')) // 2
+            text_parts.append('\t' * indent_level)
+            offset += indent_level
+            list_tabs += indent_level
+            text_to_process = match.group('item')
+        else:
+            if list_start is not None:
+                bullets.append((list_start, line_start, list_tabs))
+                list_start = None
+            if match is None:
+                text_to_process = line
+            else:
+                text_to_process = match.group('heading')
+                paragraph_style = HEADING_STYLES[len(match.group('hashes'))]
+
+        for segment, text_style in tokenize_inline(text_to_process):
+            text_parts.append(segment)
+            if text_style:
+                text_styles.append((offset, offset + len(segment), text_style))
+            offset += len(segment)
+
+        text_parts.append('\n')
+        offset += 1
+        if paragraph_style:
+            paragraph_styles.append((line_start, offset, paragraph_style, 'namedStyleType'))
+
+    if list_start is not None:
+        bullets.append((list_start, offset, list_tabs))
+    return ''.join(text_parts), paragraph_styles, text_styles, bullets
+
+def plan_length(plan) -> int:
+    """Returns how many characters a plan adds to the document once its bullets are created."""
+    text, _, _, bullets = plan
+    return len(text) - sum(tabs for _, _, tabs in bullets)
+
+def get_coalesced_markdown_requests(markdown_text: str, start_index: int):
+    """Converts a markdown string into one insertText request plus the style requests it needs.
+
+    Renders the same text styles as get_markdown_requests, but the request count no longer grows
+    with the number of plain segments: the whole range is reset to non-bold once and only bold
+    ranges and styled paragraphs get their own update. Lists become native Docs lists with one
+    createParagraphBullets request per contiguous run of items instead of bullet glyphs.
+    """
+    return plan_to_requests(cached_plan_markdown(markdown_text), start_index)
+
+# --- Plan Cache ---
+# Plans hold offsets relative to the start of the block, so a cached plan can be reused at any
+# start_index; only the anchoring in plan_to_requests changes. Cached plans (and the style dicts
+# inside them) are shared and must not be mutated. The cache is bounded both by entries and by the
+# total length of the cached texts, so a long-running server keeps at most a few large plans.
+
+PLAN_CACHE_SIZE = 256
+PLAN_CACHE_MAX_CHARS = 1000000
+PLAN_CACHE_MAX_TOTAL_CHARS = 8000000
+
+_plan_cache = OrderedDict()
+_plan_cache_lock = threading.Lock()
+_plan_cache_stats = {'hits': 0, 'misses': 0}
+_plan_cache_chars = 0
+
+def cached_plan_markdown(markdown_text: str):
+    """Returns plan_markdown(markdown_text), reusing the plan of identical content from a bounded LRU cache."""
+    if len(markdown_text) > PLAN_CACHE_MAX_CHARS:
+        return plan_large_markdown(markdown_text)
+    key = hashlib.blake2b(markdown_text.encode('utf-8'), digest_size=16).digest()
+    with _plan_cache_lock:
+        plan = _plan_cache.get(key)
+        if plan is not None:
+            _plan_cache.move_to_end(key)
+            _plan_cache_stats['hits'] += 1
+            return plan
+        _plan_cache_stats['misses'] += 1
+
+    text, paragraph_styles, text_styles, bullets = plan_markdown(markdown_text)
+    plan = (text, tuple(paragraph_styles), tuple(text_styles), tuple(bullets))
+    global _plan_cache_chars
+    with _plan_cache_lock:
+        if key not in _plan_cache:
+            _plan_cache[key] = plan
+            _plan_cache_chars += len(text)
+        while len(_plan_cache) > PLAN_CACHE_SIZE or _plan_cache_chars > PLAN_CACHE_MAX_TOTAL_CHARS:
+            _, evicted = _plan_cache.popitem(last=False)
+            _plan_cache_chars -= len(evicted[0])
+    return plan
+
+def plan_cache_info() -> dict:
+    with _plan_cache_lock:
+        return dict(_plan_cache_stats, size=len(_plan_cache), max_size=PLAN_CACHE_SIZE,
+                    chars=_plan_cache_chars, max_chars=PLAN_CACHE_MAX_TOTAL_CHARS)
+
+def clear_plan_cache():
+    global _plan_cache_chars
+    with _plan_cache_lock:
+        _plan_cache.clear()
+        _plan_cache_chars = 0
+        _plan_cache_stats.update(hits=0, misses=0)
+
+# --- Parallel Planning ---
+# The only state carried from one line to the next is the current list run, so a document can be
+# cut before any line that is not a list item and each segment planned on its own. Segments are
+# planned in a process pool with offsets relative to the segment, then stitched together by
+# shifting every span by the length of the text before it. The result equals plan_markdown.
+
+PARALLEL_MIN_CHARS = 2000000
+PARALLEL_SEGMENT_CHARS = 500000
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+def set_parse_workers(workers: int):
+    """Plans markdown of PARALLEL_MIN_CHARS or more in a pool of that many processes; 0 or 1 turns it off."""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False)
+            _parse_pool = None
+        if workers and workers > 1:
+            # Spawned, not forked: the server calls this from a process that already runs threads.
+            _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+def plan_large_markdown(markdown_text: str):
+    """Returns plan_markdown(markdown_text), planned in parallel when a parse pool is set and the text is large."""
+    pool = _parse_pool
+    if pool is None or len(markdown_text) < PARALLEL_MIN_CHARS:
+        return plan_markdown(markdown_text)
+    return parallel_plan_markdown(markdown_text, pool)
+
+def split_markdown(markdown_text: str, segment_chars: int = PARALLEL_SEGMENT_CHARS) -> list:
+    """Cuts markdown into segments of about segment_chars, each ending before a line that is not a list item.
+
+    '\n'.join(segments) gives back markdown_text.
+    """
+    segments = []
+    start = 0
+    while len(markdown_text) - start > segment_chars:
+        cut = markdown_text.find('\n', start + segment_chars)
+        while cut != -1:
+            next_end = markdown_text.find('\n', cut + 1)
+            match = LINE_PATTERN.match(markdown_text, cut + 1, len(markdown_text) if next_end == -1 else next_end)
+            if match is None or not match.group('bullet'):
+                break
+            cut = next_end
+        if cut == -1:
+            break
+        segments.append(markdown_text[start:cut])
+        start = cut + 1
+    segments.append(markdown_text[start:])
+    return segments
+
+def merge_plans(plans):
+    """Stitches the plans of consecutive segments into the plan of the whole text."""
+    text_parts, paragraph_styles, text_styles, bullets = [], [], [], []
+    offset = 0
+    for text, segment_paragraphs, segment_texts, segment_bullets in plans:
+        text_parts.append(text)
+        if offset:
+            paragraph_styles.extend((start + offset, end + offset, style, fields) for start, end, style, fields in segment_paragraphs)
+            text_styles.extend((start + offset, end + offset, style) for start, end, style in segment_texts)
+            bullets.extend((start + offset, end + offset, tabs) for start, end, tabs in segment_bullets)
+        else:
+            paragraph_styles.extend(segment_paragraphs)
+            text_styles.extend(segment_texts)
+            bullets.extend(segment_bullets)
+        offset += len(text)
+    return ''.join(text_parts), paragraph_styles, text_styles, bullets
+
+def parallel_plan_markdown(markdown_text: str, executor, segment_chars: int = PARALLEL_SEGMENT_CHARS):
+    """Plans segments of markdown_text on executor (a process pool) and returns the merged plan."""
+    segments = split_markdown(markdown_text, segment_chars)
+    if len(segments) == 1:
+        return plan_markdown(markdown_text)
+    return merge_plans(executor.map(plan_markdown, segments))
+
+def plan_to_requests(plan, start_index: int, prefix=()):
+    """Returns the API requests of a (text, paragraph_styles, text_styles, bullets) plan anchored at start_index.
+
+    The result is a PlannedRequests sequence: request dicts are only built as they are read,
+    which for a batchUpdate means one chunk at a time. prefix requests are sent first.
+    """
+    return PlannedRequests(plan, start_index, prefix)
+
+class PlannedRequests(Sequence):
+    """The requests of a plan, kept as the plan's relative spans plus one base index.
+
+    In order: the prefix requests, insertText of the whole text, a reset of the inserted range to
+    plain text, one updateTextStyle per styled span, one updateParagraphStyle per styled
+    paragraph, and createParagraphBullets per list run. Bullets are created last, and from the
+    last run backwards, because removing the nesting tabs shifts every index after a run.
+    Rebasing and merging spans work on the plan tuples without building any request dicts.
+    """
+
+    __slots__ = ('plan', 'start_index', 'prefix')
+
+    def __init__(self, plan, start_index: int, prefix=()):
+        self.plan = plan
+        self.start_index = start_index
+        self.prefix = tuple(prefix)
+
+    def rebase(self, start_index: int) -> 'PlannedRequests':
+        """Returns the same requests anchored at another index."""
+        return PlannedRequests(self.plan, start_index, self.prefix)
+
+    def optimized(self) -> 'PlannedRequests':
+        """Returns the requests with touching spans of equal style merged, as optimize_requests would."""
+        text, paragraph_styles, text_styles, bullets = self.plan
+        merged_text = _merge_touching(text_styles, lambda span: span[2])
+        merged_paragraphs = _merge_touching(paragraph_styles, lambda span: (span[2], span[3]))
+        if len(merged_text) == len(text_styles) and len(merged_paragraphs) == len(paragraph_styles):
+            return self
+        return PlannedRequests((text, merged_paragraphs, merged_text, bullets), self.start_index, self.prefix)
+
+    def __len__(self):
+        _, paragraph_styles, text_styles, bullets = self.plan
+        return len(self.prefix) + 2 + len(text_styles) + len(paragraph_styles) + len(bullets)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('request index out of range')
+        if position < len(self.prefix):
+            return self.prefix[position]
+        position -= len(self.prefix)
+        text, paragraph_styles, text_styles, bullets = self.plan
+        base = self.start_index
+        if position == 0:
+            return {'insertText': {'location': {'index': base}, 'text': text}}
+        if position == 1:
+            return {'updateTextStyle': {'range': {'startIndex': base, 'endIndex': base + len(text)}, 'textStyle': PLAIN_TEXT_STYLE, 'fields': TEXT_STYLE_FIELDS}}
+        position -= 2
+        if position < len(text_styles):
+            start, end, text_style = text_styles[position]
+            return {'updateTextStyle': {'range': {'startIndex': base + start, 'endIndex': base + end}, 'textStyle': text_style, 'fields': ','.join(text_style)}}
+        position -= len(text_styles)
+        if position < len(paragraph_styles):
+            start, end, paragraph_style, fields = paragraph_styles[position]
+            return {
+                'updateParagraphStyle': {
+                    'range': {'startIndex': base + start, 'endIndex': base + end},
+                    'paragraphStyle': paragraph_style,
+                    'fields': fields
+                }
+            }
+        start, end, _ = bullets[len(bullets) - 1 - (position - len(paragraph_styles))]
+        return {
+            'createParagraphBullets': {
+                'range': {'startIndex': base + start, 'endIndex': base + end},
+                'bulletPreset': BULLET_PRESET
+            }
+        }
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def __eq__(self, other):
+        if isinstance(other, (PlannedRequests, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f'PlannedRequests({len(self)} requests at index {self.start_index})'
+
+def _merge_touching(spans, style_of) -> tuple:
+    """Merges consecutive (start, end, ...) spans that touch or overlap and share a style."""
+    merged = []
+    for span in spans:
+        if merged and merged[-1][1] >= span[0] and style_of(merged[-1]) == style_of(span):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], span[1])) + tuple(merged[-1][2:])
+        else:
+            merged.append(span)
+    return tuple(merged)
+
+# --- Streaming ---
+
+STREAM_BLOCK_LINES = 1000
+
+def iter_markdown_lines(source):
+    """Yields the lines of markdown without their newlines, exactly as str.split('\n') would.
+
+    source may be a string or any iterable of newline-terminated lines, such as an open file.
+    """
+    if isinstance(source, str):
+        yield from source.split('\n')
+        return
+    ended_with_newline = True
+    for line in source:
+        ended_with_newline = line.endswith('\n')
+        yield line[:-1] if ended_with_newline else line
+    if ended_with_newline:
+        yield ''
+
+def iter_markdown_requests(source, start_index: int, block_lines: int = STREAM_BLOCK_LINES):
+    """Yields coalesced requests for markdown read incrementally from source.
+
+    Lines are planned in blocks of about block_lines, each block inserted at the running index,
+    so memory stays bounded by the block size rather than the size of the input. A block only
+    ends before a line that is not a list item, so a list run is never split into two lists.
+    """
+    current_index = start_index
+    block = []
+    for line in iter_markdown_lines(source):
+        if len(block) >= block_lines and not _is_list_item(line):
+            plan = plan_markdown('\n'.join(block))
+            yield from plan_to_requests(plan, current_index)
+            current_index += plan_length(plan)
+            block = []
+        block.append(line)
+    if block:
+        yield from plan_to_requests(plan_markdown('\n'.join(block)), current_index)
+
+def _is_list_item(line: str) -> bool:
+    match = LINE_PATTERN.match(line)
+    return match is not None and bool(match.group('bullet'))
+
+def handle_line_style(line: str):
+    """Returns (text_to_process, paragraph_style, paragraph_fields) for a single markdown line."""
+    match = LINE_PATTERN.match(line)
+    if match is None:
+        return line, None, 'namedStyleType'
+    if match.group('bullet'):
+        indent_level = len(match.group('indent')) // 2
+        bullet_char = BULLET_CHARS[indent_level % len(BULLET_CHARS)]
+        return bullet_char + ' ' + match.group('item'), list_paragraph_style(indent_level), 'indentStart,indentFirstLine'
+    return match.group('heading'), HEADING_STYLES[len(match.group('hashes'))], 'namedStyleType'
+
+def list_paragraph_style(indent_level: int) -> dict:
+    return {
+        'indentFirstLine': {'magnitude': 18 * (indent_level + 1), 'unit': 'PT'},
+        'indentStart': {'magnitude': 36 * (indent_level + 1), 'unit': 'PT'}
+    }
+
 def handle_paragraph_style(line: str):
-    if line.startswith('# '): return line[2:], {'namedStyleType': 'HEADING_1'}
-    if line.startswith('## '): return line[3:], {'namedStyleType': 'HEADING_2'}
-    if line.startswith('### '): return line[4:], {'namedStyleType': 'HEADING_3'}
-    if line.startswith('#### '): return line[5:], {'namedStyleType': 'HEADING_4'}
-    return line, None
+    match = LINE_PATTERN.match(line)
+    if match is None or not match.group('hashes'):
+        return line, None
+    return match.group('heading'), HEADING_STYLES[len(match.group('hashes'))]
 
 def handle_list_item(line: str):
-    match = re.match(r'^(\s*)(\*|-)\s+(.*)', line)
-    if not match: return None, None, None
-    indent_str, text = match.group(1), match.group(3)
-    indent_level = len(indent_str) // 2
-    bullet_chars = ['\u25CF', '\u25CB', '\u25A0']
-    bullet_char = bullet_chars[indent_level % len(bullet_chars)]
-    return indent_level, text, bullet_char
+    match = LINE_PATTERN.match(line)
+    if match is None or not match.group('bullet'):
+        return None, None, None
+    indent_level = len(match.group('indent')) // 2
+    return indent_level, match.group('item'), BULLET_CHARS[indent_level % len(BULLET_CHARS)]
 
-def handle_inline_styles(text: str, start_index: int):
-    requests = []
-    matches = list(re.finditer(r'\*\*(.*?)\*\*', text))
-    last_end, current_pos = 0, start_index
-    clean_text_len = len(re.sub(r'\*\*', '', text))
+def tokenize_inline(text: str):
+    """Splits a line into (segment, text_style) spans in a single pass, dropping the markup.
 
-    if not matches:
-        if text: requests.extend([{'insertText': {'location': {'index': current_pos}, 'text': text}}, {'updateTextStyle': {'range': {'startIndex': current_pos, 'endIndex': current_pos + len(text)}, 'textStyle': {'bold': False}, 'fields': 'bold'}}])
-        return requests, len(text)
-
-    for match in matches:
+    text_style is None for plain text. Empty segments are skipped.
+    """
+    spans = []
+    last_end = 0
+    for match in INLINE_PATTERN.finditer(text):
         start, end = match.span()
-        # Plain text before bold
-        plain_before = text[last_end:start]
-        if plain_before:
-            requests.extend([{'insertText': {'location': {'index': current_pos}, 'text': plain_before}}, {'updateTextStyle': {'range': {'startIndex': current_pos, 'endIndex': current_pos + len(plain_before)}, 'textStyle': {'bold': False}, 'fields': 'bold'}}])
-            current_pos += len(plain_before)
-        # Bold text
-        bold_text = match.group(1)
-        if bold_text:
-            requests.extend([{'insertText': {'location': {'index': current_pos}, 'text': bold_text}}, {'updateTextStyle': {'range': {'startIndex': current_pos, 'endIndex': current_pos + len(bold_text)}, 'textStyle': {'bold': True}, 'fields': 'bold'}}])
-            current_pos += len(bold_text)
+        if start > last_end:
+            spans.append((text[last_end:start], None))
+        kind = match.lastgroup
+        if kind == 'link_url':
+            spans.append((match.group('link_text'), {'link': {'url': match.group('link_url')}}))
+        elif match.group(kind):
+            spans.append((match.group(kind), INLINE_STYLES[kind]))
         last_end = end
-    # Plain text after last bold
-    plain_after = text[last_end:]
-    if plain_after:
-        requests.extend([{'insertText': {'location': {'index': current_pos}, 'text': plain_after}}, {'updateTextStyle': {'range': {'startIndex': current_pos, 'endIndex': current_pos + len(plain_after)}, 'textStyle': {'bold': False}, 'fields': 'bold'}}])
-    return requests, clean_text_len
\ No newline at end of file
+    if last_end < len(text):
+        spans.append((text[last_end:], None))
+    return spans
+
+def handle_inline_styles(text: str, start_index: int):
+    requests = []
+    current_pos = start_index
+    for segment, text_style in tokenize_inline(text):
+        text_style = text_style or PLAIN_TEXT_STYLE
+        requests.extend([{'insertText': {'location': {'index': current_pos}, 'text': segment}}, {'updateTextStyle': {'range': {'startIndex': current_pos, 'endIndex': current_pos + len(segment)}, 'textStyle': text_style, 'fields': ','.join(text_style)}}])
+        current_pos += len(segment)
+    return requests, current_pos - start_index
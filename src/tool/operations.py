@@ -1,16 +1,357 @@
+import itertools
+import json
+import random
+import time
+from email.utils import parsedate_to_datetime
 from googleapiclient.errors import HttpError
+from . import telemetry
+from .markdown_parser import PlannedRequests
+
+# --- Batch Limits ---
+# Google rejects or slows down very large batchUpdate calls, so request lists are sent in
+# bounded chunks. Both limits are conservative and can be overridden per call.
+MAX_REQUESTS_PER_BATCH = 500
+MAX_BATCH_BYTES = 1000000
+
+# --- Retry Policy ---
+# Quota (429) and transient server errors are retried with jittered exponential backoff.
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 32.0
+
+def parse_retry_after(value):
+    """Returns the delay in seconds requested by a Retry-After header, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def retry_delay(attempt: int, retry_after=None) -> float:
+    """Returns how long to wait before retry number attempt (0-based)."""
+    requested = parse_retry_after(retry_after)
+    if requested is not None:
+        return min(requested, RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+def is_retryable(err: Exception) -> bool:
+    return isinstance(err, HttpError) and err.resp.status in RETRYABLE_STATUS_CODES
+
+def execute_with_retry(request, max_retries: int = MAX_RETRIES, sleep=time.sleep, on_retry=None):
+    """Executes an API request, retrying quota and transient server errors.
+
+    Honors the Retry-After header when present. on_retry, if given, is called with the HttpError
+    before each wait. Every attempt is timed as telemetry phase named after the API method, and
+    failed attempts are counted as 'api_errors' and 'api_retries' labelled with the status code.
+    """
+    method = telemetry.api_method(request)
+    for attempt in itertools.count():
+        try:
+            with telemetry.timed('phase_seconds', phase=method):
+                return request.execute()
+        except HttpError as err:
+            code = str(err.resp.status)
+            telemetry.count('api_errors', method=method, code=code)
+            if not is_retryable(err) or attempt >= max_retries:
+                raise
+            telemetry.count('api_retries', method=method, code=code)
+            if on_retry:
+                on_retry(err)
+            sleep(retry_delay(attempt, err.resp.get('retry-after')))
+
+def execute_once(request):
+    """Executes a request that must not be repeated, such as files.create, with the telemetry of execute_with_retry."""
+    return execute_with_retry(request, max_retries=0)
+
+def request_size(request: dict) -> int:
+    """Returns the size in bytes of a single request once serialized to JSON."""
+    return len(json.dumps(request, ensure_ascii=False).encode('utf-8'))
+
+def split_oversized_request(request: dict, max_bytes: int = MAX_BATCH_BYTES) -> list:
+    """Splits an insertText request that exceeds max_bytes into inserts at consecutive indices."""
+    if 'insertText' not in request or request_size(request) <= max_bytes:
+        return [request]
+    insert = request['insertText']
+    text = insert['text']
+    index = insert['location']['index']
+    pieces = []
+    position = 0
+    piece_len = max(1, max_bytes // 2)
+    while position < len(text):
+        piece = text[position:position + piece_len]
+        candidate = {'insertText': {'location': {'index': index + position}, 'text': piece}}
+        while len(piece) > 1 and request_size(candidate) > max_bytes:
+            piece = piece[:len(piece) // 2]
+            candidate = {'insertText': {'location': {'index': index + position}, 'text': piece}}
+        pieces.append(candidate)
+        position += len(piece)
+    return pieces
+
+def iter_request_chunks(requests, max_requests: int = MAX_REQUESTS_PER_BATCH, max_bytes: int = MAX_BATCH_BYTES, skip_requests: int = 0):
+    """Yields (chunk, chunk_bytes) pairs bounded by request count and serialized size.
+
+    Accepts any iterable of requests, so callers can pass a generator without materializing it.
+    skip_requests drops that many requests (counted after oversized inserts are split) first,
+    which is how a partially applied write is resumed.
+    """
+    pieces = (piece for request in requests for piece in split_oversized_request(request, max_bytes))
+    chunk, chunk_bytes = [], 0
+    for piece in itertools.islice(pieces, skip_requests, None):
+        size = request_size(piece)
+        if chunk and (len(chunk) >= max_requests or chunk_bytes + size > max_bytes):
+            yield chunk, chunk_bytes
+            chunk, chunk_bytes = [], 0
+        chunk.append(piece)
+        chunk_bytes += size
+    if chunk:
+        yield chunk, chunk_bytes
+
+# --- Request Optimizer ---
+# A conservative pass over a request list before it is sent. It never reorders anything across a
+# request that moves indices (other than hoisting an insert over style updates that end before
+# it), and never mutates the input: merged requests are new dicts, because request lists may
+# share style dicts with the parser's plan cache.
+
+STYLE_REQUESTS = ('updateTextStyle', 'updateParagraphStyle')
+STYLE_PARAMS = {'updateTextStyle': 'textStyle', 'updateParagraphStyle': 'paragraphStyle'}
+
+_PLAIN_RANGE_KEYS = {'startIndex', 'endIndex'}
+_field_sets = {}
+
+def _simple_range(params: dict):
+    """Returns (start, end) for a plain body range, or None for ranges the optimizer leaves alone."""
+    r = params.get('range')
+    if not isinstance(r, dict) or r.keys() != _PLAIN_RANGE_KEYS:
+        return None
+    return r['startIndex'], r['endIndex']
+
+def _simple_insert(request: dict):
+    """Returns (index, text) for an insertText at a plain body index, or None."""
+    params = request.get('insertText')
+    if params is None:
+        return None
+    location = params.get('location')
+    if not isinstance(location, dict) or len(location) != 1 or 'index' not in location:
+        return None
+    return location['index'], params.get('text', '')
+
+def _field_set(fields: str) -> frozenset:
+    field_set = _field_sets.get(fields)
+    if field_set is None:
+        field_set = frozenset(name for name in fields.split(',') if name)
+        if len(_field_sets) < 1024:
+            _field_sets[fields] = field_set
+    return field_set
+
+def _style_update(request: dict):
+    """Returns (kind, start, end, fields, style) for a plain style update, or None."""
+    if len(request) != 1:
+        return None
+    kind = next(iter(request))
+    style_param = STYLE_PARAMS.get(kind)
+    if style_param is None:
+        return None
+    params = request[kind]
+    bounds = _simple_range(params)
+    if bounds is None:
+        return None
+    return kind, bounds[0], bounds[1], _field_set(params.get('fields', '')), params.get(style_param, {})
+
+def _is_noop(request: dict, update) -> bool:
+    """Tells whether request changes nothing; update is its parsed style update, if any."""
+    if update is not None:
+        return update[1] >= update[2] or not update[3]
+    if len(request) != 1:
+        return False
+    kind = next(iter(request))
+    params = request[kind]
+    if kind == 'insertText':
+        return not params.get('text')
+    bounds = _simple_range(params) if isinstance(params, dict) else None
+    return bounds is not None and bounds[0] >= bounds[1]
+
+def _make_style_request(kind: str, start: int, end: int, fields, style: dict) -> dict:
+    return {kind: {'range': {'startIndex': start, 'endIndex': end}, STYLE_PARAMS[kind]: style, 'fields': ','.join(sorted(fields))}}
+
+def _fuse_inserts(entries: list) -> list:
+    """Fuses inserts that continue one another, hoisting them over text style updates when safe.
+
+    entries are (request, style_update) pairs. Insert B at the end of an earlier insert A may
+    move before the updateTextStyle requests in between when those updates end before B, A does
+    not end a paragraph, and the update right after B restyles all of B on at least every field
+    set on the character B would inherit from. B then ends up with the same style whichever
+    character it inherits from.
+    """
+    out = []
+    last_insert = None
+    for position, (request, update) in enumerate(entries):
+        insert = _simple_insert(request)
+        if insert is None:
+            out.append((request, update))
+            if update is None or update[0] != 'updateTextStyle':
+                last_insert = None
+            continue
+        if last_insert is not None:
+            a_index, a_text = _simple_insert(out[last_insert][0])
+            b_index, b_text = insert
+            between = [u for _, u in out[last_insert + 1:]]
+            fused = None
+            if b_index == a_index + len(a_text) and not a_text.endswith('\n'):
+                if not between:
+                    fused = a_text + b_text
+                elif all(end <= b_index for _, _, end, _, _ in between):
+                    following = entries[position + 1][1] if position + 1 < len(entries) else None
+                    if following and following[0] == 'updateTextStyle' and following[1:3] == (b_index, b_index + len(b_text)):
+                        touching = [fields for _, start, end, fields, _ in between if start <= b_index - 1 < end]
+                        if all(fields <= following[3] for fields in touching):
+                            fused = a_text + b_text
+            elif b_index == a_index and not between:
+                fused = b_text + a_text
+            if fused is not None:
+                out[last_insert] = ({'insertText': {'location': {'index': a_index}, 'text': fused}}, None)
+                continue
+        out.append((request, update))
+        last_insert = len(out) - 1
+    return out
+
+def _conflicts(other, kind: str, start: int, end: int, fields) -> bool:
+    """Tells whether the style update other must stay ordered before an update of kind on [start, end)."""
+    other_kind, other_start, other_end, other_fields, _ = other
+    if other_kind != kind:
+        return False
+    if kind == 'updateParagraphStyle':
+        # Paragraph boundaries are unknown here, so any paragraph update in between is a conflict.
+        return True
+    return other_start < end and start < other_end and bool(other_fields & fields)
+
+def _merge_style_window(window: list) -> list:
+    """Merges and drops style updates within a run that contains no index-changing request."""
+    kept = []
+    last_by_key = {}
+    last_by_fields = {}
+    style_keys = {}
+    for request, update in window:
+        kind, start, end, fields, style = update
+
+        # Drop the last update of the same kind, or with the same fields, when this one overwrites all of it.
+        for previous in {last_by_fields.get(kind), last_by_fields.get((kind, fields))}:
+            if previous is not None and kept[previous] is not None:
+                _, p_start, p_end, p_fields, _ = kept[previous][1]
+                if start <= p_start and p_end <= end and p_fields <= fields:
+                    kept[previous] = None
+
+        # Plans share style dicts, so most keys are computed once per distinct dict.
+        style_key = style_keys.get(id(style))
+        if style_key is None:
+            style_key = style_keys[id(style)] = json.dumps(style, sort_keys=True)
+        key = (kind, fields, style_key)
+        candidate = last_by_key.get(key)
+        if candidate is not None and kept[candidate] is not None:
+            _, c_start, c_end, _, _ = kept[candidate][1]
+            if start <= c_end and c_start <= end and not any(
+                entry is not None and _conflicts(entry[1], kind, start, end, fields) for entry in kept[candidate + 1:]
+            ):
+                start, end = min(start, c_start), max(end, c_end)
+                kept[candidate] = (_make_style_request(kind, start, end, fields, style), (kind, start, end, fields, style))
+                last_by_fields[kind] = last_by_fields[(kind, fields)] = candidate
+                continue
+        kept.append((request, update))
+        last_by_key[key] = last_by_fields[kind] = last_by_fields[(kind, fields)] = len(kept) - 1
+    return [entry[0] for entry in kept if entry is not None]
+
+def optimize_requests(requests: list):
+    """Returns (optimized_requests, stats) for a batchUpdate request list.
+
+    Drops no-op requests (empty inserts and ranges, updates without fields), fuses inserts that
+    continue one another, merges touching or overlapping style updates with the same style and
+    fields, and drops style updates that a later one fully overwrites. stats holds the request
+    counts before and after.
+    """
+    parsed = ((request, _style_update(request)) for request in requests)
+    entries = _fuse_inserts([(request, update) for request, update in parsed if not _is_noop(request, update)])
+    optimized, window = [], []
+    for request, update in entries:
+        if update is not None:
+            window.append((request, update))
+            continue
+        optimized.extend(_merge_style_window(window))
+        window = []
+        optimized.append(request)
+    optimized.extend(_merge_style_window(window))
+    return optimized, {'requests_before': len(requests), 'requests_after': len(optimized)}
+
+def execute_batch_update(docs_service, document_id: str, requests, max_requests: int = MAX_REQUESTS_PER_BATCH,
+                         max_bytes: int = MAX_BATCH_BYTES, required_revision_id: str = None,
+                         skip_requests: int = 0, max_retries: int = MAX_RETRIES, optimize: bool = True) -> dict:
+    """Executes requests as one or more bounded batchUpdate calls and handles common errors.
+
+    Every chunk after the first carries writeControl.requiredRevisionId from the previous response,
+    so a concurrent edit stops the write instead of shifting the remaining indices. A chunk that
+    hits a quota or transient error is retried against the same revision, so the write resumes
+    where it stopped. The result reports per-chunk timing, the number of requests applied
+    (counted after oversized inserts are split, including skip_requests) and the last confirmed
+    revision; pass both back as skip_requests and required_revision_id to resume a failed write.
+
+    Request lists are passed through optimize_requests first (generators are sent as they come),
+    and the result reports the counts before and after. The optimizer is deterministic, so
+    skip_requests stays valid when the same requests are sent again. PlannedRequests are merged
+    on their spans instead and turned into request dicts one chunk at a time.
+    """
+    optimized = None
+    if optimize and isinstance(requests, PlannedRequests):
+        before = len(requests)
+        requests = requests.optimized()
+        optimized = {'requests_before': before, 'requests_after': len(requests)}
+    elif optimize and isinstance(requests, list):
+        requests, optimized = optimize_requests(requests)
+    chunks = []
+    completed_requests = skip_requests
+    revision_id = required_revision_id
+    retries = []
+
+    def progress(status: str, message: str) -> dict:
+        result = {
+            "status": status,
+            "message": message,
+            "revision_id": revision_id,
+            "completed_requests": completed_requests,
+            "retries": len(retries),
+            "chunks": chunks
+        }
+        if optimized:
+            result.update(optimized)
+        return result
 
-def execute_batch_update(docs_service, document_id: str, requests: list) -> dict:
-    """Executes a batchUpdate request and handles common errors."""
     try:
-        if not requests:
-            return {"status": "success", "message": "No changes were needed."}
-        docs_service.documents().batchUpdate(documentId=document_id, body={'requests': requests}).execute()
-        return {"status": "success", "message": f"Successfully updated document {document_id}."}
+        for chunk, chunk_bytes in iter_request_chunks(requests, max_requests, max_bytes, skip_requests):
+            body = {'requests': chunk}
+            if revision_id:
+                body['writeControl'] = {'requiredRevisionId': revision_id}
+            started = time.perf_counter()
+            response = execute_with_retry(
+                docs_service.documents().batchUpdate(documentId=document_id, body=body),
+                max_retries=max_retries,
+                on_retry=retries.append
+            )
+            elapsed = time.perf_counter() - started
+            revision_id = (response or {}).get('writeControl', {}).get('requiredRevisionId', revision_id)
+            completed_requests += len(chunk)
+            telemetry.count('requests_emitted', len(chunk))
+            telemetry.count('bytes_sent', chunk_bytes)
+            chunks.append({'requests': len(chunk), 'bytes': chunk_bytes, 'seconds': round(elapsed, 4)})
+        if not chunks:
+            return {"status": "success", "message": "No changes were needed.", "revision_id": revision_id}
+        return progress("success", f"Successfully updated document {document_id}.")
     except HttpError as err:
-        return {"status": "error", "message": f"An HttpError occurred: {err.reason}"}
+        return progress("error", f"An HttpError occurred: {err.reason}")
     except Exception as e:
-        return {"status": "error", "message": f"An unexpected error occurred: {e}"}
+        return progress("error", f"An unexpected error occurred: {e}")
 
 def create_doc(drive_service, title: str, folder_id: str = None):
     """Creates a new Google Doc."""
@@ -18,7 +359,7 @@ def create_doc(drive_service, title: str, folder_id: str = None):
     if folder_id:
         file_metadata['parents'] = [folder_id]
     try:
-        file = drive_service.files().create(body=file_metadata, fields='id').execute()
+        file = execute_once(drive_service.files().create(body=file_metadata, fields='id'))
         return {"status": "success", "document_id": file.get('id')}
     except Exception as e:
         return {"status": "error", "message": f"An error occurred creating the document: {e}"}
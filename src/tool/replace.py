@@ -1,25 +1,63 @@
 import re
-from . import markdown_parser
+from bisect import bisect_right
+from . import markdown_parser, telemetry
 from .operations import execute_batch_update
+from .snapshots import snapshot_cache
+
+# Stands in for non-text paragraph elements (inline images, etc.) so a placeholder never
+# matches across them.
+OBJECT_REPLACEMENT_CHAR = '\uFFFC'
+
+def build_placeholder_pattern(keys):
+    """Compiles one alternation matching any placeholder, preferring the longest at each position."""
+    ordered = sorted((key for key in keys if key), key=len, reverse=True)
+    return re.compile('|'.join(re.escape(key) for key in ordered))
+
+def find_placeholders(content: list, pattern) -> list:
+    """Scans each paragraph's concatenated text once and maps matches back to document indices.
+
+    A placeholder split across several text runs is still found.
+    """
+    found_holders = []
+    for element in content:
+        if 'paragraph' not in element:
+            continue
+        parts, offsets, starts = [], [], []
+        length = 0
+        for run in element['paragraph']['elements']:
+            if 'textRun' in run:
+                segment_text = run['textRun'].get('content', '')
+            else:
+                segment_text = OBJECT_REPLACEMENT_CHAR * (run.get('endIndex', 0) - run.get('startIndex', 0))
+            if not segment_text:
+                continue
+            parts.append(segment_text)
+            offsets.append(length)
+            starts.append(run['startIndex'])
+            length += len(segment_text)
+        if not parts:
+            continue
+
+        def to_index(offset):
+            i = bisect_right(offsets, offset) - 1
+            return starts[i] + offset - offsets[i]
+
+        for match in pattern.finditer(''.join(parts)):
+            found_holders.append({
+                'key': match.group(0),
+                'range': {'startIndex': to_index(match.start()), 'endIndex': to_index(match.end() - 1) + 1}
+            })
+    return found_holders
 
 def replace_markdown_placeholders(docs_service, document_id: str, replacements: dict):
     """Finds and replaces multiple placeholders with formatted markdown content."""
     try:
-        doc = docs_service.documents().get(documentId=document_id, fields='body(content)').execute()
+        snapshots = snapshot_cache(docs_service)
+        doc = snapshots.document(docs_service, document_id)
         content = doc.get('body', {}).get('content', [])
         
-        found_holders = []
-        for element in content:
-            if 'paragraph' in element:
-                for run in element['paragraph']['elements']:
-                    if 'textRun' in run and run['textRun']['content']:
-                        segment_text = run['textRun']['content']
-                        for key in replacements.keys():
-                            for match in re.finditer(re.escape(key), segment_text):
-                                start = run['startIndex'] + match.start()
-                                end = run['startIndex'] + match.end()
-                                found_holders.append({'key': key, 'range': {'startIndex': start, 'endIndex': end}})
-
+        pattern = build_placeholder_pattern(replacements.keys())
+        found_holders = find_placeholders(content, pattern) if pattern.pattern else []
         found_holders.sort(key=lambda x: x['range']['startIndex'], reverse=True)
         
         if not found_holders:
@@ -32,10 +70,16 @@ def replace_markdown_placeholders(docs_service, document_id: str, replacements:
             start_index = holder['range']['startIndex']
 
             all_requests.append({'deleteContentRange': {'range': holder['range']}})
-            markdown_requests = markdown_parser.get_markdown_requests(markdown_content, start_index)
+            with telemetry.timed('phase_seconds', phase='parse'):
+                markdown_requests = markdown_parser.get_markdown_requests(markdown_content, start_index, coalesce=True)
             all_requests.extend(markdown_requests)
             
-        return execute_batch_update(docs_service, document_id, all_requests)
+        result = execute_batch_update(docs_service, document_id, all_requests, required_revision_id=doc.get('revisionId'))
+        if result["status"] == "success":
+            snapshots.record_write(document_id, result.get("revision_id"))
+        else:
+            snapshots.invalidate(document_id)
+        return result
 
     except Exception as e:
         return {"status": "error", "message": f"An unexpected error occurred: {e}"}
@@ -0,0 +1,155 @@
+import threading
+import weakref
+from collections import OrderedDict
+from . import telemetry
+from .operations import execute_batch_update, execute_with_retry
+
+# --- Document Snapshots ---
+# What we last learned about each document: its revision, where its body ends and, after a full
+# read, its body content. Our own writes update the entry, so back-to-back appends and clears find
+# the end index without a documents().get. A snapshot is only ever used together with its
+# revision as writeControl.requiredRevisionId, so an edit made elsewhere makes the write fail
+# instead of landing at a stale index; update_at_end then re-reads the document and tries again.
+# Reads ask only for the fields an operation needs.
+
+SNAPSHOT_CACHE_SIZE = 64
+END_INDEX_FIELDS = 'revisionId,body(content(endIndex))'
+CONTENT_FIELDS = 'revisionId,body(content)'
+REVISION_FIELDS = 'revisionId'
+
+def body_end_index(doc: dict) -> int:
+    """Returns the endIndex of the last structural element, which closes with the final newline."""
+    content = doc.get('body', {}).get('content', [])
+    if len(content) > 1:
+        return content[-1].get('endIndex', 2)
+    return 2
+
+class Snapshot:
+    def __init__(self, revision_id: str, end_index: int = None, doc: dict = None, cached: bool = False):
+        self.revision_id = revision_id
+        self.end_index = end_index
+        self.doc = doc
+        self.cached = cached
+
+class SnapshotCache:
+    """Document snapshots keyed by document id and checked against revisionId, with LRU eviction.
+
+    Cached documents are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int = SNAPSHOT_CACHE_SIZE):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def _lookup(self, document_id: str):
+        with self._lock:
+            entry = self._entries.get(document_id)
+            if entry is not None:
+                self._entries.move_to_end(document_id)
+            return entry
+
+    def _store(self, document_id: str, entry: Snapshot):
+        with self._lock:
+            self._entries[document_id] = entry
+            self._entries.move_to_end(document_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, hit: bool):
+        with self._lock:
+            self.stats['hits' if hit else 'misses'] += 1
+        telemetry.count('snapshot_lookups', result='hit' if hit else 'miss')
+
+    def end_index(self, docs_service, document_id: str, refresh: bool = False) -> Snapshot:
+        """Returns a snapshot with the body end index, reading only endIndex fields when it is not known."""
+        entry = None if refresh else self._lookup(document_id)
+        if entry is not None and entry.end_index is not None:
+            self._count(True)
+            return Snapshot(entry.revision_id, entry.end_index, cached=True)
+        self._count(False)
+        doc = execute_with_retry(docs_service.documents().get(documentId=document_id, fields=END_INDEX_FIELDS))
+        entry = Snapshot(doc.get('revisionId'), body_end_index(doc))
+        self._store(document_id, entry)
+        return entry
+
+    def document(self, docs_service, document_id: str) -> dict:
+        """Returns the document's revisionId and body content, downloading the body only if it changed."""
+        entry = self._lookup(document_id)
+        if entry is not None and entry.doc is not None:
+            current = execute_with_retry(docs_service.documents().get(documentId=document_id, fields=REVISION_FIELDS))
+            if current.get('revisionId') == entry.revision_id:
+                self._count(True)
+                return entry.doc
+        self._count(False)
+        doc = execute_with_retry(docs_service.documents().get(documentId=document_id, fields=CONTENT_FIELDS))
+        self._store(document_id, Snapshot(doc.get('revisionId'), body_end_index(doc), doc))
+        return doc
+
+    def record_write(self, document_id: str, revision_id: str, end_index: int = None):
+        """Records the revision our write produced and, when the caller knows it, the new end index."""
+        if not isinstance(revision_id, str):
+            self.invalidate(document_id)
+            return
+        self._store(document_id, Snapshot(revision_id, end_index))
+
+    def invalidate(self, document_id: str = None):
+        """Forgets one document, or every document when called without arguments."""
+        with self._lock:
+            if document_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(document_id, None)
+
+    def info(self) -> dict:
+        with self._lock:
+            return dict(self.stats, size=len(self._entries), max_size=self._max_entries)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+# One cache per docs service object: the server keeps its services in a ServiceCache, so the
+# snapshots live as long as the services that made the writes they describe.
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+def snapshot_cache(docs_service) -> SnapshotCache:
+    """Returns the snapshot cache belonging to docs_service."""
+    with _caches_lock:
+        cache = _caches.get(docs_service)
+        if cache is None:
+            cache = _caches[docs_service] = SnapshotCache()
+        return cache
+
+def update_at_end(docs_service, document_id: str, build_requests, refresh: bool = False) -> dict:
+    """Sends the requests that build_requests(end_index) returns for the document's current end.
+
+    build_requests returns (requests, new_end_index); new_end_index may be None when it is not
+    known in advance. If the write fails before anything was applied, for a stale cached snapshot
+    or a concurrent edit between the read and the write, the document is read again and the
+    write is built once more. A cached snapshot that needs no requests is confirmed with a fresh
+    read first, since nothing was sent to check its revision. Pass refresh=True when the
+    requests can only be built once, such as a generator reading from a stream; such writes are
+    not retried.
+    """
+    cache = snapshot_cache(docs_service)
+    snapshot = cache.end_index(docs_service, document_id, refresh=refresh)
+    retried = refresh
+    while True:
+        requests, new_end_index = build_requests(snapshot.end_index)
+        result = execute_batch_update(docs_service, document_id, requests, required_revision_id=snapshot.revision_id)
+        if result["status"] == "success":
+            if not result.get("chunks"):
+                if snapshot.cached:
+                    snapshot = cache.end_index(docs_service, document_id, refresh=True)
+                    continue
+                return result
+            cache.record_write(document_id, result.get("revision_id"), new_end_index)
+            return result
+        cache.invalidate(document_id)
+        if retried or result.get("completed_requests"):
+            return result
+        retried = True
+        snapshot = cache.end_index(docs_service, document_id, refresh=True)
@@ -0,0 +1,41 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Telemetry Hooks ---
+# The tool functions report phase timings and counts here. Nothing is recorded until a sink is
+# installed with set_sink (the server installs its metrics registry), so the tool stays usable
+# on its own. A sink provides observe(name, value, labels) and count(name, value, labels).
+
+_sink = None
+_sink_lock = threading.Lock()
+
+def set_sink(sink):
+    """Installs the object that receives observations, or removes it when sink is None."""
+    global _sink
+    with _sink_lock:
+        _sink = sink
+
+def observe(name: str, value: float, **labels):
+    sink = _sink
+    if sink is not None:
+        sink.observe(name, value, labels)
+
+def count(name: str, value: float = 1, **labels):
+    sink = _sink
+    if sink is not None:
+        sink.count(name, value, labels)
+
+@contextmanager
+def timed(name: str, **labels):
+    """Observes the seconds spent in the with-block under name, also when it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+def api_method(request) -> str:
+    """Returns the API method of a request without its service, e.g. 'documents.get'."""
+    method_id = getattr(request, 'methodId', None) or 'unknown'
+    return method_id.split('.', 1)[-1]
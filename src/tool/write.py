@@ -1,39 +1,129 @@
-from . import markdown_parser
+from typing import Iterable, Union
+from . import markdown_parser, telemetry
 from .operations import create_doc, execute_batch_update
 from .clear import clear_google_doc
+from .snapshots import snapshot_cache
+from .drive_import import import_markdown_doc
+from .incremental import get_incremental_requests
 
-def write_to_google_doc(docs_service, drive_service, markdown_content: str, title: str = "Untitled Document", document_id: str = None, folder_id: str = None) -> dict:
+def write_to_google_doc(docs_service, drive_service, markdown_content: Union[str, Iterable[str]], title: str = "Untitled Document", document_id: str = None, folder_id: str = None, resume_from: dict = None, incremental: bool = False) -> dict:
     """
     Writes markdown content to a Google Doc. Creates a new doc if document_id is not provided.
+
+    markdown_content may also be an iterable of lines (e.g. an open file); it is then parsed and
+    sent in bounded batches as it is read, so memory does not grow with the size of the input.
+
+    If a write fails part way, the error result carries a 'resume_from' token. Passing it back with
+    the same markdown_content skips the clear and sends only the requests that were not applied.
+
+    With incremental=True an existing document is not cleared: its paragraphs are matched against
+    the markdown and only the paragraphs that changed are deleted and re-inserted.
+
+    A new document is created from a string by a single Drive import of the rendered HTML; content
+    the import cannot reproduce (see drive_import.is_importable) is written with batchUpdate.
     """
     try:
-        if not document_id:
-            print("No document ID provided, creating a new document...")
-            creation_result = create_doc(drive_service, title, folder_id)
-            if creation_result["status"] == "error":
-                return creation_result
-            document_id = creation_result["document_id"]
-            print(f"Successfully created new document with ID: {document_id}")
-        
-        print(f"Clearing document {document_id} before writing...")
-        clear_result = clear_google_doc(docs_service, document_id)
-        if clear_result["status"] == "error":
-            print(f"Warning: Could not clear document. {clear_result['message']}")
+        streaming = not isinstance(markdown_content, str)
+        if incremental and streaming:
+            print("Incremental mode needs the whole markdown content, streaming a full rewrite instead...")
+        elif incremental and document_id and not resume_from:
+            result = _write_incrementally(docs_service, document_id, markdown_content)
+            if result is not None:
+                return result
+            print("Document cannot be diffed safely, falling back to a full rewrite...")
+
+        skip_requests, revision_id = 0, None
+        if resume_from:
+            document_id = resume_from["document_id"]
+            skip_requests = resume_from.get("completed_requests", 0)
+            revision_id = resume_from.get("revision_id")
+            print(f"Resuming write to document {document_id} after {skip_requests} applied requests...")
+        else:
+            if not document_id:
+                if not streaming:
+                    print("No document ID provided, importing the markdown as a new document...")
+                    import_result = import_markdown_doc(drive_service, markdown_content, title, folder_id)
+                    if import_result is not None and import_result["status"] == "error":
+                        return import_result
+                    if import_result is not None:
+                        return _success_result(import_result, f"Successfully imported content into new document {import_result['document_id']}.", import_result["document_id"])
+                print("No document ID provided, creating a new document...")
+                creation_result = create_doc(drive_service, title, folder_id)
+                if creation_result["status"] == "error":
+                    return creation_result
+                document_id = creation_result["document_id"]
+                print(f"Successfully created new document with ID: {document_id}")
+                # Pin the first chunk to the new document's revision: a retried 5xx that was in
+                # fact applied then fails its revision check instead of inserting the text twice.
+                revision_id = snapshot_cache(docs_service).end_index(docs_service, document_id, refresh=True).revision_id
+            else:
+                # A document we just created is empty, so only an existing one needs clearing.
+                print(f"Clearing document {document_id} before writing...")
+                clear_result = clear_google_doc(docs_service, document_id)
+                if clear_result["status"] == "error":
+                    print(f"Warning: Could not clear document. {clear_result['message']}")
+                revision_id = clear_result.get("revision_id")
 
         print("Converting markdown to Google Docs format...")
-        requests = markdown_parser.get_markdown_requests(markdown_content, start_index=1)
+        end_index = None
+        if streaming:
+            requests = markdown_parser.iter_markdown_requests(markdown_content, start_index=1)
+        else:
+            with telemetry.timed('phase_seconds', phase='parse'):
+                plan = markdown_parser.cached_plan_markdown(markdown_content)
+                requests = markdown_parser.plan_to_requests(plan, start_index=1)
+            end_index = 1 + markdown_parser.plan_length(plan) + 1
 
         print("Writing content to the document...")
-        write_result = execute_batch_update(docs_service, document_id, requests)
+        write_result = execute_batch_update(docs_service, document_id, requests, required_revision_id=revision_id, skip_requests=skip_requests)
         
+        snapshots = snapshot_cache(docs_service)
         if write_result["status"] == "success":
-            return {
-                "status": "success",
-                "message": f"Successfully wrote content to document {document_id}.",
-                "document_id": document_id
-            }
+            snapshots.record_write(document_id, write_result.get("revision_id"), end_index)
+            return _success_result(write_result, f"Successfully wrote content to document {document_id}.", document_id)
         else:
+            snapshots.invalidate(document_id)
+            write_result["document_id"] = document_id
+            write_result["resume_from"] = {
+                "document_id": document_id,
+                "completed_requests": write_result.get("completed_requests", skip_requests),
+                "revision_id": write_result.get("revision_id")
+            }
             return write_result
 
     except Exception as e:
         return {"status": "error", "message": f"An unexpected error occurred during the write process: {e}"}
+
+def _write_incrementally(docs_service, document_id: str, markdown_content: str):
+    """Applies only the paragraph-level differences. Returns None if a full rewrite is needed."""
+    print(f"Comparing document {document_id} with the markdown content...")
+    snapshots = snapshot_cache(docs_service)
+    doc = snapshots.document(docs_service, document_id)
+    with telemetry.timed('phase_seconds', phase='parse'):
+        requests, stats = get_incremental_requests(doc, markdown_content)
+    if requests is None:
+        return None
+
+    print(f"Kept {stats['paragraphs_kept']} paragraphs, replacing {stats['paragraphs_deleted']} with {stats['paragraphs_inserted']}...")
+    write_result = execute_batch_update(docs_service, document_id, requests, required_revision_id=doc.get('revisionId'))
+    if write_result["status"] == "error":
+        snapshots.invalidate(document_id)
+        write_result["document_id"] = document_id
+        return write_result
+    snapshots.record_write(document_id, write_result.get("revision_id"))
+    result = _success_result(write_result, f"Successfully updated {stats['paragraphs_inserted']} paragraphs in document {document_id}.", document_id)
+    result["diff"] = stats
+    return result
+
+def _success_result(write_result: dict, message: str, document_id: str) -> dict:
+    result = {
+        "status": "success",
+        "message": message,
+        "document_id": document_id,
+        "revision_id": write_result.get("revision_id"),
+        "chunks": write_result.get("chunks", [])
+    }
+    for key in ("requests_before", "requests_after", "imported"):
+        if key in write_result:
+            result[key] = write_result[key]
+    return result
@@ -0,0 +1,40 @@
+import httplib2
+import requests
+from google.auth.transport.requests import AuthorizedSession
+
+# --- Pooled Transport ---
+# googleapiclient's default httplib2 transport is not thread-safe and opens a connection per
+# Http object. PooledHttp exposes the httplib2 request() interface that build(http=...) expects
+# on top of an AuthorizedSession, whose urllib3 pool keeps connections alive and can be shared
+# by many threads, so one set of services can serve the whole server threadpool.
+
+POOL_SIZE = 16
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 120.0
+
+class PooledHttp:
+    """An httplib2.Http stand-in backed by a thread-safe, keep-alive connection pool."""
+
+    def __init__(self, credentials, pool_size: int = POOL_SIZE, connect_timeout: float = CONNECT_TIMEOUT,
+                 read_timeout: float = READ_TIMEOUT, session=None):
+        self.credentials = credentials
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = session or AuthorizedSession(credentials)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=httplib2.DEFAULT_MAX_REDIRECTS, connection_type=None):
+        """Sends one request and returns (httplib2.Response, content bytes) like httplib2.Http.request."""
+        response = self.session.request(
+            method, uri, data=body, headers=headers,
+            timeout=self.timeout, allow_redirects=redirections > 0
+        )
+        info = {key.lower(): value for key, value in response.headers.items()}
+        info['status'] = str(response.status_code)
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+        return resp, response.content
+
+    def close(self):
+        self.session.close()
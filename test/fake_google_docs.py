@@ -0,0 +1,487 @@
+"""
+An in-memory stand-in for the Google Docs and Drive service objects.
+
+FakeGoogleBackend.services() returns {'docs': ..., 'drive': ...} objects that can be passed to
+the tool functions in place of the ones built by auth.py. batchUpdate requests are applied to a
+simple document model (one entry per character for text, text style and paragraph style), so
+tests and benchmarks can check the rendered result without Google credentials. Latency, a
+per-window quota and one-off errors can be injected to exercise retry and load behaviour, and
+documents().get honours the fields mask, so partial reads return only what they asked for.
+"""
+
+import copy
+import itertools
+import json
+import threading
+import time
+from collections import Counter, deque
+from html.parser import HTMLParser
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+def make_http_error(status: int, message: str = "", retry_after=None) -> HttpError:
+    headers = {'status': status}
+    if retry_after is not None:
+        headers['retry-after'] = str(retry_after)
+    content = json.dumps({'error': {'code': status, 'message': message}}).encode('utf-8')
+    return HttpError(httplib2.Response(headers), content)
+
+def parse_field_mask(fields: str) -> dict:
+    """Parses a partial-response mask such as 'revisionId,body(content(endIndex))' into a tree."""
+    root, stack, name = {}, [], ''
+    current = root
+    for char in fields + ',':
+        if char in ',()':
+            if name.strip():
+                current[name.strip()] = {}
+            if char == '(':
+                stack.append(current)
+                current = current[name.strip()]
+            elif char == ')':
+                current = stack.pop()
+            name = ''
+        else:
+            name += char
+    return root
+
+def apply_field_mask(data, mask: dict):
+    """Keeps only the masked fields of a response; an empty mask keeps the whole value."""
+    if not mask:
+        return data
+    if isinstance(data, list):
+        return [apply_field_mask(item, mask) for item in data]
+    if isinstance(data, dict):
+        return {key: apply_field_mask(value, mask[key]) for key, value in data.items() if key in mask}
+    return data
+
+def rendered(document) -> list:
+    """Returns the paragraphs of a fake document with unset and False text style fields dropped,
+    for comparing documents built in different ways."""
+    return [
+        (text, style, bullet and bullet['nestingLevel'], [(content, {k: v for k, v in text_style.items() if v is not False}) for _, content, text_style in runs])
+        for _, text, style, bullet, runs in document.paragraphs()
+    ]
+
+class HtmlImporter(HTMLParser):
+    """Converts the HTML subset Drive imports (p, h1-h4, nested ul/li, b, i, a, font-family spans)
+    into the requests that build the same document, as files.create with conversion does."""
+
+    HEADINGS = {'h1', 'h2', 'h3', 'h4'}
+
+    def __init__(self):
+        super().__init__()
+        self.text = []
+        self.length = 0
+        self.text_styles = []
+        self.paragraph_styles = []
+        self.list_items = []
+        self.styles = []
+        self.depth = 0
+        self.paragraph = None
+
+    def _start_paragraph(self, heading=None):
+        self._end_paragraph()
+        self.paragraph = (self.length, heading)
+        if heading is None and self.depth:
+            self.list_items.append(self.length)
+            self._append('\t' * (self.depth - 1))
+
+    def _end_paragraph(self):
+        if self.paragraph is None:
+            return
+        start, heading = self.paragraph
+        self._append('\n')
+        if heading:
+            self.paragraph_styles.append((start, self.length, {'namedStyleType': f'HEADING_{heading[1]}'}))
+        self.paragraph = None
+
+    def _append(self, text, style=None):
+        self.text.append(text)
+        if style:
+            self.text_styles.append((self.length, self.length + len(text), style))
+        self.length += len(text)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'p' or tag in self.HEADINGS:
+            self._start_paragraph(tag if tag in self.HEADINGS else None)
+        elif tag == 'ul':
+            self._end_paragraph()
+            self.depth += 1
+        elif tag == 'li':
+            self._start_paragraph()
+        elif tag == 'b':
+            self.styles.append({'bold': True})
+        elif tag == 'i':
+            self.styles.append({'italic': True})
+        elif tag == 'a':
+            self.styles.append({'link': {'url': attrs.get('href', '')}})
+        elif tag == 'span':
+            font = attrs.get('style', '').partition('font-family:')[2].strip(" '\";")
+            self.styles.append({'weightedFontFamily': {'fontFamily': font}} if font else {})
+
+    def handle_endtag(self, tag):
+        if tag in ('p', 'li') or tag in self.HEADINGS:
+            self._end_paragraph()
+        elif tag == 'ul':
+            self._end_paragraph()
+            self.depth -= 1
+        elif tag in ('b', 'i', 'a', 'span'):
+            self.styles.pop()
+
+    def handle_data(self, data):
+        if self.paragraph is not None:
+            style = {}
+            for inline_style in self.styles:
+                style.update(inline_style)
+            self._append(data, style)
+
+    def requests(self) -> list:
+        """Returns the requests that fill an empty document, whose final newline ends the last paragraph."""
+        self._end_paragraph()
+        text = ''.join(self.text)
+        if not text:
+            return []
+        requests = [{'insertText': {'location': {'index': 1}, 'text': text[:-1]}}]
+        for start, end, style in self.text_styles:
+            requests.append({'updateTextStyle': {'range': {'startIndex': start + 1, 'endIndex': end + 1}, 'textStyle': style, 'fields': ','.join(style)}})
+        for start, end, style in self.paragraph_styles:
+            requests.append({'updateParagraphStyle': {'range': {'startIndex': start + 1, 'endIndex': end + 1}, 'paragraphStyle': style, 'fields': 'namedStyleType'}})
+        # One list per run of consecutive items, created from the last run backwards.
+        runs = []
+        for start in self.list_items:
+            if runs and runs[-1][1] == start:
+                runs[-1][1] = text.index('\n', start) + 1
+            else:
+                runs.append([start, text.index('\n', start) + 1])
+        for start, end in reversed(runs):
+            requests.append({'createParagraphBullets': {'range': {'startIndex': start + 1, 'endIndex': end + 1}, 'bulletPreset': 'BULLET_DISC_CIRCLE_SQUARE'}})
+        return requests
+
+class FakeDocument:
+    """A single document body. Index 0 is the section break; the body always ends with '\\n'."""
+
+    def __init__(self, document_id: str, title: str = "Untitled Document"):
+        self.document_id = document_id
+        self.title = title
+        self.revision = 1
+        self.text = ['\n']
+        self.text_styles = [{}]
+        self.paragraph_styles = [{}]
+        self.bullets = [None]
+        self._list_ids = itertools.count(1)
+
+    @property
+    def revision_id(self) -> str:
+        return f"{self.document_id}-rev-{self.revision}"
+
+    @property
+    def end_index(self) -> int:
+        return len(self.text) + 1
+
+    def body_text(self) -> str:
+        return ''.join(self.text)
+
+    # --- Index helpers (document index i lives at list position i - 1) ---
+    def _check_range(self, start: int, end: int, allow_final_newline: bool = False):
+        limit = self.end_index if allow_final_newline else self.end_index - 1
+        if not (1 <= start <= end <= limit):
+            raise make_http_error(400, f"Invalid range {start}-{end} for document of length {self.end_index}.")
+
+    def _paragraph_bounds(self, position: int):
+        """Returns list positions [start, end] of the paragraph containing position."""
+        start = position
+        while start > 0 and self.text[start - 1] != '\n':
+            start -= 1
+        end = position
+        while self.text[end] != '\n':
+            end += 1
+        return start, end
+
+    def _expand_to_paragraphs(self, start_index: int, end_index: int):
+        first, _ = self._paragraph_bounds(start_index - 1)
+        _, last = self._paragraph_bounds(max(start_index, end_index - 1) - 1)
+        return first, last + 1
+
+    # --- Request handlers ---
+    def insert_text(self, index: int, text: str):
+        self._check_range(index, index)
+        position = index - 1
+        inherited = self.text_styles[position - 1] if position > 0 and self.text[position - 1] != '\n' else self.text_styles[position]
+        _, paragraph_end = self._paragraph_bounds(position)
+        paragraph_style = self.paragraph_styles[paragraph_end]
+        bullet = self.bullets[paragraph_end]
+        size = len(text)
+        self.text[position:position] = list(text)
+        self.text_styles[position:position] = [inherited] * size
+        self.paragraph_styles[position:position] = [paragraph_style] * size
+        self.bullets[position:position] = [bullet] * size
+
+    def delete_content_range(self, start: int, end: int):
+        self._check_range(start, end)
+        for values in (self.text, self.text_styles, self.paragraph_styles, self.bullets):
+            del values[start - 1:end - 1]
+
+    def update_text_style(self, start: int, end: int, text_style: dict, fields: str):
+        self._check_range(start, end, allow_final_newline=True)
+        names = [name for name in fields.split(',') if name]
+        merged = {}
+        def merge(style):
+            key = id(style)
+            if key not in merged:
+                updated = dict(style)
+                for name in names:
+                    if name in text_style:
+                        updated[name] = text_style[name]
+                    else:
+                        updated.pop(name, None)
+                merged[key] = updated
+            return merged[key]
+        self.text_styles[start - 1:end - 1] = [merge(style) for style in self.text_styles[start - 1:end - 1]]
+
+    def update_paragraph_style(self, start: int, end: int, paragraph_style: dict, fields: str):
+        self._check_range(start, end, allow_final_newline=True)
+        first, last = self._expand_to_paragraphs(start, end)
+        names = [name for name in fields.split(',') if name]
+        position = first
+        while position < last:
+            _, paragraph_end = self._paragraph_bounds(position)
+            updated = dict(self.paragraph_styles[paragraph_end])
+            for name in names:
+                if name in paragraph_style:
+                    updated[name] = copy.deepcopy(paragraph_style[name])
+                else:
+                    updated.pop(name, None)
+            self.paragraph_styles[position:paragraph_end + 1] = [updated] * (paragraph_end + 1 - position)
+            position = paragraph_end + 1
+
+    def create_paragraph_bullets(self, start: int, end: int, preset: str):
+        self._check_range(start, end, allow_final_newline=True)
+        first, last = self._expand_to_paragraphs(start, end)
+        list_id = f"kix.list.{next(self._list_ids)}"
+        # Walk the paragraphs backwards so removing leading tabs does not move the ones still to visit.
+        paragraphs = []
+        position = first
+        while position < last:
+            _, paragraph_end = self._paragraph_bounds(position)
+            paragraphs.append((position, paragraph_end))
+            position = paragraph_end + 1
+        for paragraph_start, paragraph_end in reversed(paragraphs):
+            tabs = 0
+            while self.text[paragraph_start + tabs] == '\t':
+                tabs += 1
+            bullet = {'listId': list_id, 'nestingLevel': tabs, 'preset': preset}
+            self.bullets[paragraph_start:paragraph_end + 1] = [bullet] * (paragraph_end + 1 - paragraph_start)
+            for values in (self.text, self.text_styles, self.paragraph_styles, self.bullets):
+                del values[paragraph_start:paragraph_start + tabs]
+
+    def delete_paragraph_bullets(self, start: int, end: int):
+        self._check_range(start, end, allow_final_newline=True)
+        first, last = self._expand_to_paragraphs(start, end)
+        self.bullets[first:last] = [None] * (last - first)
+
+    def apply(self, request: dict):
+        (kind, params), = request.items()
+        if kind == 'insertText':
+            self.insert_text(params['location']['index'], params['text'])
+        elif kind == 'deleteContentRange':
+            self.delete_content_range(params['range']['startIndex'], params['range']['endIndex'])
+        elif kind == 'updateTextStyle':
+            self.update_text_style(params['range']['startIndex'], params['range']['endIndex'], params.get('textStyle', {}), params['fields'])
+        elif kind == 'updateParagraphStyle':
+            self.update_paragraph_style(params['range']['startIndex'], params['range']['endIndex'], params.get('paragraphStyle', {}), params['fields'])
+        elif kind == 'createParagraphBullets':
+            self.create_paragraph_bullets(params['range']['startIndex'], params['range']['endIndex'], params.get('bulletPreset', ''))
+        elif kind == 'deleteParagraphBullets':
+            self.delete_paragraph_bullets(params['range']['startIndex'], params['range']['endIndex'])
+        else:
+            raise make_http_error(400, f"Unsupported request type: {kind}")
+
+    # --- Rendering ---
+    def paragraphs(self):
+        """Yields (start_index, text_with_newline, paragraph_style, bullet, runs) for each paragraph.
+
+        runs is a list of (start_index, content, text_style) with consecutive equal styles merged.
+        """
+        position = 0
+        while position < len(self.text):
+            _, paragraph_end = self._paragraph_bounds(position)
+            runs = []
+            for i in range(position, paragraph_end + 1):
+                style = self.text_styles[i]
+                if runs and runs[-1][2] == style:
+                    runs[-1][1].append(self.text[i])
+                else:
+                    runs.append((i + 1, [self.text[i]], style))
+            yield (
+                position + 1,
+                ''.join(self.text[position:paragraph_end + 1]),
+                self.paragraph_styles[paragraph_end],
+                self.bullets[paragraph_end],
+                [(start, ''.join(chars), style) for start, chars, style in runs]
+            )
+            position = paragraph_end + 1
+
+    def to_json(self) -> dict:
+        content = [{'endIndex': 1, 'sectionBreak': {'sectionStyle': {}}}]
+        for start, text, paragraph_style, bullet, runs in self.paragraphs():
+            style = {'namedStyleType': 'NORMAL_TEXT'}
+            style.update(copy.deepcopy(paragraph_style))
+            paragraph = {
+                'elements': [
+                    {'startIndex': run_start, 'endIndex': run_start + len(run_text), 'textRun': {'content': run_text, 'textStyle': dict(text_style)}}
+                    for run_start, run_text, text_style in runs
+                ],
+                'paragraphStyle': style
+            }
+            if bullet:
+                paragraph['bullet'] = {'listId': bullet['listId'], 'nestingLevel': bullet['nestingLevel']}
+            content.append({'startIndex': start, 'endIndex': start + len(text), 'paragraph': paragraph})
+        return {
+            'documentId': self.document_id,
+            'title': self.title,
+            'revisionId': self.revision_id,
+            'body': {'content': content}
+        }
+
+class FakeRequest:
+    """Mimics googleapiclient.http.HttpRequest: nothing happens until execute() is called."""
+
+    def __init__(self, backend, method: str, func):
+        self._backend = backend
+        self._method = method
+        self._func = func
+        self.methodId = ('drive.' if method.startswith('files.') else 'docs.') + method
+
+    def execute(self, num_retries: int = 0):
+        return self._backend.call(self._method, self._func)
+
+class FakeDocumentsResource:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def get(self, documentId: str, fields: str = None, **kwargs):
+        def get_document():
+            doc = self._backend.document(documentId).to_json()
+            return apply_field_mask(doc, parse_field_mask(fields)) if fields else doc
+        return FakeRequest(self._backend, 'documents.get', get_document)
+
+    def create(self, body: dict = None, **kwargs):
+        title = (body or {}).get('title', 'Untitled Document')
+        return FakeRequest(self._backend, 'documents.create', lambda: self._backend.create_document(title).to_json())
+
+    def batchUpdate(self, documentId: str, body: dict, **kwargs):
+        return FakeRequest(self._backend, 'documents.batchUpdate', lambda: self._backend.batch_update(documentId, body))
+
+class FakeFilesResource:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def create(self, body: dict = None, media_body=None, fields: str = None, **kwargs):
+        def create_file():
+            document = self._backend.create_document((body or {}).get('name', 'Untitled Document'))
+            if media_body is not None:
+                # Uploads are converted to a Google Doc the way Drive imports HTML.
+                importer = HtmlImporter()
+                importer.feed(media_body.getbytes(0, media_body.size()).decode('utf-8'))
+                for request in importer.requests():
+                    document.apply(request)
+            return {'id': document.document_id}
+        return FakeRequest(self._backend, 'files.create', create_file)
+
+class FakeDocsService:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def documents(self):
+        return FakeDocumentsResource(self._backend)
+
+class FakeDriveService:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def files(self):
+        return FakeFilesResource(self._backend)
+
+class FakeGoogleBackend:
+    """Holds the fake documents and the call accounting shared by the docs and drive fakes.
+
+    latency: seconds slept on every call (outside the lock, so calls overlap like real I/O).
+    quota: maximum calls per quota_window seconds; calls beyond it fail with 429 and Retry-After.
+    """
+
+    def __init__(self, latency: float = 0.0, quota: int = None, quota_window: float = 60.0, clock=time.monotonic):
+        self.latency = latency
+        self.quota = quota
+        self.quota_window = quota_window
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._documents = {}
+        self._ids = itertools.count(1)
+        self._call_times = deque()
+        self._injected_errors = deque()
+        self.calls = Counter()
+        self.requests_applied = 0
+        self.bytes_received = 0
+
+    def services(self) -> dict:
+        return {'docs': FakeDocsService(self), 'drive': FakeDriveService(self)}
+
+    def create_document(self, title: str = "Untitled Document") -> FakeDocument:
+        with self._lock:
+            document = FakeDocument(f"fake-doc-{next(self._ids)}", title)
+            self._documents[document.document_id] = document
+            return document
+
+    def document(self, document_id: str) -> FakeDocument:
+        with self._lock:
+            if document_id not in self._documents:
+                raise make_http_error(404, f"Requested entity was not found: {document_id}")
+            return self._documents[document_id]
+
+    def inject_error(self, status: int, retry_after=None, count: int = 1):
+        """Makes the next count calls fail with the given HTTP status."""
+        with self._lock:
+            self._injected_errors.extend([(status, retry_after)] * count)
+
+    def call(self, method: str, func):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls[method] += 1
+            if self._injected_errors:
+                status, retry_after = self._injected_errors.popleft()
+                self.calls['errors'] += 1
+                raise make_http_error(status, "Injected error.", retry_after)
+            if self.quota is not None:
+                now = self._clock()
+                while self._call_times and now - self._call_times[0] >= self.quota_window:
+                    self._call_times.popleft()
+                if len(self._call_times) >= self.quota:
+                    self.calls['errors'] += 1
+                    retry_after = max(1, int(self.quota_window - (now - self._call_times[0])))
+                    raise make_http_error(429, "Quota exceeded.", retry_after)
+                self._call_times.append(now)
+            return func()
+
+    def batch_update(self, document_id: str, body: dict) -> dict:
+        with self._lock:
+            document = self.document(document_id)
+            required = body.get('writeControl', {}).get('requiredRevisionId')
+            if required and required != document.revision_id:
+                raise make_http_error(400, "The required revision ID does not match the latest revision.")
+            self.bytes_received += len(json.dumps(body, ensure_ascii=False).encode('utf-8'))
+            # batchUpdate is atomic: apply to a copy and only keep it if every request succeeds.
+            staged = copy.copy(document)
+            for name in ('text', 'text_styles', 'paragraph_styles', 'bullets'):
+                setattr(staged, name, list(getattr(document, name)))
+            replies = []
+            for request in body.get('requests', []):
+                staged.apply(request)
+                replies.append({})
+            for name in ('text', 'text_styles', 'paragraph_styles', 'bullets'):
+                setattr(document, name, getattr(staged, name))
+            document.revision += 1
+            self.requests_applied += len(replies)
+            return {'documentId': document_id, 'replies': replies, 'writeControl': {'requiredRevisionId': document.revision_id}}
@@ -0,0 +1,140 @@
+import unittest
+from unittest import mock
+import sys
+import os
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+# Since auth lives in 'src', it is imported the same way the client imports it.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import auth
+from src.server.service_cache import ServiceCache
+from google.oauth2.credentials import Credentials
+
+def write_token(path, token, expires_in):
+    creds = Credentials(
+        token=token, refresh_token='refresh', token_uri='https://oauth2.googleapis.com/token',
+        client_id='client', client_secret='secret', scopes=auth.SCOPES,
+        expiry=auth._utcnow() + timedelta(seconds=expires_in)
+    )
+    with open(path, 'w') as f:
+        f.write(creds.to_json())
+
+class TestCredentialStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.token_path = os.path.join(self.directory, 'token.json')
+        self.refreshes = []
+        self.refresh_error = None
+        def refresh(creds, request):
+            time.sleep(0.05)
+            self.refreshes.append(threading.current_thread().name)
+            if self.refresh_error:
+                raise self.refresh_error
+            creds.token = f"token-{len(self.refreshes)}"
+            creds.expiry = auth._utcnow() + timedelta(hours=1)
+        patcher = mock.patch.object(Credentials, 'refresh', autospec=True, side_effect=refresh)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = auth.CredentialStore(refresh_margin=1, request_factory=lambda: None)
+        self.addCleanup(self.store.close)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_credentials_are_loaded_once_and_shared(self):
+        """Tests that repeated gets reuse the in-memory credentials without reading the file."""
+        write_token(self.token_path, 'initial', expires_in=3600)
+        first = self.store.get_oauth('client_secrets.json', self.token_path)
+        with mock.patch.object(Credentials, 'from_authorized_user_file') as loader:
+            second = self.store.get_oauth('client_secrets.json', self.token_path)
+        loader.assert_not_called()
+        self.assertIs(first, second)
+        self.assertEqual(first.token, 'initial')
+        self.assertEqual(self.refreshes, [])
+
+    def test_expired_token_is_refreshed_once_under_concurrency(self):
+        """Tests that concurrent callers wait for a single refresh and the token file is rewritten."""
+        write_token(self.token_path, 'expired', expires_in=-60)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.store.get_oauth('client_secrets.json', self.token_path))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.refreshes), 1)
+        self.assertTrue(all(creds.token == 'token-1' for creds in results))
+        with open(self.token_path) as f:
+            self.assertEqual(json.load(f)['token'], 'token-1')
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith('.tmp')], [])
+
+    def test_refresh_happens_in_the_background_before_expiry(self):
+        """Tests that a token close to expiry is refreshed by the timer, not by the caller."""
+        # google-auth already treats tokens within a few minutes of expiry as invalid, so the
+        # token lives long enough to be valid and the margin schedules the refresh shortly.
+        write_token(self.token_path, 'soon', expires_in=600)
+        store = auth.CredentialStore(refresh_margin=599.7, request_factory=lambda: None)
+        self.addCleanup(store.close)
+        creds = store.get_oauth('client_secrets.json', self.token_path)
+        self.assertEqual(creds.token, 'soon')
+        deadline = time.time() + 5
+        while not self.refreshes and time.time() < deadline:
+            time.sleep(0.02)
+        self.assertEqual(len(self.refreshes), 1)
+        self.assertNotEqual(self.refreshes[0], threading.current_thread().name)
+        self.assertEqual(creds.token, 'token-1')
+
+    def test_failing_background_refresh_backs_off_and_stops(self):
+        """Tests that a refresh that keeps failing is retried with growing delays, then left to the next request."""
+        write_token(self.token_path, 'soon', expires_in=600)
+        self.refresh_error = RuntimeError("token revoked")
+        store = auth.CredentialStore(refresh_margin=599.8, retry_seconds=0.05, request_factory=lambda: None, max_failures=3)
+        self.addCleanup(store.close)
+        with mock.patch('builtins.print'):
+            creds = store.get_oauth('client_secrets.json', self.token_path)
+            deadline = time.time() + 5
+            while len(self.refreshes) < 3 and time.time() < deadline:
+                time.sleep(0.02)
+            time.sleep(0.5)
+        self.assertEqual(len(self.refreshes), 3)
+        self.assertEqual(creds.token, 'soon')
+
+    def test_changed_token_file_is_reloaded(self):
+        """Tests that a token file replaced on disk is picked up on the next get."""
+        write_token(self.token_path, 'first', expires_in=3600)
+        self.assertEqual(self.store.get_oauth('client_secrets.json', self.token_path).token, 'first')
+        write_token(self.token_path, 'second-token', expires_in=3600)
+        self.assertEqual(self.store.get_oauth('client_secrets.json', self.token_path).token, 'second-token')
+
+    def test_own_refresh_keeps_cached_services(self):
+        """Tests that rewriting the token after a refresh does not evict services, but an outside change does."""
+        write_token(self.token_path, 'soon', expires_in=600)
+        store = auth.CredentialStore(refresh_margin=599.7, request_factory=lambda: None)
+        self.addCleanup(store.close)
+        cache = ServiceCache(lambda mode, creds_path, token_path: {'creds': store.get_oauth(creds_path, token_path)},
+                             token_version=store.source_version)
+        first = cache.get('oauth', 'client_secrets.json', self.token_path)
+        deadline = time.time() + 5
+        while not self.refreshes and time.time() < deadline:
+            time.sleep(0.02)
+        time.sleep(0.1)
+        with open(self.token_path) as f:
+            self.assertEqual(json.load(f)['token'], 'token-1')
+        self.assertIs(cache.get('oauth', 'client_secrets.json', self.token_path), first)
+
+        # Another process writes a token with a different size, so the change is always detected.
+        write_token(self.token_path, 'replaced-elsewhere', expires_in=3600)
+        second = cache.get('oauth', 'client_secrets.json', self.token_path)
+        self.assertIsNot(second, first)
+        self.assertEqual(second['creds'].token, 'replaced-elsewhere')
+        self.assertIs(cache.get('oauth', 'client_secrets.json', self.token_path), second)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.server import mcp_server
+from src.server.batch import group_operations, run_batch
+from test.fake_google_docs import FakeGoogleBackend
+
+class TestRunBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=4)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_grouping_keeps_document_order(self):
+        """Tests that operations are grouped per document and creates stay separate."""
+        operations = [
+            {'op': 'append', 'document_id': 'a'},
+            {'op': 'create'},
+            {'op': 'append', 'document_id': 'b'},
+            {'op': 'clear', 'document_id': 'a'},
+            {'op': 'create'},
+        ]
+        self.assertEqual(group_operations(operations), [[0, 3], [1], [2], [4]])
+
+    def test_same_document_sequential_other_documents_parallel(self):
+        """Tests ordering within a document and concurrency across documents."""
+        log, lock = [], threading.Lock()
+        active = {'count': 0, 'max': 0}
+
+        def run_operation(operation):
+            with lock:
+                active['count'] += 1
+                active['max'] = max(active['max'], active['count'])
+            time.sleep(0.02)
+            with lock:
+                active['count'] -= 1
+                log.append((operation['document_id'], operation['n']))
+            return {"status": "success"}
+
+        operations = [{'op': 'append', 'document_id': doc, 'n': n} for n in range(3) for doc in ('a', 'b', 'c')]
+        result = run_batch(operations, run_operation, self.executor)
+        self.assertEqual(result['status'], 'success')
+        for doc in ('a', 'b', 'c'):
+            self.assertEqual([n for d, n in log if d == doc], [0, 1, 2])
+        self.assertGreater(active['max'], 1)
+        self.assertEqual([r['index'] for r in result['results']], list(range(9)))
+
+    def test_partial_failure(self):
+        """Tests that per-operation failures are reported without failing the whole batch."""
+        def run_operation(operation):
+            if operation['document_id'] == 'bad':
+                raise RuntimeError("boom")
+            return {"status": "success"}
+
+        result = run_batch([{'op': 'clear', 'document_id': 'ok'}, {'op': 'clear', 'document_id': 'bad'}], run_operation, self.executor)
+        self.assertEqual((result['status'], result['succeeded'], result['failed']), ('partial', 1, 1))
+        self.assertEqual(result['results'][1]['result']['message'], 'boom')
+
+class TestBatchEndpoint(unittest.TestCase):
+
+    def test_batch_against_fake_backend(self):
+        """Tests the /batch handler end to end with fake services."""
+        backend = FakeGoogleBackend()
+        original_cache = mcp_server.service_cache
+        mcp_server.service_cache = mcp_server.ServiceCache(factory=lambda *args: backend.services())
+        try:
+            doc_a = backend.create_document().document_id
+            doc_b = backend.create_document().document_id
+            request = mcp_server.BatchRequest(auth_mode='service_account', creds_path='fake.json', operations=[
+                {'op': 'write', 'document_id': doc_a, 'markdown_text': '# A\\n{{X}}'},
+                {'op': 'append', 'document_id': doc_b, 'markdown_text': 'B'},
+                {'op': 'replace', 'document_id': doc_a, 'replacements': {'{{X}}': 'done'}},
+                {'op': 'create', 'title': 'New'},
+            ])
+            response = mcp_server.run_batch_operations(request)
+        finally:
+            mcp_server.service_cache = original_cache
+
+        self.assertEqual(response['status'], 'success', response)
+        self.assertIn('done', backend.document(doc_a).body_text())
+        self.assertIn('B', backend.document(doc_b).body_text())
+        self.assertTrue(response['results'][3]['document_id'].startswith('fake-doc-'))
+
+    def test_batch_operations_match_their_endpoints(self):
+        """Tests that batch writes honour incremental and resume_from, and batch appends go through the combiner."""
+        backend = FakeGoogleBackend()
+        original_cache = mcp_server.service_cache
+        mcp_server.service_cache = mcp_server.ServiceCache(factory=lambda *args: backend.services())
+        submitted = []
+        original_submit = mcp_server.append_combiner.submit
+        mcp_server.append_combiner.submit = lambda key, text, append: submitted.append(key) or original_submit(key, text, append)
+        try:
+            document_id = backend.create_document().document_id
+            batch = lambda *operations: mcp_server.run_batch_operations(mcp_server.BatchRequest(
+                auth_mode='service_account', creds_path='fake.json', operations=list(operations)))
+            self.assertEqual(batch({'op': 'write', 'document_id': document_id, 'markdown_text': 'one\n\ntwo'})['status'], 'success')
+            response = batch({'op': 'write', 'document_id': document_id, 'markdown_text': 'one\n\nthree', 'incremental': True},
+                             {'op': 'append', 'document_id': document_id, 'markdown_text': 'end'})
+            self.assertEqual(response['status'], 'success', response)
+            self.assertIn('diff', response['results'][0]['result'])
+            self.assertEqual(submitted, [('service_account', 'fake.json', 'token.json', document_id)])
+            self.assertEqual(response['results'][1]['result']['combined_appends'], 1)
+            self.assertEqual(backend.document(document_id).body_text(), 'one\n\nthree\n\nend\n\n')
+
+            resumed = batch({'op': 'write', 'markdown_text': 'unused', 'resume_from': {'document_id': document_id, 'completed_requests': 0}})
+            self.assertEqual(resumed['results'][0]['document_id'], document_id)
+        finally:
+            mcp_server.append_combiner.submit = original_submit
+            mcp_server.service_cache = original_cache
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.server.combiner import AppendCombiner, APPEND_SEPARATOR
+from src.tool import google_docs_tool
+from test.fake_google_docs import FakeGoogleBackend, rendered
+
+def submit_in_order(combiner, key, texts, append, gap=0.01):
+    """Submits texts from separate threads, one after another, and returns their results in order."""
+    results = [None] * len(texts)
+
+    def run(i):
+        results[i] = combiner.submit(key, texts[i], append)
+
+    threads = []
+    for i in range(len(texts)):
+        thread = threading.Thread(target=run, args=(i,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(gap)
+    for thread in threads:
+        thread.join()
+    return results
+
+class TestAppendCombiner(unittest.TestCase):
+
+    def test_appends_within_window_become_one_call(self):
+        """Tests that texts are joined in arrival order and every caller gets the shared result."""
+        calls = []
+        combiner = AppendCombiner(flush_window=0.3)
+        results = submit_in_order(combiner, 'doc', ['a', 'b', 'c'], lambda text: calls.append(text) or {"status": "success"})
+        self.assertEqual(calls, [APPEND_SEPARATOR.join(['a', 'b', 'c'])])
+        self.assertEqual(results, [{"status": "success", "combined_appends": 3}] * 3)
+
+    def test_keys_and_full_groups_are_flushed_separately(self):
+        """Tests that other keys are not combined and a full group flushes without waiting."""
+        calls = []
+        combiner = AppendCombiner(flush_window=5, max_appends=2)
+        append = lambda text: calls.append(text) or {"status": "success"}
+        started = time.perf_counter()
+        submit_in_order(combiner, 'doc', ['a', 'b'], append)
+        self.assertLess(time.perf_counter() - started, 2)
+        self.assertEqual(AppendCombiner().submit('other', 'c', append), {"status": "success", "combined_appends": 1})
+        self.assertEqual(calls, ['a\n\nb', 'c'])
+
+    def test_lone_append_is_sent_at_once(self):
+        """Tests that without a write in flight an append does not wait for others."""
+        combiner = AppendCombiner()
+        started = time.perf_counter()
+        combiner.submit('doc', 'a', lambda text: {"status": "success"})
+        self.assertLess(time.perf_counter() - started, 0.02)
+
+    def test_appends_behind_a_write_are_combined(self):
+        """Tests that appends arriving while a write runs go out together once it finishes."""
+        calls = []
+        combiner = AppendCombiner()
+
+        def slow_append(text):
+            calls.append(text)
+            time.sleep(0.2 if text == 'first' else 0)
+            return {"status": "success"}
+
+        results = submit_in_order(combiner, 'doc', ['first', 'b', 'c'], slow_append, gap=0.02)
+        self.assertEqual(calls, ['first', 'b\n\nc'])
+        self.assertEqual([result['combined_appends'] for result in results], [1, 2, 2])
+
+    def test_groups_for_a_key_run_in_order(self):
+        """Tests that a group closed later never overtakes the one still writing."""
+        calls = []
+        combiner = AppendCombiner(flush_window=0.05)
+
+        def slow_append(text):
+            time.sleep(0.2 if text == 'first' else 0)
+            calls.append(text)
+            return {"status": "success"}
+
+        submit_in_order(combiner, 'doc', ['first', 'second'], slow_append, gap=0.1)
+        self.assertEqual(calls, ['first', 'second'])
+
+    def test_combined_append_renders_like_separate_appends(self):
+        """Tests against the fake backend that one combined write matches N sequential appends."""
+        texts = ["# Log", "* one\n  * two", "Some **bold** text", "* three"]
+        backend = FakeGoogleBackend()
+        docs = backend.services()['docs']
+        combined, separate = backend.create_document(), backend.create_document()
+        for text in texts:
+            google_docs_tool.append_to_google_doc(docs, separate.document_id, text)
+
+        calls_before = backend.calls['documents.batchUpdate']
+        combiner = AppendCombiner(flush_window=0.3)
+        results = submit_in_order(combiner, combined.document_id, texts,
+                                  lambda text: google_docs_tool.append_to_google_doc(docs, combined.document_id, text))
+        self.assertTrue(all(result['status'] == 'success' for result in results))
+        self.assertEqual(backend.calls['documents.batchUpdate'] - calls_before, 1)
+        self.assertEqual(rendered(combined), rendered(separate))
+
+if __name__ == '__main__':
+    unittest.main()
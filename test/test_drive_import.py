@@ -0,0 +1,81 @@
+import unittest
+import sys
+import os
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tool import google_docs_tool, drive_import, markdown_parser
+from test.fake_google_docs import FakeGoogleBackend, make_http_error, rendered
+
+MARKDOWN = "# Report\nHello **bold**, *italic*, `code` and [a link](http://x.test/?a=1&b=2) <kept>\n\n* one\n  * two\n    * three\n* four\n## Done"
+
+class TestDriveImport(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = FakeGoogleBackend()
+        self.services = self.backend.services()
+
+    def write_new(self, markdown):
+        result = google_docs_tool.write_to_google_doc(self.services['docs'], self.services['drive'], markdown, title="Report")
+        self.assertEqual(result['status'], 'success', result.get('message'))
+        return result
+
+    def test_new_document_is_imported_in_one_call(self):
+        """Tests that a new document is created by one upload and renders like the batchUpdate path.
+
+        The fake's HtmlImporter follows the same rules plan_to_html was written for, so this checks
+        the two paths agree under those rules, not what Drive's own converter produces.
+        """
+        result = self.write_new(MARKDOWN)
+        self.assertTrue(result['imported'])
+        self.assertEqual(dict(self.backend.calls), {'files.create': 1})
+
+        reference = self.backend.create_document()
+        google_docs_tool.write_to_google_doc(self.services['docs'], self.services['drive'], MARKDOWN, document_id=reference.document_id)
+        self.assertEqual(rendered(self.backend.document(result['document_id'])), rendered(reference))
+
+    def test_unsupported_content_uses_batch_update(self):
+        """Tests that content HTML would change is written with batchUpdate, without clearing the new document."""
+        for markdown in ["two  spaces", "* one\n    * too deep", " leading"]:
+            self.assertFalse(drive_import.is_importable(markdown_parser.plan_markdown(markdown)), markdown)
+        result = self.write_new("keep  both  spaces")
+        self.assertNotIn('imported', result)
+        self.assertEqual(dict(self.backend.calls), {'files.create': 1, 'documents.get': 1, 'documents.batchUpdate': 1})
+        self.assertEqual(self.backend.document(result['document_id']).body_text(), "keep  both  spaces\n\n")
+
+    def test_failed_upload_falls_back(self):
+        """Tests that a rejected import is retried as an empty document filled with batchUpdate."""
+        self.backend.inject_error(400)
+        result = self.write_new("* one\n* two")
+        self.assertNotIn('imported', result)
+        self.assertEqual(self.backend.document(result['document_id']).body_text(), "one\ntwo\n\n")
+
+    def test_upload_that_may_have_created_a_document_is_not_repeated(self):
+        """Tests that a server error on import is returned instead of retried or created again."""
+        self.backend.inject_error(503)
+        result = google_docs_tool.write_to_google_doc(self.services['docs'], self.services['drive'], "* one\n* two", title="Report")
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(dict(self.backend.calls), {'files.create': 1, 'errors': 1})
+
+    def test_fallback_write_is_pinned_to_the_new_revision(self):
+        """Tests that a 5xx which was applied anyway is not applied again when the write is retried."""
+        batch_update = self.backend.batch_update
+
+        def applied_then_failed(document_id, body):
+            self.backend.batch_update = batch_update
+            batch_update(document_id, body)
+            raise make_http_error(503, "Backend error.")
+        self.backend.batch_update = applied_then_failed
+
+        result = google_docs_tool.write_to_google_doc(self.services['docs'], self.services['drive'], "keep  both  spaces", title="Report")
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(self.backend.document(result['document_id']).body_text(), "keep  both  spaces\n\n")
+
+    def test_html_rendering(self):
+        """Tests list nesting, escaping and empty paragraphs in the rendered HTML."""
+        html = drive_import.plan_to_html(markdown_parser.plan_markdown("a < b\n\n* x\n  * y\n* z\n# H"))
+        self.assertIn('<p>a &lt; b</p><p><br></p><ul><li>x<ul><li>y</li></ul></li><li>z</li></ul><h1>H</h1><p><br></p></body>', html)
+
+if __name__ == '__main__':
+    unittest.main()
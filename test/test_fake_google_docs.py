@@ -0,0 +1,97 @@
+import unittest
+import sys
+import os
+import io
+from unittest import mock
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tool import google_docs_tool, markdown_parser
+from test.fake_google_docs import FakeGoogleBackend
+
+def paragraph_summary(document):
+    """Returns (text, namedStyleType, bold substrings) for every paragraph of a fake document."""
+    summary = []
+    for _, text, style, _, runs in document.paragraphs():
+        bold = [run_text for _, run_text, text_style in runs if text_style.get('bold')]
+        summary.append((text.rstrip('\n'), style.get('namedStyleType', 'NORMAL_TEXT'), bold))
+    return summary
+
+class TestToolAgainstFakeBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = FakeGoogleBackend()
+        self.services = self.backend.services()
+
+    def write(self, markdown, **kwargs):
+        return google_docs_tool.write_to_google_doc(
+            docs_service=self.services['docs'],
+            drive_service=self.services['drive'],
+            markdown_content=markdown,
+            **kwargs
+        )
+
+    def test_write_renders_markdown(self):
+        """Tests that a new document contains the rendered text, headings and bold runs."""
+        result = self.write("# Title\nSome **bold** text")
+        self.assertEqual(result['status'], 'success')
+        document = self.backend.document(result['document_id'])
+        self.assertEqual(paragraph_summary(document), [
+            ('Title', 'HEADING_1', []),
+            ('Some bold text', 'NORMAL_TEXT', ['bold']),
+            ('', 'NORMAL_TEXT', []),
+        ])
+
+    def test_overwrite_append_replace_and_clear(self):
+        """Tests the full write, append, replace and clear cycle on one document."""
+        document_id = self.write("Intro {{NAME}}")['document_id']
+        docs = self.services['docs']
+        self.assertEqual(google_docs_tool.append_to_google_doc(docs, document_id, "## Next")['status'], 'success')
+        result = google_docs_tool.replace_markdown_placeholders(docs, document_id, {'{{NAME}}': '**World**'})
+        self.assertEqual(result['status'], 'success')
+        document = self.backend.document(document_id)
+        self.assertIn('World', document.body_text())
+        self.assertNotIn('{{NAME}}', document.body_text())
+        self.assertIn(('Next', 'HEADING_2', []), paragraph_summary(document))
+
+        self.assertEqual(google_docs_tool.clear_google_doc(docs, document_id)['status'], 'success')
+        self.assertEqual(document.body_text(), '\n')
+
+    def test_lists_become_native_bullets(self):
+        """Tests that list items are real list paragraphs with their nesting level and no glyphs."""
+        markdown = "# Title\n* One\n  * Two\n    * Three\nAfter"
+        whole = self.backend.document(self.write(markdown)['document_id'])
+        self.assertEqual(whole.body_text(), "Title\nOne\nTwo\nThree\nAfter\n\n")
+        bullets = [bullet and bullet['nestingLevel'] for _, _, _, bullet, _ in whole.paragraphs()]
+        self.assertEqual(bullets, [None, 0, 1, 2, None, None])
+        self.assertEqual(paragraph_summary(whole)[-2], ('After', 'NORMAL_TEXT', []))
+
+        # Lists split across streaming blocks must not shift the content that follows them.
+        with mock.patch.object(markdown_parser, 'STREAM_BLOCK_LINES', 2):
+            streamed = self.backend.document(self.write(io.StringIO(markdown))['document_id'])
+        self.assertEqual(streamed.body_text(), whole.body_text())
+        self.assertEqual(paragraph_summary(streamed), paragraph_summary(whole))
+
+    def test_quota_errors_are_retried(self):
+        """Tests that injected 429 responses are retried until the write succeeds."""
+        document_id = self.write("first")['document_id']
+        self.backend.inject_error(429, retry_after=0, count=2)
+        result = google_docs_tool.append_to_google_doc(self.services['docs'], document_id, "second")
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(self.backend.calls['errors'], 2)
+        self.assertIn('second', self.backend.document(document_id).body_text())
+
+    def test_stale_revision_is_rejected(self):
+        """Tests that the fake enforces writeControl.requiredRevisionId."""
+        document_id = self.write("text")['document_id']
+        body = {
+            'requests': [{'insertText': {'location': {'index': 1}, 'text': 'x'}}],
+            'writeControl': {'requiredRevisionId': 'stale'}
+        }
+        with self.assertRaises(Exception):
+            self.services['docs'].documents().batchUpdate(documentId=document_id, body=body).execute()
+        self.assertEqual(self.backend.document(document_id).body_text(), 'text\n\n')
+
+if __name__ == '__main__':
+    unittest.main()
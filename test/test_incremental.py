@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tool import google_docs_tool, incremental
+from test.fake_google_docs import FakeGoogleBackend
+
+def make_doc(paragraphs):
+    """Builds a documents().get() body from (text, named_style) pairs plus the empty final paragraph."""
+    content = [{'endIndex': 1, 'sectionBreak': {}}]
+    index = 1
+    for text, named_style in list(paragraphs) + [('', 'NORMAL_TEXT')]:
+        end = index + len(text) + 1
+        content.append({
+            'startIndex': index,
+            'endIndex': end,
+            'paragraph': {
+                'elements': [{'startIndex': index, 'endIndex': end, 'textRun': {'content': text + '\n', 'textStyle': {}}}],
+                'paragraphStyle': {'namedStyleType': named_style}
+            }
+        })
+        index = end
+    return {'revisionId': 'rev-1', 'body': {'content': content}}
+
+def apply_text_edits(text, requests):
+    """Applies insertText and deleteContentRange requests to a body string that starts at index 1."""
+    for request in requests:
+        if 'insertText' in request:
+            i = request['insertText']['location']['index'] - 1
+            text = text[:i] + request['insertText']['text'] + text[i:]
+        elif 'deleteContentRange' in request:
+            r = request['deleteContentRange']['range']
+            text = text[:r['startIndex'] - 1] + text[r['endIndex'] - 1:]
+    return text
+
+class TestIncrementalWrite(unittest.TestCase):
+
+    def test_unchanged_document_needs_no_requests(self):
+        """Tests that identical content produces no requests."""
+        doc = make_doc([('Title', 'HEADING_1'), ('Body', 'NORMAL_TEXT')])
+        requests, stats = incremental.get_incremental_requests(doc, "# Title\nBody")
+        self.assertEqual(requests, [])
+        self.assertEqual(stats['paragraphs_kept'], 2)
+
+    def test_only_changed_paragraph_is_rewritten(self):
+        """Tests that a single changed paragraph is deleted and re-inserted in place."""
+        doc = make_doc([('One', 'NORMAL_TEXT'), ('Two', 'NORMAL_TEXT'), ('Three', 'NORMAL_TEXT')])
+        requests, stats = incremental.get_incremental_requests(doc, "One\n## Deux\nThree")
+        self.assertEqual(requests[0], {'deleteContentRange': {'range': {'startIndex': 5, 'endIndex': 9}}})
+        self.assertEqual(requests[1], {'insertText': {'location': {'index': 5}, 'text': 'Deux\n'}})
+        self.assertIn({
+            'updateParagraphStyle': {
+                'range': {'startIndex': 5, 'endIndex': 10},
+                'paragraphStyle': {'namedStyleType': 'HEADING_2'},
+                'fields': 'namedStyleType,indentStart,indentFirstLine'
+            }
+        }, requests)
+        self.assertEqual((stats['paragraphs_deleted'], stats['paragraphs_inserted']), (1, 1))
+
+    def test_edits_produce_target_text(self):
+        """Tests that insertions, deletions and appends yield the target text."""
+        doc = make_doc([('a', 'NORMAL_TEXT'), ('b', 'NORMAL_TEXT'), ('c', 'NORMAL_TEXT'), ('d', 'NORMAL_TEXT')])
+        requests, _ = incremental.get_incremental_requests(doc, "a\nnew\nc\nd\ntail")
+        self.assertEqual(apply_text_edits('a\nb\nc\nd\n\n', requests), 'a\nnew\nc\nd\ntail\n\n')
+
+    def test_non_empty_final_paragraph_falls_back(self):
+        """Tests that documents not ending in an empty paragraph require a full rewrite."""
+        doc = make_doc([('a', 'NORMAL_TEXT')])
+        doc['body']['content'][-1]['paragraph']['elements'][0]['textRun']['content'] = 'x\n'
+        self.assertEqual(incremental.get_incremental_requests(doc, "a"), (None, None))
+
+    def test_list_items_round_trip(self):
+        """Tests that list nesting is compared and that inserted paragraphs do not join a following list."""
+        backend = FakeGoogleBackend()
+        services = backend.services()
+        original = "Intro\n* One\n  * Two\nEnd"
+        document_id = google_docs_tool.write_to_google_doc(services['docs'], services['drive'], original)['document_id']
+        document = backend.document(document_id)
+
+        requests, _ = incremental.get_incremental_requests(document.to_json(), original)
+        self.assertEqual(requests, [])
+
+        result = google_docs_tool.write_to_google_doc(
+            services['docs'], services['drive'], "Intro\nNew paragraph\n* One\n* Two\nEnd",
+            document_id=document_id, incremental=True
+        )
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(document.body_text(), "Intro\nNew paragraph\nOne\nTwo\nEnd\n\n")
+        bullets = [bullet and bullet['nestingLevel'] for _, _, _, bullet, _ in document.paragraphs()]
+        self.assertEqual(bullets, [None, None, 0, 0, None, None])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.server.jobs import JobQueue, QueueFullError
+
+def wait_for(queue, job_ids, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if all(queue.get(j)['status'] in ('succeeded', 'failed') for j in job_ids):
+            return
+        time.sleep(0.01)
+    raise AssertionError("Jobs did not finish in time.")
+
+class TestJobQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = JobQueue(max_workers=4, max_pending=50)
+
+    def tearDown(self):
+        self.queue.shutdown()
+
+    def test_same_document_runs_in_order(self):
+        """Tests that jobs sharing a document ID never overlap and keep submission order."""
+        # Jobs only record what they saw; a failed assertion inside one would just fail the job.
+        order, active, overlaps = [], [], []
+        lock = threading.Lock()
+
+        def job(n):
+            with lock:
+                active.append(n)
+                overlaps.append(len(active))
+            time.sleep(0.005)
+            with lock:
+                active.remove(n)
+                order.append(n)
+            return {"status": "success"}
+
+        job_ids = [self.queue.submit('doc-1', job, n) for n in range(10)]
+        wait_for(self.queue, job_ids)
+        self.assertEqual(overlaps, [1] * 10)
+        self.assertEqual(order, list(range(10)))
+        self.assertEqual({self.queue.get(j)['status'] for j in job_ids}, {'succeeded'})
+
+    def test_different_documents_run_in_parallel(self):
+        """Tests that jobs for different documents run concurrently."""
+        barrier = threading.Barrier(2, timeout=2)
+
+        def job():
+            barrier.wait()
+            return {"status": "success"}
+
+        job_ids = [self.queue.submit('doc-a', job), self.queue.submit('doc-b', job)]
+        wait_for(self.queue, job_ids)
+        self.assertEqual([self.queue.get(j)['status'] for j in job_ids], ['succeeded', 'succeeded'])
+
+    def test_failed_job_reports_result(self):
+        """Tests that error results and exceptions mark the job as failed."""
+        def error_result():
+            return {"status": "error", "message": "nope"}
+
+        def raises():
+            raise RuntimeError("boom")
+
+        job_ids = [self.queue.submit('doc', error_result), self.queue.submit('doc', raises)]
+        wait_for(self.queue, job_ids)
+        first, second = (self.queue.get(j) for j in job_ids)
+        self.assertEqual(first['status'], 'failed')
+        self.assertEqual(first['result']['message'], 'nope')
+        self.assertEqual(second['error'], 'boom')
+        self.assertEqual(first['document_id'], 'doc')
+
+    def test_queue_full(self):
+        """Tests that submissions beyond max_pending are rejected."""
+        queue = JobQueue(max_workers=1, max_pending=2)
+        release = threading.Event()
+        try:
+            queue.submit('doc', release.wait)
+            while queue.depth()['running'] == 0:
+                time.sleep(0.005)
+            queue.submit('doc', release.wait)
+            queue.submit('doc', release.wait)
+            with self.assertRaises(QueueFullError):
+                queue.submit('doc', release.wait)
+            self.assertEqual(queue.depth()['pending'], 2)
+        finally:
+            release.set()
+            queue.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
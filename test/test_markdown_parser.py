@@ -1,11 +1,17 @@
 import unittest
+from unittest import mock
+import io
+import itertools
+import multiprocessing
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 # Add the project root directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.tool import markdown_parser
+from test.fake_google_docs import FakeGoogleBackend
 
 class TestMarkdownParser(unittest.TestCase):
 
@@ -88,5 +94,203 @@ class TestMarkdownParser(unittest.TestCase):
             }
         }, requests)
 
+    def test_coalesced_single_insert(self):
+        """Tests that coalesced mode inserts the whole text with one request."""
+        md = "# Title\nThis is **bold** text.\n* One"
+        requests = markdown_parser.get_markdown_requests(md, 1, coalesce=True)
+        inserts = [r for r in requests if 'insertText' in r]
+        self.assertEqual(inserts, [{'insertText': {'location': {'index': 1}, 'text': 'Title\nThis is bold text.\nOne\n'}}])
+        self.assertIn({
+            'updateTextStyle': {
+                'range': {'startIndex': 15, 'endIndex': 19},
+                'textStyle': {'bold': True},
+                'fields': 'bold'
+            }
+        }, requests)
+        self.assertIn({
+            'updateParagraphStyle': {
+                'range': {'startIndex': 1, 'endIndex': 7},
+                'paragraphStyle': {'namedStyleType': 'HEADING_1'},
+                'fields': 'namedStyleType'
+            }
+        }, requests)
+
+    def test_coalesced_matches_legacy_ranges(self):
+        """Tests that coalesced mode produces the same text and styled ranges as the legacy mode."""
+        md = "## Sub **a** and **b**\n\nText **x**\n#### Small\nPlain"
+        legacy = markdown_parser.get_markdown_requests(md, 5)
+        coalesced = markdown_parser.get_markdown_requests(md, 5, coalesce=True)
+        legacy_text = ''.join(r['insertText']['text'] for r in legacy if 'insertText' in r)
+        self.assertEqual(coalesced[0]['insertText']['text'], legacy_text)
+        def bold_updates(reqs):
+            return [r for r in reqs if 'updateTextStyle' in r and r['updateTextStyle']['textStyle']['bold']]
+        self.assertEqual(bold_updates(coalesced), bold_updates(legacy))
+        self.assertEqual(
+            [r for r in coalesced if 'updateParagraphStyle' in r],
+            [r for r in legacy if 'updateParagraphStyle' in r]
+        )
+        self.assertLess(len(coalesced), len(legacy))
+
+    def test_coalesced_native_bullets(self):
+        """Tests that each run of list items becomes one createParagraphBullets request, last run first."""
+        md = "* One\n  * Two **b**\n    - Three\nText\n- Four"
+        requests = markdown_parser.get_markdown_requests(md, 1, coalesce=True)
+        self.assertEqual(requests[0]['insertText']['text'], "One\n\tTwo b\n\t\tThree\nText\nFour\n")
+        self.assertIn({
+            'updateTextStyle': {
+                'range': {'startIndex': 10, 'endIndex': 11},
+                'textStyle': {'bold': True},
+                'fields': 'bold'
+            }
+        }, requests)
+        bullets = [r['createParagraphBullets'] for r in requests if 'createParagraphBullets' in r]
+        self.assertEqual(bullets, [
+            {'range': {'startIndex': 25, 'endIndex': 30}, 'bulletPreset': 'BULLET_DISC_CIRCLE_SQUARE'},
+            {'range': {'startIndex': 1, 'endIndex': 20}, 'bulletPreset': 'BULLET_DISC_CIRCLE_SQUARE'},
+        ])
+        self.assertFalse([r for r in requests if 'updateParagraphStyle' in r])
+        self.assertEqual(markdown_parser.plan_length(markdown_parser.plan_markdown(md)), len(requests[0]['insertText']['text']) - 3)
+
+    def test_streaming_matches_coalesced(self):
+        """Tests that streaming in small blocks renders the same document as one block."""
+        md = "# Title\n\nSome **bold** words\n* One\n  * Two\n## End\n"
+        whole = markdown_parser.get_markdown_requests(md, 1, coalesce=True)
+        streamed = list(markdown_parser.iter_markdown_requests(io.StringIO(md), 1, block_lines=2))
+        text = ''.join(r['insertText']['text'] for r in streamed if 'insertText' in r)
+        self.assertEqual(text, whole[0]['insertText']['text'])
+        # Blocks after a list are planned once its bullets have removed the nesting tabs, so the
+        # indices differ from the single plan; the documents they produce must not.
+        self.assertEqual(self.apply(streamed), self.apply(whole))
+
+    def apply(self, requests):
+        backend = FakeGoogleBackend()
+        document = backend.create_document()
+        backend.batch_update(document.document_id, {'requests': list(requests)})
+        return list(document.paragraphs())
+
+    def test_streaming_keeps_list_runs_at_block_boundaries(self):
+        """Tests that a list crossing a block boundary stays one list with its nesting."""
+        md = "\n".join(["plain %d" % n for n in range(998)] + ["* a", "  * b", "* c", "* d", "after"])
+        whole = markdown_parser.get_markdown_requests(md, 1, coalesce=True)
+        streamed = list(markdown_parser.iter_markdown_requests(io.StringIO(md), 1))
+        def bullets(reqs):
+            return [r for r in reqs if 'createParagraphBullets' in r]
+        self.assertEqual(len(bullets(streamed)), 1)
+        self.assertEqual(bullets(streamed), bullets(whole))
+        text = ''.join(r['insertText']['text'] for r in streamed if 'insertText' in r)
+        self.assertEqual(text, whole[0]['insertText']['text'])
+
+    def test_streaming_line_splitting(self):
+        """Tests that file lines split exactly like str.split, including the trailing line."""
+        for md in ["", "a", "a\n", "a\n\nb", "a\nb\n\n"]:
+            self.assertEqual(list(markdown_parser.iter_markdown_lines(io.StringIO(md))), md.split('\n'))
+
+    def test_streaming_is_lazy(self):
+        """Tests that requests are produced before the input is exhausted."""
+        endless = ("line %d\n" % n for n in itertools.count())
+        first = list(itertools.islice(markdown_parser.iter_markdown_requests(endless, 1, block_lines=10), 3))
+        self.assertEqual(first[0]['insertText']['location']['index'], 1)
+
+    def test_inline_styles_single_pass(self):
+        """Tests italic, inline code and links alongside bold."""
+        spans = markdown_parser.tokenize_inline("a **b** *c* `d` [e](http://x.y) snake_case_name _f_")
+        self.assertEqual(spans, [
+            ('a ', None),
+            ('b', {'bold': True}),
+            (' ', None),
+            ('c', {'italic': True}),
+            (' ', None),
+            ('d', {'weightedFontFamily': {'fontFamily': 'Courier New'}}),
+            (' ', None),
+            ('e', {'link': {'url': 'http://x.y'}}),
+            (' snake_case_name ', None),
+            ('f', {'italic': True}),
+        ])
+
+    def test_unmatched_markers_stay_literal(self):
+        """Tests that unmatched markers are kept as text and indices stay consistent."""
+        md = "**a** then **b and 2 * 3"
+        requests = markdown_parser.get_markdown_requests(md, 1)
+        text = ''.join(r['insertText']['text'] for r in requests if 'insertText' in r)
+        self.assertEqual(text, "a then **b and 2 * 3\n")
+        self.assertEqual(requests[-1], {'insertText': {'location': {'index': 1 + len(text) - 1}, 'text': '\n'}})
+
+    def test_link_request(self):
+        """Tests that a link becomes an updateTextStyle with the link field."""
+        requests = markdown_parser.get_markdown_requests("see [docs](https://example.com)", 1, coalesce=True)
+        self.assertIn({
+            'updateTextStyle': {
+                'range': {'startIndex': 5, 'endIndex': 9},
+                'textStyle': {'link': {'url': 'https://example.com'}},
+                'fields': 'link'
+            }
+        }, requests)
+
+    def test_plan_cache_rebases_identical_content(self):
+        """Tests that identical fragments are parsed once and only re-anchored."""
+        markdown_parser.clear_plan_cache()
+        md = "## Boilerplate\nWith **bold** text"
+        first = markdown_parser.get_markdown_requests(md, 1, coalesce=True)
+        second = markdown_parser.get_markdown_requests(md, 101, coalesce=True)
+        self.assertEqual(markdown_parser.plan_cache_info()['hits'], 1)
+        self.assertEqual(len(first), len(second))
+        for a, b in zip(first, second):
+            (kind, params_a), = a.items()
+            params_b = b[kind]
+            if kind == 'insertText':
+                self.assertEqual(params_b['location']['index'], params_a['location']['index'] + 100)
+            else:
+                self.assertEqual(params_b['range']['startIndex'], params_a['range']['startIndex'] + 100)
+                self.assertEqual(params_b['range']['endIndex'], params_a['range']['endIndex'] + 100)
+
+    def test_planned_requests_are_built_on_read(self):
+        """Tests that planned requests index, slice and rebase like the request list they stand for."""
+        md = "# Title\nSome **bold** text\n* One\n* Two"
+        planned = markdown_parser.get_markdown_requests(md, 1, coalesce=True)
+        expected = list(planned)
+        self.assertEqual(len(planned), len(expected))
+        self.assertEqual(planned[-1], expected[-1])
+        self.assertEqual(planned[1:3], expected[1:3])
+        self.assertEqual(planned, expected)
+        self.assertEqual(planned.rebase(11), markdown_parser.get_markdown_requests(md, 11, coalesce=True))
+        self.assertIs(planned.rebase(11).plan, planned.plan)
+
+    def test_split_only_before_non_list_lines(self):
+        """Tests that segments rejoin to the input and never start inside a list run."""
+        md = "\n".join(["intro text", "* a", "  * b", "* c", "", "## Head", "* d", "plain"] * 40)
+        segments = markdown_parser.split_markdown(md, segment_chars=30)
+        self.assertGreater(len(segments), 10)
+        self.assertEqual("\n".join(segments), md)
+        for segment in segments[1:]:
+            match = markdown_parser.LINE_PATTERN.match(segment.split("\n", 1)[0])
+            self.assertFalse(match and match.group('bullet'), segment[:20])
+
+    def test_parallel_plan_matches_serial(self):
+        """Tests that planning segments in a process pool gives exactly the serial plan."""
+        md = "\n".join(["# Title %d" % n + "\nSome **bold** and *it* [x](http://x.y)\n* one\n  * two `c`\n\ntext" for n in range(200)])
+        serial = markdown_parser.plan_markdown(md)
+        with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context('spawn')) as pool:
+            parallel = markdown_parser.parallel_plan_markdown(md, pool, segment_chars=500)
+        self.assertEqual(parallel[0], serial[0])
+        self.assertEqual([list(part) for part in parallel[1:]], [list(part) for part in serial[1:]])
+
+    def test_plan_cache_is_bounded(self):
+        """Tests that the cache evicts the least recently used plans."""
+        markdown_parser.clear_plan_cache()
+        for n in range(markdown_parser.PLAN_CACHE_SIZE + 10):
+            markdown_parser.cached_plan_markdown(f"line {n}")
+        self.assertEqual(markdown_parser.plan_cache_info()['size'], markdown_parser.PLAN_CACHE_SIZE)
+
+    def test_plan_cache_is_bounded_by_total_size(self):
+        """Tests that large plans are evicted once their combined text exceeds the size budget."""
+        markdown_parser.clear_plan_cache()
+        with mock.patch.object(markdown_parser, 'PLAN_CACHE_MAX_TOTAL_CHARS', 250):
+            for n in range(10):
+                markdown_parser.cached_plan_markdown(str(n) * 99)
+            info = markdown_parser.plan_cache_info()
+        self.assertEqual(info['size'], 2)
+        self.assertEqual(info['chars'], 200)
+        markdown_parser.clear_plan_cache()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
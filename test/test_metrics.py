@@ -0,0 +1,90 @@
+import unittest
+import sys
+import os
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.server import metrics, mcp_server
+from test.fake_google_docs import FakeGoogleBackend
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def test_renders_prometheus_text_format(self):
+        """Tests counter, gauge and cumulative histogram rendering."""
+        registry = metrics.MetricsRegistry(prefix="t")
+        registry.counter("calls", "Calls.").inc(2, code="429")
+        registry.gauge("depth", "Depth.").set(3)
+        histogram = registry.histogram("seconds", "Seconds.", buckets=(0.1, 1.0))
+        histogram.observe(0.05, phase="parse")
+        histogram.observe(0.5, phase="parse")
+        lines = registry.render().splitlines()
+        self.assertIn('# TYPE t_calls_total counter', lines)
+        self.assertIn('t_calls_total{code="429"} 2', lines)
+        self.assertIn('# TYPE t_depth gauge', lines)
+        self.assertIn('t_depth 3', lines)
+        self.assertIn('t_seconds_bucket{phase="parse",le="0.1"} 1', lines)
+        self.assertIn('t_seconds_bucket{phase="parse",le="1.0"} 2', lines)
+        self.assertIn('t_seconds_bucket{phase="parse",le="+Inf"} 2', lines)
+        self.assertIn('t_seconds_count{phase="parse"} 2', lines)
+
+    def test_label_values_are_escaped(self):
+        registry = metrics.MetricsRegistry(prefix="t")
+        registry.counter("c", "C.").inc(endpoint='a"b\\c')
+        self.assertIn('t_c_total{endpoint="a\\"b\\\\c"} 1', registry.render())
+
+class TestServerMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = FakeGoogleBackend()
+        self.original_cache = mcp_server.service_cache
+        self.original_registry = mcp_server.metrics_registry
+        mcp_server.service_cache = mcp_server.ServiceCache(factory=lambda *args: self.backend.services())
+        mcp_server.metrics_registry = metrics.create_registry()
+        mcp_server.telemetry.set_sink(mcp_server.metrics_registry)
+
+    def tearDown(self):
+        mcp_server.service_cache = self.original_cache
+        mcp_server.metrics_registry = self.original_registry
+        mcp_server.telemetry.set_sink(self.original_registry)
+
+    def test_append_records_phases_and_api_counters(self):
+        """Tests that auth, get, parse and batchUpdate are timed and retries are counted."""
+        document_id = self.backend.create_document().document_id
+        self.backend.inject_error(429, retry_after='0')
+        request = mcp_server.AppendMarkdownRequest(
+            auth_mode='service_account', creds_path='fake.json', document_id=document_id, markdown_text="# Hi\nSome **bold**"
+        )
+        self.assertEqual(mcp_server.append_markdown(request)['status'], 'success')
+
+        registry = mcp_server.metrics_registry
+        phases = registry.get("phase_seconds")
+        for phase in ('auth', 'documents.get', 'parse', 'documents.batchUpdate'):
+            self.assertGreaterEqual(phases.count(phase=phase), 1, phase)
+        self.assertEqual(registry.get("api_retries").value(method='documents.get', code='429'), 1)
+        self.assertEqual(registry.get("api_errors").value(method='documents.get', code='429'), 1)
+        self.assertEqual(registry.get("requests_emitted").value(), self.backend.requests_applied)
+        self.assertGreater(registry.get("bytes_sent").value(), 0)
+
+        body = mcp_server.get_metrics().body.decode()
+        self.assertIn('docs_tool_requests_emitted_total', body)
+        self.assertIn('docs_tool_jobs{state="pending"} 0', body)
+
+    def test_document_creation_is_counted_without_retries(self):
+        """Tests that files.create is timed and its errors counted, but a failed create is not repeated."""
+        write = lambda markdown: mcp_server.write_markdown(mcp_server.WriteMarkdownRequest(
+            auth_mode='service_account', creds_path='fake.json', markdown_text=markdown))
+        self.assertEqual(write("# Imported")['status'], 'success')
+        self.assertEqual(write("keep  both  spaces")['status'], 'success')
+        self.backend.inject_error(503)
+        with self.assertRaises(mcp_server.HTTPException):
+            write("# Failed")
+
+        registry = mcp_server.metrics_registry
+        self.assertEqual(registry.get("phase_seconds").count(phase='files.create'), 3)
+        self.assertEqual(registry.get("api_errors").value(method='files.create', code='503'), 1)
+        self.assertEqual(registry.get("api_retries").value(method='files.create', code='503'), 0)
+        self.assertEqual(self.backend.calls['files.create'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import unittest
+import copy
+from unittest.mock import MagicMock
+import sys
+import os
+import httplib2
+from googleapiclient.errors import HttpError
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tool import operations, markdown_parser
+from test.fake_google_docs import FakeDocument
+
+def make_docs_service(revisions):
+    """Returns a mock docs service whose batchUpdate responses carry the given revisions."""
+    docs_service = MagicMock()
+    docs_service.documents.return_value.batchUpdate.return_value.execute.side_effect = [
+        {'writeControl': {'requiredRevisionId': revision}} for revision in revisions
+    ]
+    return docs_service
+
+def http_error(status, retry_after=None):
+    headers = {'status': status}
+    if retry_after is not None:
+        headers['retry-after'] = retry_after
+    return HttpError(httplib2.Response(headers), b'{}')
+
+def sent_bodies(docs_service):
+    return [c.kwargs['body'] for c in docs_service.documents.return_value.batchUpdate.call_args_list]
+
+class TestChunkedBatchUpdate(unittest.TestCase):
+
+    def test_chunks_by_request_count_and_chains_revisions(self):
+        """Tests that requests are split by count and later chunks require the previous revision."""
+        requests = [{'insertText': {'location': {'index': 1}, 'text': 'x'}} for _ in range(5)]
+        docs_service = make_docs_service(['rev-1', 'rev-2', 'rev-3'])
+        result = operations.execute_batch_update(docs_service, 'doc', requests, max_requests=2, optimize=False)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['revision_id'], 'rev-3')
+        self.assertEqual(result['completed_requests'], 5)
+        self.assertEqual([c['requests'] for c in result['chunks']], [2, 2, 1])
+        bodies = sent_bodies(docs_service)
+        self.assertNotIn('writeControl', bodies[0])
+        self.assertEqual(bodies[1]['writeControl'], {'requiredRevisionId': 'rev-1'})
+        self.assertEqual(bodies[2]['writeControl'], {'requiredRevisionId': 'rev-2'})
+
+    def test_chunks_by_size(self):
+        """Tests that no chunk exceeds the byte limit and oversized inserts are split."""
+        requests = [{'insertText': {'location': {'index': 1}, 'text': 'a' * 500}}]
+        chunks = list(operations.iter_request_chunks(requests, max_requests=100, max_bytes=200))
+        self.assertTrue(all(size <= 200 for _, size in chunks))
+        pieces = [r['insertText'] for chunk, _ in chunks for r in chunk]
+        self.assertEqual(''.join(p['text'] for p in pieces), 'a' * 500)
+        index = 1
+        for piece in pieces:
+            self.assertEqual(piece['location']['index'], index)
+            index += len(piece['text'])
+
+    def test_reports_progress_on_error(self):
+        """Tests that a failing chunk reports how many requests were already applied."""
+        requests = [{'insertText': {'location': {'index': 1}, 'text': 'x'}} for _ in range(3)]
+        docs_service = MagicMock()
+        docs_service.documents.return_value.batchUpdate.return_value.execute.side_effect = [
+            {'writeControl': {'requiredRevisionId': 'rev-1'}},
+            RuntimeError('boom'),
+        ]
+        result = operations.execute_batch_update(docs_service, 'doc', requests, max_requests=2, optimize=False)
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(result['completed_requests'], 2)
+        self.assertEqual(result['revision_id'], 'rev-1')
+
+    def test_empty_request_list(self):
+        """Tests that an empty request list makes no API call."""
+        docs_service = MagicMock()
+        result = operations.execute_batch_update(docs_service, 'doc', [])
+        self.assertEqual(result['status'], 'success')
+        docs_service.documents.return_value.batchUpdate.assert_not_called()
+
+class TestRetry(unittest.TestCase):
+
+    def test_retry_after_is_honored(self):
+        """Tests that a 429 is retried after the delay given by Retry-After."""
+        request = MagicMock()
+        request.execute.side_effect = [http_error(429, '3'), {'ok': True}]
+        delays = []
+        self.assertEqual(operations.execute_with_retry(request, sleep=delays.append), {'ok': True})
+        self.assertEqual(delays, [3.0])
+
+    def test_backoff_is_bounded_and_non_retryable_raises(self):
+        """Tests jittered backoff bounds and that client errors are not retried."""
+        for attempt in range(10):
+            self.assertLessEqual(operations.retry_delay(attempt), operations.RETRY_MAX_DELAY)
+        request = MagicMock()
+        request.execute.side_effect = http_error(400)
+        with self.assertRaises(HttpError):
+            operations.execute_with_retry(request, sleep=lambda _: None)
+        self.assertEqual(request.execute.call_count, 1)
+
+    def test_chunk_retried_against_confirmed_revision(self):
+        """Tests that a chunk failing with 503 is retried with the last confirmed revision."""
+        requests = [{'insertText': {'location': {'index': 1}, 'text': 'x'}} for _ in range(4)]
+        docs_service = MagicMock()
+        docs_service.documents.return_value.batchUpdate.return_value.execute.side_effect = [
+            {'writeControl': {'requiredRevisionId': 'rev-1'}},
+            http_error(503, '0'),
+            {'writeControl': {'requiredRevisionId': 'rev-2'}},
+        ]
+        result = operations.execute_batch_update(docs_service, 'doc', requests, max_requests=2, optimize=False)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['retries'], 1)
+        self.assertEqual(len(result['chunks']), 2)
+        # The failed chunk is re-sent as the same request, still pinned to rev-1.
+        self.assertEqual(docs_service.documents.return_value.batchUpdate.return_value.execute.call_count, 3)
+        self.assertEqual(sent_bodies(docs_service)[1]['writeControl'], {'requiredRevisionId': 'rev-1'})
+
+    def test_resume_skips_applied_requests(self):
+        """Tests that skip_requests resumes after the requests that were already applied."""
+        requests = [{'insertText': {'location': {'index': i + 1}, 'text': 'x'}} for i in range(5)]
+        docs_service = make_docs_service(['rev-9'])
+        result = operations.execute_batch_update(docs_service, 'doc', requests, required_revision_id='rev-8', skip_requests=3, optimize=False)
+        self.assertEqual(result['completed_requests'], 5)
+        body = sent_bodies(docs_service)[0]
+        self.assertEqual([r['insertText']['location']['index'] for r in body['requests']], [4, 5])
+        self.assertEqual(body['writeControl'], {'requiredRevisionId': 'rev-8'})
+
+def render(requests):
+    """Applies requests to an empty fake document and returns its paragraphs."""
+    document = FakeDocument('doc')
+    for request in requests:
+        document.apply(request)
+    return list(document.paragraphs())
+
+class TestRequestOptimizer(unittest.TestCase):
+
+    MARKDOWN = "# Title\nSome **bold** and *italic* `code` [link](http://x.y) text\n* One **b**\n  - Two\n## A\n## B\n\nPlain end"
+
+    def test_optimized_requests_render_the_same(self):
+        """Tests that legacy and coalesced requests render identically after optimization."""
+        for coalesce in (False, True):
+            requests = markdown_parser.get_markdown_requests(self.MARKDOWN, 1, coalesce=coalesce)
+            snapshot = copy.deepcopy(requests)
+            optimized, stats = operations.optimize_requests(requests)
+            self.assertEqual(requests, snapshot)
+            self.assertEqual(render(optimized), render(requests))
+            self.assertEqual(stats, {'requests_before': len(requests), 'requests_after': len(optimized)})
+            self.assertLess(len(optimized), len(requests))
+
+    def test_planned_requests_merge_on_spans(self):
+        """Tests that merging a plan's spans matches the optimizer on the equivalent request dicts."""
+        planned = markdown_parser.get_markdown_requests(self.MARKDOWN, 1, coalesce=True)
+        merged = planned.optimized()
+        optimized, _ = operations.optimize_requests(list(planned))
+        self.assertIsInstance(merged, markdown_parser.PlannedRequests)
+        self.assertEqual(len(merged), len(optimized))
+        self.assertEqual(render(merged), render(optimized))
+
+    def test_merges_touching_styles_and_drops_no_ops(self):
+        """Tests merging of touching equal styles, overwritten updates and no-op requests."""
+        bold = {'bold': True}
+        requests = [
+            {'insertText': {'location': {'index': 1}, 'text': 'abcdef\n'}},
+            {'insertText': {'location': {'index': 1}, 'text': ''}},
+            {'updateTextStyle': {'range': {'startIndex': 1, 'endIndex': 3}, 'textStyle': {'italic': True}, 'fields': 'italic'}},
+            {'updateTextStyle': {'range': {'startIndex': 1, 'endIndex': 3}, 'textStyle': bold, 'fields': 'bold'}},
+            {'updateTextStyle': {'range': {'startIndex': 3, 'endIndex': 5}, 'textStyle': bold, 'fields': 'bold'}},
+            {'updateTextStyle': {'range': {'startIndex': 1, 'endIndex': 4}, 'textStyle': {}, 'fields': 'italic'}},
+            {'updateTextStyle': {'range': {'startIndex': 6, 'endIndex': 6}, 'textStyle': bold, 'fields': 'bold'}},
+        ]
+        optimized, _ = operations.optimize_requests(requests)
+        self.assertEqual(optimized, [
+            requests[0],
+            {'updateTextStyle': {'range': {'startIndex': 1, 'endIndex': 5}, 'textStyle': bold, 'fields': 'bold'}},
+            requests[5],
+        ])
+        self.assertEqual(render(optimized), render(requests))
+
+    def test_index_changes_are_barriers(self):
+        """Tests that style updates separated by an insert before them are not merged."""
+        bold = {'bold': True}
+        requests = [
+            {'insertText': {'location': {'index': 1}, 'text': 'abcd\n'}},
+            {'updateTextStyle': {'range': {'startIndex': 1, 'endIndex': 3}, 'textStyle': bold, 'fields': 'bold'}},
+            {'insertText': {'location': {'index': 1}, 'text': 'xy'}},
+            {'updateTextStyle': {'range': {'startIndex': 3, 'endIndex': 5}, 'textStyle': bold, 'fields': 'bold'}},
+        ]
+        optimized, stats = operations.optimize_requests(requests)
+        self.assertEqual(optimized, requests)
+        self.assertEqual(stats['requests_after'], 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import sys
+import os
+import json
+import subprocess
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the project root directory and 'src' (where the client lives) to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import remote
+from src.server import mcp_server
+from test.fake_google_docs import FakeGoogleBackend
+
+SRC_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.received.append((self.path, payload, self.client_address))
+        status, body = (404, {'detail': 'Not Found'}) if self.path == '/missing' else (200, {'status': 'success', 'echo': payload})
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class TestRemoteSession(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), RecordingHandler)
+        self.server.received = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_requests_share_one_connection(self):
+        """Tests that consecutive operations reuse the kept-alive connection."""
+        session = remote.RemoteSession(self.url)
+        self.assertEqual(session.post('/append-markdown', {'a': 1})['echo'], {'a': 1})
+        self.assertEqual(session.post('/clear-doc', {'b': 2})['status'], 'success')
+        session.close()
+        (_, _, first), (_, _, second) = [(p, b, c) for p, b, c in self.server.received]
+        self.assertEqual(first, second)
+
+    def test_http_errors_become_error_results(self):
+        """Tests that an error status is reported with the server's detail."""
+        session = remote.RemoteSession(self.url)
+        self.addCleanup(session.close)
+        result = session.post('/missing', {})
+        self.assertEqual(result['status'], 'error')
+        self.assertIn('404', result['message'])
+        self.assertIn('Not Found', result['message'])
+
+    def test_unreachable_server(self):
+        self.server.shutdown()
+        self.server.server_close()
+        result = remote.RemoteSession(self.url, timeout=2).post('/clear-doc', {})
+        self.assertEqual(result['status'], 'error')
+
+    def test_remote_client_skips_google_imports(self):
+        """Tests that a --remote invocation sends the operation without importing the Google libraries."""
+        with tempfile.NamedTemporaryFile('w', suffix='.md', delete=False) as f:
+            f.write('# Hello')
+        self.addCleanup(os.unlink, f.name)
+        script = (
+            "import sys, client\n"
+            f"sys.argv = ['client.py', 'append', 'doc-1', {f.name!r}, '--remote', '--server-url', {self.url!r},"
+            " '--auth', 'service_account', '--creds-path', 'creds.json']\n"
+            "client.main()\n"
+            "print('LOADED' if [m for m in sys.modules if m.startswith(('googleapiclient', 'google.'))] else 'CLEAN')\n"
+        )
+        output = subprocess.run([sys.executable, '-c', script], cwd=SRC_PATH, capture_output=True, text=True, check=True).stdout
+        self.assertIn('CLEAN', output)
+        path, payload, _ = self.server.received[0]
+        self.assertEqual(path, '/append-markdown')
+        self.assertEqual(payload['document_id'], 'doc-1')
+        self.assertEqual(payload['markdown_text'], '# Hello')
+        self.assertEqual(payload['auth_mode'], 'service_account')
+
+class TestServerWriteAndReplace(unittest.TestCase):
+
+    def test_write_and_replace_endpoints(self):
+        """Tests the endpoints used by remote write and replace-markdown."""
+        backend = FakeGoogleBackend()
+        original_cache = mcp_server.service_cache
+        mcp_server.service_cache = mcp_server.ServiceCache(factory=lambda *args: backend.services())
+        try:
+            auth = dict(auth_mode='service_account', creds_path='fake.json')
+            written = mcp_server.write_markdown(mcp_server.WriteMarkdownRequest(markdown_text="Hi {{NAME}}", title="Remote", **auth))
+            document = backend.document(written['document_id'])
+            self.assertEqual(document.title, 'Remote')
+            replaced = mcp_server.replace_markdown(mcp_server.ReplaceMarkdownRequest(
+                document_id=written['document_id'], replacements={'{{NAME}}': '**World**'}, **auth
+            ))
+            self.assertEqual(replaced['status'], 'success')
+            self.assertTrue(document.body_text().startswith('Hi World\n'))
+        finally:
+            mcp_server.service_cache = original_cache
+
+if __name__ == '__main__':
+    unittest.main()
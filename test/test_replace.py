@@ -0,0 +1,50 @@
+import unittest
+import sys
+import os
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tool import replace
+
+def paragraph(start, *runs):
+    """Builds a paragraph element from text runs (strings) and inline objects (None)."""
+    elements = []
+    index = start
+    for run in runs:
+        if run is None:
+            elements.append({'startIndex': index, 'endIndex': index + 1, 'inlineObjectElement': {}})
+            index += 1
+        else:
+            elements.append({'startIndex': index, 'endIndex': index + len(run), 'textRun': {'content': run}})
+            index += len(run)
+    return {'startIndex': start, 'endIndex': index, 'paragraph': {'elements': elements}}
+
+class TestPlaceholderMatcher(unittest.TestCase):
+
+    def find(self, content, keys):
+        return replace.find_placeholders(content, replace.build_placeholder_pattern(keys))
+
+    def test_finds_all_keys_in_one_pass(self):
+        """Tests that every placeholder occurrence is found with its document range."""
+        content = [paragraph(1, 'Hi {{A}} and {{B}}, {{A}} again\n')]
+        found = self.find(content, ['{{A}}', '{{B}}'])
+        self.assertEqual(
+            [(h['key'], h['range']['startIndex'], h['range']['endIndex']) for h in found],
+            [('{{A}}', 4, 9), ('{{B}}', 14, 19), ('{{A}}', 21, 26)]
+        )
+
+    def test_placeholder_split_across_runs(self):
+        """Tests that a placeholder spanning two text runs maps back to the right indices."""
+        content = [paragraph(10, 'x {{SPL', 'IT}} y\n')]
+        found = self.find(content, ['{{SPLIT}}'])
+        self.assertEqual(found, [{'key': '{{SPLIT}}', 'range': {'startIndex': 12, 'endIndex': 21}}])
+
+    def test_longest_key_wins_and_objects_break_matches(self):
+        """Tests that overlapping keys prefer the longest and inline objects are never matched."""
+        content = [paragraph(1, '{{AB}} {{A', None, '}}\n')]
+        found = self.find(content, ['{{A', '{{AB}}', '{{A}}'])
+        self.assertEqual([(h['key'], h['range']['startIndex']) for h in found], [('{{AB}}', 1), ('{{A', 8)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.server.service_cache import ServiceCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestServiceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.builds = []
+        self.clock = FakeClock()
+        handle, self.creds_path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        with open(self.creds_path, 'w') as f:
+            f.write('{}')
+
+    def tearDown(self):
+        os.remove(self.creds_path)
+
+    def factory(self, auth_mode, creds_path, token_path):
+        self.builds.append((auth_mode, creds_path, token_path))
+        return {'docs': object(), 'drive': object()}
+
+    def test_reuses_services_for_same_key(self):
+        """Tests that services are built once per key."""
+        cache = ServiceCache(self.factory, clock=self.clock)
+        first = cache.get('oauth', self.creds_path, 'token.json')
+        second = cache.get('oauth', self.creds_path, 'token.json')
+        self.assertIs(first, second)
+        self.assertEqual(len(self.builds), 1)
+        cache.get('oauth', self.creds_path, 'other-token.json')
+        self.assertEqual(len(self.builds), 2)
+
+    def test_ttl_expiry(self):
+        """Tests that entries are rebuilt after the TTL elapses."""
+        cache = ServiceCache(self.factory, ttl_seconds=10, clock=self.clock)
+        first = cache.get('service_account', self.creds_path)
+        self.clock.now = 11
+        self.assertIsNot(cache.get('service_account', self.creds_path), first)
+
+    def test_lru_eviction(self):
+        """Tests that the least recently used entry is evicted first."""
+        cache = ServiceCache(self.factory, max_entries=2, clock=self.clock)
+        cache.get('oauth', self.creds_path, 'a')
+        cache.get('oauth', self.creds_path, 'b')
+        cache.get('oauth', self.creds_path, 'a')
+        cache.get('oauth', self.creds_path, 'c')
+        self.assertEqual(len(cache), 2)
+        cache.get('oauth', self.creds_path, 'a')
+        self.assertEqual(len(self.builds), 3)
+        cache.get('oauth', self.creds_path, 'b')
+        self.assertEqual(len(self.builds), 4)
+
+    def test_invalidated_when_credentials_change(self):
+        """Tests that rewriting the credential file forces a rebuild."""
+        cache = ServiceCache(self.factory, clock=self.clock)
+        first = cache.get('service_account', self.creds_path)
+        with open(self.creds_path, 'w') as f:
+            f.write('{"rotated": true}')
+        self.assertIsNot(cache.get('service_account', self.creds_path), first)
+
+    def test_invalidated_when_token_changes(self):
+        """Tests that a token file replaced on disk forces a rebuild, so services use the reloaded credentials."""
+        handle, token_path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, token_path)
+        cache = ServiceCache(self.factory, clock=self.clock)
+        first = cache.get('oauth', self.creds_path, token_path)
+        self.assertIs(cache.get('oauth', self.creds_path, token_path), first)
+        with open(token_path, 'w') as f:
+            f.write('{"token": "new"}')
+        self.assertIsNot(cache.get('oauth', self.creds_path, token_path), first)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import sys
+import os
+
+# Add the project root directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.tool import google_docs_tool, snapshots
+from test.fake_google_docs import FakeGoogleBackend
+
+class TestSnapshotCache(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = FakeGoogleBackend()
+        self.services = self.backend.services()
+        self.docs = self.services['docs']
+        self.document = self.backend.create_document()
+
+    def append(self, markdown):
+        result = google_docs_tool.append_to_google_doc(self.docs, self.document.document_id, markdown)
+        self.assertEqual(result['status'], 'success', result.get('message'))
+        return result
+
+    def test_back_to_back_appends_skip_the_read(self):
+        """Tests that appends after our own write reuse the end index they produced."""
+        self.append("# Title\n* one\n  * two")
+        self.append("Some **bold** text")
+        self.append("last")
+        self.assertEqual(self.backend.calls['documents.get'], 1)
+        self.assertEqual(self.document.body_text(), "Title\none\ntwo\n\nSome bold text\n\nlast\n\n")
+        cached = snapshots.snapshot_cache(self.docs).end_index(self.docs, self.document.document_id)
+        self.assertTrue(cached.cached)
+        self.assertEqual(cached.end_index, self.document.end_index)
+
+    def test_write_then_clear_and_append(self):
+        """Tests that a full write and a clear leave an end index that later appends can use."""
+        result = google_docs_tool.write_to_google_doc(self.docs, self.services['drive'], "* a\n* b", document_id=self.document.document_id)
+        self.assertEqual(result['status'], 'success')
+        self.append("c")
+        self.assertEqual(self.document.body_text(), "a\nb\n\nc\n\n")
+        self.assertEqual(google_docs_tool.clear_google_doc(self.docs, self.document.document_id)['status'], 'success')
+        self.append("d")
+        self.assertEqual(self.document.body_text(), "d\n\n")
+        self.assertEqual(self.backend.calls['documents.get'], 1)
+
+    def test_edit_made_elsewhere_forces_a_new_read(self):
+        """Tests that a stale snapshot fails its revision check and the append is rebuilt."""
+        self.append("first")
+        # Another client edits the document, moving its end.
+        self.backend.batch_update(self.document.document_id, {'requests': [{'insertText': {'location': {'index': 1}, 'text': 'elsewhere\n'}}]})
+        self.append("second")
+        self.assertEqual(self.document.body_text(), "elsewhere\nfirst\n\nsecond\n\n")
+        self.assertEqual(self.backend.calls['documents.get'], 2)
+
+    def test_clear_of_an_empty_snapshot_checks_the_document(self):
+        """Tests that a clear that looks like a no-op from the cache reads the document first."""
+        document_id = self.document.document_id
+        self.assertEqual(google_docs_tool.clear_google_doc(self.docs, document_id)['status'], 'success')
+        self.backend.batch_update(document_id, {'requests': [{'insertText': {'location': {'index': 1}, 'text': 'edited elsewhere\n'}}]})
+
+        result = google_docs_tool.clear_google_doc(self.docs, document_id)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(self.document.body_text(), "\n")
+        self.assertEqual(result['revision_id'], self.document.revision_id)
+
+        result = google_docs_tool.write_to_google_doc(self.docs, self.services['drive'], "new", document_id=document_id)
+        self.assertEqual(result['status'], 'success', result.get('message'))
+        self.assertEqual(self.document.body_text(), "new\n\n")
+
+    def test_write_losing_the_revision_race_is_retried(self):
+        """Tests that a clear based on a fresh read is rebuilt when another write lands in between."""
+        document_id = self.document.document_id
+        self.append("first")
+        snapshots.snapshot_cache(self.docs).invalidate(document_id)
+        batch_update = self.backend.batch_update
+
+        def concurrent_append(doc_id, body):
+            # Another client appends after our read and before our write.
+            self.backend.batch_update = batch_update
+            batch_update(doc_id, {'requests': [{'insertText': {'location': {'index': 1}, 'text': 'concurrent\n'}}]})
+            return batch_update(doc_id, body)
+        self.backend.batch_update = concurrent_append
+
+        result = google_docs_tool.clear_google_doc(self.docs, document_id)
+        self.assertEqual(result['status'], 'success', result.get('message'))
+        self.assertEqual(self.document.body_text(), "\n")
+        self.assertEqual(self.backend.calls['documents.get'], 3)
+
+    def test_end_index_read_uses_a_field_mask(self):
+        """Tests that only revisionId and endIndex fields are read for an append."""
+        self.append("text")
+        doc = self.docs.documents().get(documentId=self.document.document_id, fields=snapshots.END_INDEX_FIELDS).execute()
+        self.assertEqual(set(doc), {'revisionId', 'body'})
+        self.assertTrue(all(set(element) == {'endIndex'} for element in doc['body']['content']))
+
+    def test_unchanged_document_body_is_reused(self):
+        """Tests that the body is only downloaded again after the revision changed."""
+        cache = snapshots.SnapshotCache(max_entries=1)
+        first = cache.document(self.docs, self.document.document_id)
+        self.assertIs(cache.document(self.docs, self.document.document_id), first)
+        self.assertEqual(cache.info()['hits'], 1)
+
+        self.backend.batch_update(self.document.document_id, {'requests': [{'insertText': {'location': {'index': 1}, 'text': 'x'}}]})
+        self.assertIsNot(cache.document(self.docs, self.document.document_id), first)
+
+        other = self.backend.create_document()
+        cache.end_index(self.docs, other.document_id)
+        self.assertEqual(len(cache), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+import contextlib
+import io
+
+# The sync module lives in 'src' and imports its siblings like the client does.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import sync
+from test.fake_google_docs import FakeGoogleBackend, make_http_error
+
+class TestDirectorySync(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.backend = FakeGoogleBackend()
+        self.services = self.backend.services()
+        self.write_file('a.md', '# A')
+        self.write_file('nested/b.md', 'B **text**')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_file(self, relative_path, content):
+        path = os.path.join(self.directory, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def sync(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return sync.sync_directory(self.services, self.directory, **kwargs)
+
+    def test_first_sync_creates_documents_and_manifest(self):
+        """Tests that every file gets a document and a manifest entry."""
+        result = self.sync()
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(sorted(item['path'] for item in result['pushed']), ['a.md', os.path.join('nested', 'b.md')])
+        with open(result['manifest_path']) as f:
+            entries = json.load(f)['files']
+        document = self.backend.document(entries['a.md']['document_id'])
+        self.assertEqual(document.title, 'a')
+        self.assertEqual(document.body_text(), 'A\n\n')
+        # New documents are created by a Drive import, which does not report a Docs revision.
+        self.assertIsNone(entries['a.md']['revision_id'])
+
+    def test_unchanged_files_are_skipped(self):
+        """Tests that only changed files are pushed on the next run, to the same document."""
+        first = self.sync()
+        document_ids = {item['path']: item['document_id'] for item in first['pushed']}
+        self.write_file('a.md', '# A changed')
+        creates_before = self.backend.calls['files.create']
+
+        second = self.sync()
+        self.assertEqual([item['path'] for item in second['pushed']], ['a.md'])
+        self.assertEqual(second['skipped'], [os.path.join('nested', 'b.md')])
+        self.assertEqual(second['pushed'][0]['document_id'], document_ids['a.md'])
+        self.assertEqual(self.backend.calls['files.create'], creates_before)
+        self.assertEqual(self.backend.document(document_ids['a.md']).body_text(), 'A changed\n\n')
+
+        third = self.sync()
+        self.assertEqual(third['pushed'], [])
+
+    def test_failed_write_reuses_its_document(self):
+        """Tests that a document created before a failed write is written by the next run, not created again."""
+        # Doubled spaces cannot be imported, so the document is created empty and filled with batchUpdate.
+        self.write_file('c.md', 'keep  both  spaces')
+        batch_update = self.backend.batch_update
+
+        def failing_batch_update(document_id, body):
+            self.backend.batch_update = batch_update
+            raise make_http_error(400, "Invalid requests.")
+        self.backend.batch_update = failing_batch_update
+
+        first = self.sync()
+        self.assertEqual(first['status'], 'error')
+        creates_after_first = self.backend.calls['files.create']
+        second = self.sync()
+        self.assertEqual(second['status'], 'success')
+        self.assertEqual([item['path'] for item in second['pushed']], ['c.md'])
+        self.assertEqual(self.backend.calls['files.create'], creates_after_first)
+
+        pushed = {item['path']: item['document_id'] for item in first['pushed']}
+        self.assertEqual(second['pushed'][0]['document_id'], pushed['c.md'])
+        self.assertEqual(self.backend.document(pushed['c.md']).body_text(), 'keep  both  spaces\n\n')
+        with open(second['manifest_path']) as f:
+            self.assertNotIn('resume_from', json.load(f)['files']['c.md'])
+        self.assertEqual(self.sync()['pushed'], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import sys
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Since the transport lives in 'src', it is imported the same way auth imports it.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import transport
+import auth
+from google.auth.credentials import AnonymousCredentials
+
+class DocsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.connections.add(self.client_address)
+        if self.path.startswith('/missing'):
+            self._reply(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+            return
+        self._reply(200, {"documentId": self.path.rsplit('/', 1)[-1].split('?')[0], "title": "Pooled"})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestPooledHttp(unittest.TestCase):
+
+    def setUp(self):
+        DocsHandler.connections = set()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), DocsHandler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.http = transport.PooledHttp(AnonymousCredentials(), pool_size=4)
+
+    def tearDown(self):
+        self.http.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_returns_httplib2_style_response(self):
+        response, content = self.http.request(f"{self.base_url}/v1/documents/doc1")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response['content-type'], 'application/json')
+        self.assertEqual(json.loads(content)['documentId'], 'doc1')
+
+    def test_concurrent_requests_reuse_pooled_connections(self):
+        def fetch(i):
+            return self.http.request(f"{self.base_url}/v1/documents/doc{i}")[0].status
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            statuses = list(pool.map(fetch, range(40)))
+        self.assertEqual(statuses, [200] * 40)
+        # 40 requests from 4 threads share at most one kept-alive connection per pool slot.
+        self.assertLessEqual(len(DocsHandler.connections), 4)
+
+    def test_services_execute_over_the_pool(self):
+        services = auth.build_services(AnonymousCredentials(), pool_size=2)
+        docs = services['docs']
+        docs._baseUrl = f"{self.base_url}/"
+        document = docs.documents().get(documentId='doc7').execute()
+        self.assertEqual(document, {"documentId": "doc7", "title": "Pooled"})
+
+        from googleapiclient.errors import HttpError
+        docs._baseUrl = f"{self.base_url}/missing/"
+        with self.assertRaises(HttpError) as ctx:
+            docs.documents().get(documentId='doc7').execute()
+        self.assertEqual(ctx.exception.resp.status, 404)
+
+if __name__ == '__main__':
+    unittest.main()